@@ -28,6 +28,13 @@ def collect_data_files():
         data_files.append(('icon.ico', '.'))
         print("Добавлена иконка приложения: icon.ico")
     
+    # База производителей по MAC-адресам
+    if os.path.exists('oui.bin'):
+        data_files.append(('oui.bin', '.'))
+        print("Добавлена база производителей: oui.bin")
+    else:
+        print("ВНИМАНИЕ: oui.bin не найден, соберите его командой python oui_database.py build")
+    
     # Папка с изображениями (если есть)
     if os.path.exists('img'):
         for file in os.listdir('img'):
@@ -87,6 +94,9 @@ def build_exe():
         '--hidden-import=wmi',
         '--hidden-import=psutil',
         '--hidden-import=GPUtil',
+        # Загружаются через lazy_loader, поэтому PyInstaller не видит их импорт
+        '--hidden-import=scapy.all',
+        '--hidden-import=numpy',
     ]
     pyinstaller_args.extend(hidden_imports)
     
@@ -0,0 +1,227 @@
+"""
+Определение типа сетевого устройства.
+
+Правила по префиксам MAC-адресов и именам производителей компилируются один
+раз: префиксы - в множество OUI, подстроки производителей - в регулярные
+выражения. Результат для пары (MAC, шлюз) запоминается в LRU-кэше, поэтому
+повторная классификация известного устройства сводится к поиску в словаре.
+
+Дополнительные признаки (открытые порты, TTL ответа) подключаются как
+сигналы: функции signal(evidence, device_type), которые уточняют тип по
+собранным для IP фактам. Сигналы выполняются только для адресов, по которым
+есть факты, и их результат тоже кэшируется до появления новых фактов.
+"""
+
+import re
+import threading
+from collections import OrderedDict
+
+DEFAULT_CACHE_SIZE = 4096
+
+# Префиксы MAC-адресов известных производителей коммутаторов
+SWITCH_PREFIXES = (
+    # Cisco Catalyst коммутаторы
+    "00:1a:a1", "00:1b:54", "00:21:1b", "00:23:5e", "00:25:45",
+    # HP/Aruba коммутаторы
+    "00:0e:b3", "00:14:c2", "00:16:b9", "00:1f:fe", "24:be:05",
+    # Dell коммутаторы
+    "00:1e:c9", "14:fe:b5", "24:b6:fd", "f8:ca:b8", "f8:db:88",
+    # Juniper коммутаторы
+    "00:05:85", "00:10:db", "2c:6b:f5", "28:8a:1c", "54:1e:56"
+)
+
+# Производители, выпускающие только сетевое оборудование: их устройства
+# считаются маршрутизаторами, даже если не являются шлюзом. В реестре IEEE
+# MikroTik записан как Routerboard.com
+ROUTER_ONLY_VENDORS = ("mikrotik", "routerboard", "zyxel")
+
+# Подстроки производителей ниже проверяются только для шлюзов: в реестре IEEE
+# записаны полные имена ("Cisco Systems, Inc", "TP-Link Technologies Co.,Ltd."),
+# под которые попадают и телефоны, точки доступа, адаптеры этих производителей
+
+# Подстроки в имени производителя, указывающие на коммутатор. Cisco Systems
+# сюда не входит: шлюз Cisco обычно маршрутизатор, а коммутаторы Catalyst
+# узнаются по SWITCH_PREFIXES
+SWITCH_VENDORS = (
+    "cisco switch", "d-link switch", "hp procurve",
+    "hp enterprise", "juniper networks", "aruba", "allied telesis",
+    "netgear switch", "dell switch", "brocade", "extreme networks"
+)
+
+# Подстроки в имени производителя, указывающие на маршрутизатор
+ROUTER_VENDORS = (
+    "tp-link technologies", "mikrotik", "asus router", "d-link router",
+    "netgear router", "cisco router", "huawei router", "zyxel", "edge router",
+    "ubiquiti", "sagemcom", "actiontec", "arris", "technicolor"
+)
+
+# Признаки коммутатора, которые проверяются только для шлюзов
+GATEWAY_SWITCH_KEYWORDS = (
+    "switch", "коммутатор", "dell powerconnect", "juniper ex",
+    "cisco catalyst", "hp procurve", "hp switch", "aruba switch"
+)
+
+# Порты, по которым узнаются принтеры (RAW, LPD, IPP) и устройства Apple (lockdownd)
+PRINTER_PORTS = frozenset((9100, 515, 631))
+MOBILE_PORTS = frozenset((62078,))
+
+
+def _compile_substrings(substrings):
+    return re.compile("|".join(re.escape(s) for s in substrings))
+
+
+def _normalize_oui(mac):
+    """Первые три октета MAC-адреса в виде 'aabbcc' или None"""
+    digits = mac.lower().replace(':', '').replace('-', '').replace('.', '')
+    return digits[:6] if len(digits) >= 6 else None
+
+
+def port_signal(evidence, device_type):
+    """Уточняет тип компьютера по открытым портам"""
+    ports = evidence.get("ports")
+    if not ports or device_type != "Компьютер":
+        return None
+    if PRINTER_PORTS.intersection(ports):
+        return "Принтер"
+    if MOBILE_PORTS.intersection(ports):
+        return "Мобильное устройство"
+    return None
+
+
+def ttl_signal(evidence, device_type):
+    """
+    Уточняет тип по TTL ответа: начальный TTL 255 характерен для
+    сетевого оборудования, у Windows он 128, у Linux и macOS - 64.
+    Такое устройство не шлюз, поэтому считается коммутатором
+    """
+    ttl = evidence.get("ttl")
+    if not ttl or device_type != "Компьютер":
+        return None
+    if ttl > 128:
+        return "Коммутатор"
+    return None
+
+
+DEFAULT_SIGNALS = (port_signal, ttl_signal)
+
+
+class DeviceClassifier:
+    """
+    Классификатор устройств по MAC-адресу, производителю и дополнительным признакам
+
+    Args:
+        vendor_lookup: Функция mac -> имя производителя или None
+        cache_size: Максимальное число запомненных пар (MAC, шлюз) и адресов
+                    с собранными фактами
+        signals: Последовательность сигналов; по умолчанию DEFAULT_SIGNALS
+    """
+    def __init__(self, vendor_lookup, cache_size=DEFAULT_CACHE_SIZE, signals=None):
+        self._vendor_lookup = vendor_lookup
+        self._cache_size = cache_size
+        self._cache = OrderedDict()
+        self._signals = list(DEFAULT_SIGNALS if signals is None else signals)
+        # Факты и уточненные типы по IP, вытесняются как и кэш по MAC (LRU)
+        self._evidence = OrderedDict()
+        self._refined = {}
+        self._lock = threading.Lock()
+
+        self._switch_ouis = frozenset(_normalize_oui(prefix) for prefix in SWITCH_PREFIXES)
+        self._router_only_vendors = _compile_substrings(ROUTER_ONLY_VENDORS)
+        self._switch_vendors = _compile_substrings(SWITCH_VENDORS)
+        self._router_vendors = _compile_substrings(ROUTER_VENDORS)
+        self._gateway_switch_keywords = _compile_substrings(GATEWAY_SWITCH_KEYWORDS)
+
+    def add_signal(self, signal):
+        """Подключает сигнал signal(evidence, device_type) -> тип или None"""
+        with self._lock:
+            self._signals.append(signal)
+            self._refined.clear()
+
+    def observe(self, ip, **facts):
+        """
+        Запоминает факты об устройстве для сигналов, например observe(ip, ttl=64)
+        или observe(ip, ports={80, 443})
+        """
+        with self._lock:
+            evidence = self._evidence.setdefault(ip, {})
+            evidence.update(facts)
+            self._evidence.move_to_end(ip)
+            self._refined.pop(ip, None)
+            if len(self._evidence) > self._cache_size:
+                evicted, _ = self._evidence.popitem(last=False)
+                self._refined.pop(evicted, None)
+
+    def forget(self, ip):
+        """Удаляет собранные факты об устройстве"""
+        with self._lock:
+            self._evidence.pop(ip, None)
+            self._refined.pop(ip, None)
+
+    def classify(self, ip, mac, is_gateway=False):
+        """
+        Определяет тип устройства
+
+        Returns:
+            str: Тип устройства ("Маршрутизатор", "Коммутатор", "Компьютер" и т.д.)
+        """
+        key = (mac, is_gateway)
+        with self._lock:
+            device_type = self._cache.get(key)
+            if device_type is not None:
+                self._cache.move_to_end(key)
+        if device_type is None:
+            device_type = self._classify_by_mac(mac, is_gateway)
+            with self._lock:
+                self._cache[key] = device_type
+                if len(self._cache) > self._cache_size:
+                    self._cache.popitem(last=False)
+
+        if ip not in self._evidence:
+            return device_type
+        return self._refine(ip, key, device_type)
+
+    def _refine(self, ip, key, device_type):
+        with self._lock:
+            refined = self._refined.get(ip)
+            if refined is not None and refined[0] == key:
+                return refined[1]
+            evidence = dict(self._evidence.get(ip, ()))
+            signals = list(self._signals)
+
+        result = device_type
+        for signal in signals:
+            refined_type = signal(evidence, device_type)
+            if refined_type:
+                result = refined_type
+                break
+
+        with self._lock:
+            # Факты могли быть вытеснены или забыты, пока работали сигналы
+            if ip in self._evidence:
+                self._refined[ip] = (key, result)
+        return result
+
+    def _classify_by_mac(self, mac, is_gateway):
+        # Если MAC отсутствует или не определен
+        if not mac or mac == "Не определен":
+            return "Маршрутизатор" if is_gateway else "Неизвестное устройство"
+
+        if _normalize_oui(mac) in self._switch_ouis:
+            return "Коммутатор"
+
+        vendor = self._vendor_lookup(mac)
+        vendor_lower = vendor.lower() if vendor else ""
+
+        if vendor_lower and self._router_only_vendors.search(vendor_lower):
+            return "Маршрутизатор"
+        if not is_gateway:
+            return "Компьютер"
+
+        if vendor_lower and self._switch_vendors.search(vendor_lower):
+            return "Коммутатор"
+        if vendor_lower and self._router_vendors.search(vendor_lower):
+            return "Маршрутизатор"
+        # Шлюз считаем маршрутизатором, если нет явных признаков коммутатора
+        if vendor_lower and self._gateway_switch_keywords.search(vendor_lower):
+            return "Коммутатор"
+        return "Маршрутизатор"
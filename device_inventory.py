@@ -0,0 +1,162 @@
+"""
+Инвентарь обнаруженных сетевых устройств с лентой изменений.
+
+Инвентарь хранит устройства между обновлениями, индексирует их по IP и MAC
+и возвращает только изменения: какие устройства появились, изменились или
+пропали. sync сравнивает полный снимок сети, apply принимает уже известные
+изменения (например, разницу снимков ARP-таблицы) без обхода всех устройств. Представления (таблица, топология)
+применяют эти события вместо полной перестройки.
+"""
+
+import threading
+
+# Виды событий инвентаря
+DEVICE_ADDED = "added"
+DEVICE_UPDATED = "updated"
+DEVICE_REMOVED = "removed"
+
+
+class InventoryEvent:
+    """
+    Событие изменения инвентаря
+
+    Attributes:
+        kind: DEVICE_ADDED, DEVICE_UPDATED или DEVICE_REMOVED
+        ip: IP-адрес устройства
+        device: Словарь устройства (для удаленного - последнее известное состояние)
+        changes: Множество изменившихся полей (только для DEVICE_UPDATED)
+    """
+    __slots__ = ("kind", "ip", "device", "changes")
+
+    def __init__(self, kind, ip, device, changes=None):
+        self.kind = kind
+        self.ip = ip
+        self.device = device
+        self.changes = changes or set()
+
+    def __repr__(self):
+        return f"InventoryEvent({self.kind}, {self.ip}, changes={sorted(self.changes)})"
+
+
+class DeviceInventory:
+    """
+    Хранилище устройств, ключом служит IP-адрес, дополнительно поддерживается индекс по MAC
+    """
+    def __init__(self):
+        self._devices = {}
+        self._by_mac = {}
+        self._listeners = []
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._devices)
+
+    def __contains__(self, ip):
+        return ip in self._devices
+
+    def get(self, ip):
+        return self._devices.get(ip)
+
+    def find_by_mac(self, mac):
+        """Возвращает устройство по MAC-адресу (в любом регистре и с любыми разделителями)"""
+        ip = self._by_mac.get(self._normalize_mac(mac))
+        return self._devices.get(ip) if ip else None
+
+    def devices(self):
+        """Список устройств в порядке их появления в инвентаре"""
+        return list(self._devices.values())
+
+    def subscribe(self, callback):
+        """Подписывает callback(events) на изменения инвентаря"""
+        self._listeners.append(callback)
+
+    def sync(self, snapshot):
+        """
+        Сравнивает полный снимок устройств с инвентарем и применяет разницу
+
+        Словари существующих устройств обновляются на месте, поэтому ссылки,
+        которые держат представления, остаются действительными.
+
+        Args:
+            snapshot (dict): {ip: словарь устройства} - все устройства, видимые сейчас
+
+        Returns:
+            list: Список InventoryEvent, пустой если ничего не изменилось
+        """
+        with self._lock:
+            events = []
+            for ip, device in snapshot.items():
+                self._put(ip, device, events)
+            for ip in [ip for ip in self._devices if ip not in snapshot]:
+                self._remove(ip, events)
+        return self._notify(events)
+
+    def apply(self, updates, removed=()):
+        """
+        Применяет частичные изменения: устройства, которых нет в updates и removed,
+        не трогаются, поэтому время работы зависит только от числа изменений
+
+        Args:
+            updates (dict): {ip: словарь устройства} - новые и, возможно, изменившиеся устройства
+            removed (iterable): IP-адреса пропавших устройств
+
+        Returns:
+            list: Список InventoryEvent, пустой если ничего не изменилось
+        """
+        with self._lock:
+            events = []
+            for ip, device in updates.items():
+                self._put(ip, device, events)
+            for ip in removed:
+                if ip in self._devices and ip not in updates:
+                    self._remove(ip, events)
+        return self._notify(events)
+
+    def _put(self, ip, device, events):
+        current = self._devices.get(ip)
+        if current is None:
+            current = dict(device)
+            self._devices[ip] = current
+            self._index_mac(ip, None, current.get("MAC"))
+            events.append(InventoryEvent(DEVICE_ADDED, ip, current))
+            return
+
+        changes = {key for key in set(current) | set(device) if current.get(key) != device.get(key)}
+        if changes:
+            old_mac = current.get("MAC")
+            current.clear()
+            current.update(device)
+            self._index_mac(ip, old_mac, current.get("MAC"))
+            events.append(InventoryEvent(DEVICE_UPDATED, ip, current, changes))
+
+    def _remove(self, ip, events):
+        device = self._devices.pop(ip)
+        self._index_mac(ip, device.get("MAC"), None)
+        events.append(InventoryEvent(DEVICE_REMOVED, ip, device))
+
+    def _notify(self, events):
+        if events:
+            for callback in self._listeners:
+                callback(events)
+        return events
+
+    def clear(self):
+        """Очищает инвентарь, подписчики получают события удаления"""
+        return self.sync({})
+
+    @staticmethod
+    def _normalize_mac(mac):
+        # Заглушки вроде "Не определен" в индекс не попадают
+        if not mac or len(mac) != 17:
+            return None
+        return mac.lower().replace('-', ':')
+
+    def _index_mac(self, ip, old_mac, new_mac):
+        old_key = self._normalize_mac(old_mac)
+        new_key = self._normalize_mac(new_mac)
+        if old_key == new_key:
+            return
+        if old_key and self._by_mac.get(old_key) == ip:
+            del self._by_mac[old_key]
+        if new_key:
+            self._by_mac[new_key] = ip
@@ -0,0 +1,83 @@
+"""
+Кэш заранее отрисованных изображений (QPixmap) для схемы топологии.
+
+Иконка устройства с градиентами и контурами рисуется один раз для каждого
+сочетания (вид, состояние, плотность пикселей экрана), а при отрисовке схемы
+только копируется на холст. Плотность пикселей входит в ключ, поэтому на
+экране с масштабированием иконки остаются четкими; при смене темы, шрифта
+или экрана кэш очищается целиком.
+"""
+
+from collections import OrderedDict
+
+from PyQt5.QtCore import QRectF, Qt
+from PyQt5.QtGui import QPainter, QPixmap
+
+# Сколько изображений хранить: иконок немного, а подписей - по одной на устройство
+DEFAULT_ATLAS_SIZE = 4096
+
+
+class IconAtlas:
+    """
+    LRU-кэш QPixmap по ключу
+
+    Args:
+        max_entries (int): Предел числа изображений; самые давно использованные вытесняются
+    """
+    def __init__(self, max_entries=DEFAULT_ATLAS_SIZE):
+        self.max_entries = max_entries
+        self._pixmaps = OrderedDict()
+        self.device_pixel_ratio = 1.0
+
+    def __len__(self):
+        return len(self._pixmaps)
+
+    def clear(self):
+        self._pixmaps.clear()
+
+    def set_device_pixel_ratio(self, ratio):
+        """Запоминает плотность пикселей экрана; при ее изменении кэш очищается"""
+        if ratio != self.device_pixel_ratio:
+            self.device_pixel_ratio = ratio
+            self.clear()
+
+    def find(self, key):
+        """Возвращает готовое изображение или None, не рисуя его"""
+        pixmap = self._pixmaps.get(key)
+        if pixmap is not None:
+            self._pixmaps.move_to_end(key)
+        return pixmap
+
+    def get(self, key, width, height, render):
+        """
+        Возвращает изображение для ключа, при отсутствии рисует его
+
+        Args:
+            key: Хешируемый ключ (вид и состояние)
+            width, height (int): Размер в логических пикселях
+            render: Функция render(painter, rect), рисующая в rect (логические координаты)
+
+        Returns:
+            QPixmap: Изображение с установленным devicePixelRatio
+        """
+        pixmap = self.find(key)
+        if pixmap is not None:
+            return pixmap
+
+        ratio = self.device_pixel_ratio
+        pixmap = QPixmap(max(1, int(round(width * ratio))), max(1, int(round(height * ratio))))
+        pixmap.setDevicePixelRatio(ratio)
+        pixmap.fill(Qt.transparent)
+
+        painter = QPainter(pixmap)
+        try:
+            painter.setRenderHint(QPainter.Antialiasing)
+            painter.setRenderHint(QPainter.TextAntialiasing)
+            render(painter, QRectF(0, 0, width, height))
+        finally:
+            painter.end()
+
+        self._pixmaps[key] = pixmap
+        if len(self._pixmaps) > self.max_entries:
+            self._pixmaps.popitem(last=False)
+        return pixmap
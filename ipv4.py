@@ -0,0 +1,205 @@
+"""
+Быстрые операции с IPv4-адресами без создания объектов ipaddress.
+
+Адреса представлены 32-битными целыми числами, служебные диапазоны
+проверяются по заранее вычисленным таблицам масок: сначала по первому
+октету (большинство адресов решается одним обращением к кортежу), затем
+по списку сетей для нескольких неоднозначных октетов. Для списков адресов
+есть пакетные функции, которые при наличии NumPy проверяют весь массив
+за несколько векторных операций.
+
+Разбор строк - самая дорогая часть, а одни и те же адреса (ARP-таблица,
+результаты сканирования) проверяются многократно, поэтому результаты
+разбора кэшируются.
+"""
+
+import socket
+import struct
+
+from lazy_loader import is_available, lazy_import
+
+# NumPy нужен только пакетным функциям и загружается при первом обращении
+HAS_NUMPY = is_available("numpy")
+np = lazy_import("numpy")
+
+# Маски для префиксов /0 - /32
+PREFIX_MASKS = tuple((0xFFFFFFFF << (32 - prefix)) & 0xFFFFFFFF for prefix in range(33))
+
+BROADCAST = 0xFFFFFFFF
+
+# Предел кэша разобранных адресов; при переполнении кэш очищается целиком
+PARSE_CACHE_LIMIT = 65536
+_INVALID = -1
+_parse_cache = {}
+
+
+def _net(address, prefix):
+    return struct.unpack("!I", socket.inet_aton(address))[0], prefix
+
+
+# Служебные диапазоны: сеть и длина префикса
+SPECIAL_NETWORKS = (
+    _net("0.0.0.0", 32),        # Unspecified
+    _net("127.0.0.0", 8),       # Localhost
+    _net("169.254.0.0", 16),    # Link-local
+    _net("172.16.0.0", 12),     # WSL2 и Docker обычно используют 172.16-31.x.x
+    _net("192.168.56.0", 24),   # VirtualBox Host-only
+    _net("192.168.99.0", 24),   # VMware
+    _net("192.168.152.0", 24),  # VMware
+    _net("192.168.232.0", 24),  # VMware
+    _net("224.0.0.0", 4),       # Multicast
+    _net("240.0.0.0", 4),       # Reserved (включая 255.255.255.255)
+)
+
+# Решение по первому октету: True/False - окончательно, None - нужна проверка сетей
+_FIRST_OCTET = [False] * 256
+for _network, _prefix in SPECIAL_NETWORKS:
+    _first = _network >> 24
+    if _prefix <= 8:
+        for _octet in range(_first, _first + (1 << (8 - _prefix))):
+            _FIRST_OCTET[_octet] = True
+    else:
+        _FIRST_OCTET[_first] = None
+_FIRST_OCTET = tuple(_FIRST_OCTET)
+
+# Сети с префиксом длиннее /8, сгруппированные по маске: ((маска, frozenset сетей), ...)
+_SPECIAL_BY_MASK = tuple(
+    (PREFIX_MASKS[prefix], frozenset(network for network, p in SPECIAL_NETWORKS if p == prefix))
+    for prefix in sorted({p for _, p in SPECIAL_NETWORKS if p > 8})
+)
+
+
+def ip_to_int(ip):
+    """
+    Преобразует IPv4-адрес в число
+
+    Returns:
+        int: Адрес как 32-битное число или None, если строка не IPv4-адрес
+    """
+    value = _parse_cache.get(ip)
+    if value is None:
+        try:
+            value = struct.unpack("!I", socket.inet_pton(socket.AF_INET, ip))[0]
+        except (OSError, TypeError, ValueError):
+            value = _INVALID
+        if len(_parse_cache) >= PARSE_CACHE_LIMIT:
+            _parse_cache.clear()
+        _parse_cache[ip] = value
+    return None if value == _INVALID else value
+
+
+def int_to_ip(value):
+    """Преобразует 32-битное число в строку IPv4-адреса"""
+    return socket.inet_ntoa(struct.pack("!I", value))
+
+
+def is_special(value):
+    """Проверяет, относится ли адрес (число) к служебным диапазонам"""
+    decision = _FIRST_OCTET[value >> 24]
+    if decision is not None:
+        return decision
+    for mask, networks in _SPECIAL_BY_MASK:
+        if value & mask in networks:
+            return True
+    return False
+
+
+def is_special_ip(ip):
+    """
+    Проверяет, относится ли IPv4-адрес (строка) к служебным диапазонам
+
+    Returns:
+        bool: Результат проверки или None, если строка не IPv4-адрес
+    """
+    value = ip_to_int(ip)
+    if value is None:
+        return None
+    return is_special(value)
+
+
+def network_of(value, prefix):
+    """Адрес сети для адреса и длины префикса"""
+    return value & PREFIX_MASKS[prefix]
+
+
+def in_network(value, network, prefix):
+    """Проверяет принадлежность адреса сети network/prefix"""
+    return value & PREFIX_MASKS[prefix] == network
+
+
+def to_array(ips):
+    """
+    Преобразует список строк в массив uint32 (нужен NumPy)
+
+    Returns:
+        tuple: (массив адресов, массив флагов корректности)
+    """
+    cached = _parse_cache.get
+    raw = [cached(ip) for ip in ips]
+    if None in raw:
+        raw = [_parse(ip) if value is None else value for ip, value in zip(ips, raw)]
+    values = np.array(raw, dtype=np.int64)
+    valid = values != _INVALID
+    return np.where(valid, values, 0).astype(np.uint32), valid
+
+
+def _parse(ip):
+    value = ip_to_int(ip)
+    return _INVALID if value is None else value
+
+
+def special_mask(values):
+    """
+    Пакетная проверка служебных адресов
+
+    Args:
+        values: Массив uint32 (NumPy) или последовательность чисел
+
+    Returns:
+        Массив bool (NumPy) или список bool
+    """
+    if HAS_NUMPY and isinstance(values, np.ndarray):
+        result = np.zeros(values.shape, dtype=bool)
+        for network, prefix in SPECIAL_NETWORKS:
+            result |= (values & np.uint32(PREFIX_MASKS[prefix])) == np.uint32(network)
+        return result
+    return [is_special(value) for value in values]
+
+
+# Начиная с этого размера пакетные функции используют NumPy
+NUMPY_THRESHOLD = 256
+
+
+def filter_addresses(ips, network=None, prefix=32, exclude_special=True):
+    """
+    Отбирает IPv4-адреса из списка
+
+    Args:
+        ips (list): Строки адресов; некорректные и не IPv4 отбрасываются
+        network (int): Если задан, оставить только адреса из network/prefix
+        prefix (int): Длина префикса сети
+        exclude_special (bool): Отбросить служебные адреса
+
+    Returns:
+        list: Индексы подходящих адресов в исходном списке
+    """
+    if HAS_NUMPY and len(ips) >= NUMPY_THRESHOLD:
+        values, keep = to_array(ips)
+        if exclude_special:
+            keep &= ~special_mask(values)
+        if network is not None:
+            keep &= (values & np.uint32(PREFIX_MASKS[prefix])) == np.uint32(network)
+        return np.flatnonzero(keep).tolist()
+
+    mask = PREFIX_MASKS[prefix]
+    result = []
+    for index, ip in enumerate(ips):
+        value = ip_to_int(ip)
+        if value is None:
+            continue
+        if exclude_special and is_special(value):
+            continue
+        if network is not None and value & mask != network:
+            continue
+        result.append(index)
+    return result
@@ -0,0 +1,112 @@
+"""
+Отложенная загрузка необязательных тяжелых модулей.
+
+Наличие модуля проверяется через importlib.util.find_spec без его импорта,
+а сам модуль импортируется при первом обращении к атрибуту. Так Scapy,
+NumPy, GPUtil и WMI не замедляют запуск программы, если функция, которой
+они нужны, не используется.
+"""
+
+import importlib
+import importlib.util
+import logging
+import os
+import sys
+import threading
+import time
+
+# Время импорта загруженных модулей в секундах: {имя: время}
+_load_times = {}
+
+
+def is_available(name):
+    """Проверяет, установлен ли модуль, не импортируя его"""
+    try:
+        return importlib.util.find_spec(name) is not None
+    except (ImportError, ValueError):
+        return False
+
+
+def load_times():
+    """Время импорта модулей, уже загруженных через LazyModule"""
+    return dict(_load_times)
+
+
+class LazyModule:
+    """
+    Модуль, который импортируется при первом обращении к любому атрибуту
+
+    Ошибка импорта запоминается и повторно выбрасывается при следующих
+    обращениях, чтобы неудачный импорт не повторялся каждый раз.
+    """
+    def __init__(self, name, quiet=False):
+        """
+        Args:
+            name (str): Имя модуля, например "scapy.all"
+            quiet (bool): Скрыть вывод в stderr во время импорта
+        """
+        self._lazy_name = name
+        self._lazy_quiet = quiet
+        self._lazy_module = None
+        self._lazy_error = None
+        self._lazy_lock = threading.Lock()
+
+    @property
+    def loaded(self):
+        return self._lazy_module is not None
+
+    def available(self):
+        """
+        Импортируется ли модуль. В отличие от is_available модуль действительно
+        загружается (один раз): установленный модуль может не импортироваться,
+        например wmi при поврежденном pywin32
+        """
+        try:
+            self.load()
+        except Exception:
+            return False
+        return True
+
+    def load(self):
+        """Импортирует модуль (один раз) и возвращает его"""
+        if self._lazy_module is not None:
+            return self._lazy_module
+        with self._lazy_lock:
+            if self._lazy_module is None:
+                if self._lazy_error is not None:
+                    raise self._lazy_error
+                started = time.perf_counter()
+                try:
+                    self._lazy_module = self._import()
+                except Exception as e:
+                    logging.warning(f"Модуль {self._lazy_name} недоступен: {e}")
+                    self._lazy_error = e
+                    raise
+                finally:
+                    _load_times[self._lazy_name] = time.perf_counter() - started
+        return self._lazy_module
+
+    def _import(self):
+        if not self._lazy_quiet:
+            return importlib.import_module(self._lazy_name)
+
+        # Некоторые модули (например, Scapy) пишут предупреждения в stderr при импорте
+        old_stderr = sys.stderr
+        with open(os.devnull, 'w') as devnull:
+            sys.stderr = devnull
+            try:
+                return importlib.import_module(self._lazy_name)
+            finally:
+                sys.stderr = old_stderr
+
+    def __getattr__(self, attr):
+        return getattr(self.load(), attr)
+
+    def __repr__(self):
+        state = "загружен" if self.loaded else "не загружен"
+        return f"<LazyModule {self._lazy_name} ({state})>"
+
+
+def lazy_import(name, quiet=False):
+    """Возвращает LazyModule для модуля name"""
+    return LazyModule(name, quiet)
@@ -0,0 +1,144 @@
+"""
+Отложенное создание вкладок и потоки опроса, работающие только по необходимости.
+
+LazyTabWidget создает содержимое вкладки при ее первом открытии, а не при
+запуске программы. PollingThread - поток периодического опроса, который
+можно приостановить, пока его данные никто не показывает (вкладка скрыта,
+окно свернуто в трей); после возобновления он сразу делает внеочередной
+замер, чтобы интерфейс не показывал устаревшие данные.
+"""
+
+import threading
+import time
+
+from PyQt5.QtCore import QThread, pyqtSignal
+from PyQt5.QtWidgets import QTabWidget, QVBoxLayout, QWidget
+
+
+class LazyTabWidget(QTabWidget):
+    """
+    QTabWidget, содержимое вкладок которого создается при первой активации
+
+    Вкладка добавляется пустым контейнером, а фабрика вызывается, когда
+    вкладка впервые становится текущей и видимой. Индексы вкладок не меняются.
+    """
+    # Сигнал (индекс вкладки, созданный виджет)
+    tab_built = pyqtSignal(int, object)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._factories = {}
+        self._built = {}
+        self.currentChanged.connect(self._build_current)
+
+    def add_lazy_tab(self, factory, title):
+        """
+        Добавляет вкладку, содержимое которой создаст factory() при первом открытии
+
+        Returns:
+            int: Индекс вкладки
+        """
+        container = QWidget()
+        layout = QVBoxLayout(container)
+        layout.setContentsMargins(0, 0, 0, 0)
+        index = self.addTab(container, title)
+        self._factories[container] = factory
+        return index
+
+    def tab_content(self, index):
+        """Созданное содержимое вкладки или None, если вкладка еще не открывалась"""
+        return self._built.get(self.widget(index))
+
+    def build_tab(self, index):
+        """Создает содержимое вкладки, если оно еще не создано, и возвращает его"""
+        container = self.widget(index)
+        if container in self._built:
+            return self._built[container]
+        factory = self._factories.pop(container, None)
+        if factory is None:
+            return container
+        content = factory()
+        container.layout().addWidget(content)
+        self._built[container] = content
+        self.tab_built.emit(index, content)
+        return content
+
+    def _build_current(self, index):
+        if index >= 0 and self.isVisible():
+            self.build_tab(index)
+
+    def showEvent(self, event):
+        super().showEvent(event)
+        self._build_current(self.currentIndex())
+
+
+class PollingThread(QThread):
+    """
+    Поток периодического опроса с паузой
+
+    Подклассы реализуют poll(), результат отправляется сигналом update_signal;
+    пустой результат не отправляется (поток только записывает данные).
+    Пока поток на паузе, опрос не выполняется; resume() будит поток сразу,
+    не дожидаясь конца интервала.
+    """
+    update_signal = pyqtSignal(dict)
+
+    # Интервал опроса в секундах
+    interval = 1.0
+
+    def __init__(self):
+        super().__init__()
+        self._running = True
+        self._active = threading.Event()
+        self._active.set()
+        self._wake = threading.Event()
+
+    def poll(self):
+        """Возвращает словарь с новыми данными"""
+        raise NotImplementedError
+
+    def run(self):
+        # Замеры идут по расписанию time.monotonic: длительность poll() не
+        # сдвигает следующий замер, а пропущенные из-за долгого опроса замеры
+        # не выполняются подряд
+        deadline = time.monotonic()
+        while self._running:
+            if not self._active.is_set():
+                self._active.wait()
+                self._wake.clear()
+                deadline = time.monotonic()
+                continue
+            data = self.poll()
+            if data:
+                self.update_signal.emit(data)
+            now = time.monotonic()
+            deadline = max(deadline + self.interval, now)
+            if self._wake.wait(deadline - now):
+                self._wake.clear()
+                deadline = time.monotonic()
+
+    @property
+    def paused(self):
+        return not self._active.is_set()
+
+    def pause(self):
+        """Приостанавливает опрос после текущего замера"""
+        self._active.clear()
+
+    def resume(self):
+        """Возобновляет опрос; первый замер выполняется сразу"""
+        if not self.isRunning():
+            self._active.set()
+            self.start()
+        elif self.paused:
+            self._active.set()
+            self.poll_now()
+
+    def poll_now(self):
+        """Выполняет внеочередной замер, не дожидаясь конца интервала"""
+        self._wake.set()
+
+    def stop(self):
+        self._running = False
+        self._active.set()
+        self._wake.set()
@@ -0,0 +1,518 @@
+"""
+История метрик на диске: сегменты фиксированных двоичных записей.
+
+Метрики группируются в семейства ("system", "cpu", "disk", "interfaces"),
+у каждого семейства свой каталог с сегментами. Сегмент - файл, в который
+записи только дописываются; все записи сегмента одного размера, поэтому
+диапазон по времени находится двоичным поиском прямо в отображенном в
+память (mmap) файле, без чтения всего файла.
+
+Формат сегмента (все числа little-endian):
+    заголовок  b"BMHS", версия (H), число полей (H), размер записи (I),
+               размер заголовка (I), время создания (d); затем имена полей
+               в UTF-8, каждое завершается нулевым байтом, выравнивание до 8 байт
+    записи     время (d, time.time()) и значения полей (f); отсутствующее
+               значение - NaN
+
+Новый сегмент начинается при каждом запуске, при изменении набора полей
+(например, появился сетевой интерфейс) и при достижении SEGMENT_BYTES.
+Сегменты старше RETENTION_SECONDS и самые старые сегменты сверх MAX_FAMILY_BYTES
+удаляются при открытии нового сегмента.
+Записи сбрасываются на диск раз в FLUSH_INTERVAL секунд.
+
+    python metrics_history.py families
+    python metrics_history.py show system --since 30m
+    python metrics_history.py stats interfaces --since 2h --until 1h
+"""
+
+import argparse
+import atexit
+import datetime
+import logging
+import math
+import mmap
+import os
+import re
+import struct
+import threading
+import time
+from array import array
+
+from lazy_loader import is_available, lazy_import
+
+HAS_NUMPY = is_available("numpy")
+np = lazy_import("numpy")
+
+MAGIC = b"BMHS"
+VERSION = 1
+HEADER_FORMAT = "<4sHHIId"
+HEADER_SIZE = struct.calcsize(HEADER_FORMAT)
+SEGMENT_SUFFIX = ".bmh"
+
+HISTORY_DIR = os.path.join(os.path.expanduser("~"), ".bulwark", "history")
+
+# Размер сегмента, после которого начинается новый
+SEGMENT_BYTES = 4 * 1024 * 1024
+# Сколько хранить историю и сколько места она может занять на одно семейство
+RETENTION_SECONDS = 7 * 24 * 3600
+MAX_FAMILY_BYTES = 64 * 1024 * 1024
+# Как часто буфер записи сбрасывается на диск
+FLUSH_INTERVAL = 10.0
+
+_FAMILY_PATTERN = re.compile(r"^[\w.-]+$")
+_TIME_DELTA_PATTERN = re.compile(r"^(\d+(?:\.\d+)?)([smhd])$")
+_TIME_UNITS = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+
+
+def record_format(field_count):
+    return "<d" + "f" * field_count
+
+
+def pack_header(fields, created):
+    """Заголовок сегмента с именами полей"""
+    names = b"".join(name.encode("utf-8") + b"\0" for name in fields)
+    header_size = HEADER_SIZE + len(names)
+    header_size += -header_size % 8
+    header = struct.pack(HEADER_FORMAT, MAGIC, VERSION, len(fields),
+                         struct.calcsize(record_format(len(fields))), header_size, created)
+    return (header + names).ljust(header_size, b"\0")
+
+
+class Segment:
+    """
+    Сегмент, открытый для чтения через mmap
+
+    Args:
+        path (str): Путь к файлу сегмента
+    """
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            try:
+                self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:
+                raise ValueError("пустой файл сегмента")
+        try:
+            magic, version, field_count, record_size, header_size, created = \
+                struct.unpack_from(HEADER_FORMAT, self._map, 0)
+            if magic != MAGIC or version != VERSION:
+                raise ValueError("неизвестный формат сегмента")
+            names = self._map[HEADER_SIZE:header_size].split(b"\0")[:field_count]
+        except (ValueError, struct.error):
+            self._map.close()
+            raise
+        self.fields = [name.decode("utf-8") for name in names]
+        self.record_size = record_size
+        self.header_size = header_size
+        self.created = created
+        self.format = record_format(field_count)
+        # Неполная последняя запись (сбой во время записи) не учитывается
+        self.count = max(0, (len(self._map) - header_size) // record_size)
+
+    def close(self):
+        self._map.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def time_at(self, index):
+        return struct.unpack_from("<d", self._map, self.header_size + index * self.record_size)[0]
+
+    def time_range(self):
+        """(время первой записи, время последней записи) или None для пустого сегмента"""
+        if not self.count:
+            return None
+        return self.time_at(0), self.time_at(self.count - 1)
+
+    def _bisect(self, timestamp, after=False):
+        """Индекс первой записи со временем >= timestamp (> timestamp при after=True)"""
+        low, high = 0, self.count
+        while low < high:
+            middle = (low + high) // 2
+            value = self.time_at(middle)
+            if value < timestamp or (after and value == timestamp):
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def index_range(self, start=None, end=None):
+        """Индексы записей [first, last) с временем в интервале [start, end]"""
+        first = 0 if start is None else self._bisect(start)
+        last = self.count if end is None else self._bisect(end, after=True)
+        return first, max(first, last)
+
+    def read(self, start=None, end=None):
+        """
+        Записи за интервал по столбцам
+
+        Returns:
+            dict: {"time": времена, поле: значения}; массивы NumPy, если он установлен,
+                  иначе array('d')
+        """
+        first, last = self.index_range(start, end)
+        offset = self.header_size + first * self.record_size
+        count = last - first
+
+        if HAS_NUMPY:
+            dtype = np.dtype([("time", "<f8")] + [(f"f{i}", "<f4") for i in range(len(self.fields))])
+            records = np.frombuffer(self._map, dtype=dtype, count=count, offset=offset)
+            columns = {"time": records["time"].copy()}
+            for i, name in enumerate(self.fields):
+                columns[name] = records[f"f{i}"].astype(np.float64)
+            # Ссылка на буфер mmap не должна пережить закрытие сегмента
+            del records
+            return columns
+
+        view = memoryview(self._map)[offset:offset + count * self.record_size]
+        try:
+            rows = list(struct.iter_unpack(self.format, view))
+        finally:
+            view.release()
+        columns = {"time": array("d", (row[0] for row in rows))}
+        for i, name in enumerate(self.fields, 1):
+            columns[name] = array("d", (row[i] for row in rows))
+        return columns
+
+
+class HistoryWriter:
+    """
+    Запись одного семейства метрик в сегменты с ротацией и очисткой старых сегментов
+    """
+    def __init__(self, directory, segment_bytes=SEGMENT_BYTES, retention=RETENTION_SECONDS,
+                 max_bytes=MAX_FAMILY_BYTES, flush_interval=FLUSH_INTERVAL):
+        self.directory = directory
+        self.segment_bytes = segment_bytes
+        self.retention = retention
+        self.max_bytes = max_bytes
+        self.flush_interval = flush_interval
+        self.fields = None
+        self._field_set = frozenset()
+        self._file = None
+        self._path = None
+        self._struct = None
+        self._size = 0
+        self._flushed = time.monotonic()
+
+    def append(self, values, timestamp):
+        """
+        Дописывает запись
+
+        Args:
+            values (dict): {поле: значение}; поля, которых нет в текущем сегменте,
+                           начинают новый сегмент, недостающие записываются как NaN
+            timestamp (float): Время замера (time.time())
+        """
+        if self.fields is None or not self._field_set.issuperset(values):
+            self._open_segment(sorted(values), timestamp)
+        elif self._size >= self.segment_bytes:
+            self._open_segment(self.fields, timestamp)
+
+        nan = math.nan
+        record = self._struct.pack(timestamp, *[values.get(name, nan) for name in self.fields])
+        self._file.write(record)
+        self._size += len(record)
+
+        now = time.monotonic()
+        if now - self._flushed >= self.flush_interval:
+            self.flush()
+
+    def flush(self):
+        if self._file is not None:
+            self._file.flush()
+        self._flushed = time.monotonic()
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def _open_segment(self, fields, timestamp):
+        self.close()
+        os.makedirs(self.directory, exist_ok=True)
+        path = os.path.join(self.directory, f"{int(timestamp * 1000):013d}{SEGMENT_SUFFIX}")
+        if path == self._path or os.path.exists(path):
+            # Два сегмента в одну миллисекунду (смена полей сразу после открытия)
+            path = os.path.join(self.directory, f"{int(timestamp * 1000) + 1:013d}{SEGMENT_SUFFIX}")
+        header = pack_header(fields, timestamp)
+        self._file = open(path, "ab")
+        self._file.write(header)
+        self._path = path
+        self._size = len(header)
+        self.fields = list(fields)
+        self._field_set = frozenset(fields)
+        self._struct = struct.Struct(record_format(len(fields)))
+        self.cleanup()
+
+    def cleanup(self):
+        """Удаляет сегменты старше срока хранения и самые старые сверх лимита размера"""
+        segments = []
+        for name in sorted(os.listdir(self.directory)):
+            path = os.path.join(self.directory, name)
+            if not name.endswith(SEGMENT_SUFFIX) or path == self._path:
+                continue
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            segments.append((path, stat.st_mtime, stat.st_size))
+
+        expired_before = time.time() - self.retention
+        total = self._size + sum(size for _, _, size in segments)
+        for path, modified, size in segments:
+            if modified >= expired_before and total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+                total -= size
+            except OSError as e:
+                logging.error(f"Ошибка при удалении сегмента истории {path}: {e}")
+
+
+class MetricsHistory:
+    """
+    История метрик на диске: запись из потоков мониторинга и чтение диапазонов
+
+    Args:
+        directory (str): Корневой каталог истории (по умолчанию ~/.bulwark/history)
+    """
+    def __init__(self, directory=None, segment_bytes=SEGMENT_BYTES, retention=RETENTION_SECONDS,
+                 max_family_bytes=MAX_FAMILY_BYTES, flush_interval=FLUSH_INTERVAL):
+        self.directory = directory or HISTORY_DIR
+        self._options = dict(segment_bytes=segment_bytes, retention=retention,
+                             max_bytes=max_family_bytes, flush_interval=flush_interval)
+        self._writers = {}
+        self._failed = set()
+        self._lock = threading.Lock()
+
+    def _family_dir(self, family):
+        if not _FAMILY_PATTERN.match(family):
+            raise ValueError(f"Недопустимое имя семейства метрик: {family}")
+        return os.path.join(self.directory, family)
+
+    def record(self, family, values, timestamp=None):
+        """
+        Записывает замер семейства {поле: значение}. Ошибки записи (нет места,
+        нет доступа к каталогу) логируются один раз, после чего запись семейства
+        отключается
+        """
+        if not values or family in self._failed:
+            return
+        if timestamp is None:
+            timestamp = time.time()
+        with self._lock:
+            writer = self._writers.get(family)
+            if writer is None:
+                writer = HistoryWriter(self._family_dir(family), **self._options)
+                self._writers[family] = writer
+            try:
+                writer.append(values, timestamp)
+            except OSError as e:
+                logging.error(f"Ошибка при записи истории метрик {family}: {e}")
+                writer.close()
+                self._failed.add(family)
+
+    def flush(self, family=None):
+        with self._lock:
+            for name, writer in self._writers.items():
+                if family is None or name == family:
+                    try:
+                        writer.flush()
+                    except OSError as e:
+                        logging.error(f"Ошибка при записи истории метрик {name}: {e}")
+
+    def close(self):
+        with self._lock:
+            for writer in self._writers.values():
+                writer.close()
+            self._writers.clear()
+
+    def families(self):
+        """Список семейств, для которых есть история"""
+        try:
+            return sorted(name for name in os.listdir(self.directory)
+                          if os.path.isdir(os.path.join(self.directory, name)))
+        except FileNotFoundError:
+            return []
+
+    def segments(self, family):
+        """Пути сегментов семейства в порядке времени"""
+        directory = self._family_dir(family)
+        try:
+            names = sorted(name for name in os.listdir(directory) if name.endswith(SEGMENT_SUFFIX))
+        except FileNotFoundError:
+            return []
+        return [os.path.join(directory, name) for name in names]
+
+    def read(self, family, start=None, end=None):
+        """
+        Записи семейства за интервал [start, end] (time.time(); None - без ограничения)
+
+        Поля, которых не было в части сегментов, заполняются NaN.
+
+        Returns:
+            dict: {"time": времена, поле: значения}; массивы NumPy, если он установлен,
+                  иначе array('d')
+        """
+        self.flush(family)
+        paths = self.segments(family)
+        parts = []
+        for index, path in enumerate(paths):
+            # Сегмент заканчивается не позже начала следующего: по имени следующего
+            # сегмента можно пропустить старые файлы, не открывая их
+            if start is not None and index + 1 < len(paths):
+                next_start = int(os.path.basename(paths[index + 1])[:-len(SEGMENT_SUFFIX)]) / 1000
+                if next_start < start:
+                    continue
+            try:
+                with Segment(path) as segment:
+                    if end is not None and segment.count and segment.time_at(0) > end:
+                        break
+                    columns = segment.read(start, end)
+            except (OSError, ValueError, struct.error) as e:
+                logging.error(f"Ошибка при чтении сегмента истории {path}: {e}")
+                continue
+            if len(columns["time"]):
+                parts.append(columns)
+        return _merge_columns(parts)
+
+
+def _merge_columns(parts):
+    fields = []
+    for part in parts:
+        for name in part:
+            if name != "time" and name not in fields:
+                fields.append(name)
+    if HAS_NUMPY:
+        result = {"time": np.concatenate([part["time"] for part in parts]) if parts else np.empty(0)}
+        for name in fields:
+            result[name] = np.concatenate([
+                part[name] if name in part else np.full(len(part["time"]), np.nan) for part in parts])
+        return result
+
+    result = {"time": array("d")}
+    for name in ["time"] + fields:
+        column = result.setdefault(name, array("d"))
+        for part in parts:
+            if name in part:
+                column.extend(part[name])
+            else:
+                column.extend([math.nan] * len(part["time"]))
+    return result
+
+
+_history = None
+_history_lock = threading.Lock()
+
+
+def get_metrics_history():
+    """Общая история метрик на диске; буферы сбрасываются при выходе из программы"""
+    global _history
+    if _history is None:
+        with _history_lock:
+            if _history is None:
+                _history = MetricsHistory()
+                atexit.register(_history.close)
+    return _history
+
+
+def parse_time(text, now=None):
+    """
+    Время из аргумента командной строки: "30m", "2h", "1d" (столько назад)
+    или дата в формате ISO ("2024-05-01 12:30")
+    """
+    if text is None:
+        return None
+    now = time.time() if now is None else now
+    match = _TIME_DELTA_PATTERN.match(text.strip())
+    if match:
+        return now - float(match.group(1)) * _TIME_UNITS[match.group(2)]
+    return datetime.datetime.fromisoformat(text.strip()).timestamp()
+
+
+def _format_time(timestamp):
+    return datetime.datetime.fromtimestamp(timestamp).strftime("%Y-%m-%d %H:%M:%S")
+
+
+def _format_value(value):
+    return "-" if value != value else f"{value:.2f}"
+
+
+def _column_stats(values):
+    present = [value for value in values if value == value]
+    if not present:
+        return None
+    return min(present), sum(present) / len(present), max(present)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="История метрик Bulwark")
+    parser.add_argument("-d", "--directory", default=None, help="каталог истории")
+    commands = parser.add_subparsers(dest="command")
+
+    commands.add_parser("families", help="семейства метрик и объем истории")
+
+    for name, help_text in (("show", "показать записи за интервал"),
+                            ("stats", "минимум, среднее и максимум за интервал")):
+        command = commands.add_parser(name, help=help_text)
+        command.add_argument("family")
+        command.add_argument("--since", default="1h", help="начало: 30m, 2h, 1d или дата ISO")
+        command.add_argument("--until", default=None, help="конец: 30m, 2h, 1d или дата ISO")
+        command.add_argument("--fields", default=None, help="поля через запятую")
+        if name == "show":
+            command.add_argument("--limit", type=int, default=50, help="не более N последних записей")
+
+    args = parser.parse_args(argv)
+    history = MetricsHistory(args.directory)
+
+    if args.command == "families":
+        families = history.families()
+        if not families:
+            print(f"История не найдена в {history.directory}")
+        for family in families:
+            paths = history.segments(family)
+            size = sum(os.path.getsize(path) for path in paths)
+            columns = history.read(family)
+            span = ""
+            if len(columns["time"]):
+                span = f", {_format_time(columns['time'][0])} - {_format_time(columns['time'][-1])}"
+            fields = ", ".join(name for name in columns if name != "time")
+            print(f"{family}: сегментов {len(paths)}, {size / 1024:.1f} КБ{span}\n    {fields}")
+        return 0
+
+    if args.command in ("show", "stats"):
+        columns = history.read(args.family, parse_time(args.since), parse_time(args.until))
+        fields = [name for name in columns if name != "time"]
+        if args.fields:
+            wanted = [name.strip() for name in args.fields.split(",")]
+            fields = [name for name in wanted if name in columns]
+        count = len(columns["time"])
+        if not count:
+            print("Нет записей за указанный интервал")
+            return 0
+
+        if args.command == "show":
+            first = max(0, count - args.limit) if args.limit else 0
+            print("\t".join(["время"] + fields))
+            for index in range(first, count):
+                row = [_format_time(columns["time"][index])]
+                row.extend(_format_value(float(columns[name][index])) for name in fields)
+                print("\t".join(row))
+        else:
+            print(f"Записей: {count}, {_format_time(columns['time'][0])} - {_format_time(columns['time'][-1])}")
+            print("поле\tмин\tсреднее\tмакс")
+            for name in fields:
+                stats = _column_stats([float(value) for value in columns[name]])
+                if stats:
+                    print("\t".join([name] + [f"{value:.2f}" for value in stats]))
+        return 0
+
+    parser.print_help()
+    return 0
+
+
+if __name__ == "__main__":
+    main()
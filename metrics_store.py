@@ -0,0 +1,346 @@
+"""
+История метрик мониторинга в кольцевых буферах фиксированного размера.
+
+Каждая метрика (загрузка CPU, память, скорость сети и т.д.) хранится в
+RingBuffer: два массива array('d') - время и значение - заданной емкости.
+Добавление замера - O(1) без выделения памяти, старые замеры перезаписываются,
+поэтому объем памяти не растет, сколько бы ни работала программа.
+
+Время замеров - time.time(), замеры в буфере упорядочены по времени, поэтому
+окно "последние N секунд" находится двоичным поиском. Статистика по окну
+(среднее, минимум, максимум, перцентиль) и прореживание для графиков
+считаются NumPy, если он установлен, иначе встроенными функциями над
+срезами массивов.
+"""
+
+import threading
+import time
+from array import array
+
+from lazy_loader import is_available, lazy_import
+
+HAS_NUMPY = is_available("numpy")
+np = lazy_import("numpy")
+
+# Сколько секунд истории хранить по умолчанию
+HISTORY_SECONDS = 4 * 3600
+# Емкость буфера по умолчанию: 4 часа при записи раз в секунду
+# (MetricsRecorderThread, HISTORY_INTERVAL в system_monitor)
+DEFAULT_CAPACITY = 14400
+
+# Начиная с этого числа замеров среднее считается через NumPy
+NUMPY_THRESHOLD = 256
+
+
+def _percentile(ordered, q):
+    """Перцентиль отсортированного списка с линейной интерполяцией, как numpy.percentile"""
+    rank = (len(ordered) - 1) * q / 100
+    lower = int(rank)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (rank - lower)
+
+
+class RingBuffer:
+    """
+    Кольцевой буфер замеров (время, значение) фиксированной емкости
+
+    Запись и чтение защищены блокировкой: замеры добавляют потоки мониторинга,
+    а читает интерфейс.
+    """
+    def __init__(self, capacity=DEFAULT_CAPACITY):
+        if capacity <= 0:
+            raise ValueError("Емкость буфера должна быть положительной")
+        self.capacity = capacity
+        self._times = array('d', bytes(8 * capacity))
+        self._values = array('d', bytes(8 * capacity))
+        # Индекс самого старого замера и число замеров
+        self._start = 0
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return self._count
+
+    def append(self, value, timestamp=None):
+        """Добавляет замер; при заполненном буфере вытесняет самый старый"""
+        if timestamp is None:
+            timestamp = time.time()
+        with self._lock:
+            if self._count:
+                # Перевод системных часов назад не должен нарушать порядок замеров
+                last = self._times[(self._start + self._count - 1) % self.capacity]
+                if timestamp < last:
+                    timestamp = last
+            if self._count < self.capacity:
+                index = (self._start + self._count) % self.capacity
+                self._count += 1
+            else:
+                index = self._start
+                self._start = (self._start + 1) % self.capacity
+            self._times[index] = timestamp
+            self._values[index] = value
+
+    def clear(self):
+        with self._lock:
+            self._start = 0
+            self._count = 0
+
+    def last(self):
+        """Последний замер (время, значение) или None"""
+        with self._lock:
+            if not self._count:
+                return None
+            index = (self._start + self._count - 1) % self.capacity
+            return self._times[index], self._values[index]
+
+    def _time_at(self, position):
+        return self._times[(self._start + position) % self.capacity]
+
+    def _first_position(self, since):
+        """Позиция первого замера со временем >= since (двоичный поиск)"""
+        low, high = 0, self._count
+        while low < high:
+            middle = (low + high) // 2
+            if self._time_at(middle) < since:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def _slices(self, buffer, position):
+        """Замеры с позиции position до конца в хронологическом порядке (один или два среза)"""
+        begin = (self._start + position) % self.capacity
+        end = self._start + self._count
+        if position >= self._count:
+            return []
+        if end <= self.capacity:
+            return [buffer[begin:end]]
+        end -= self.capacity
+        if begin >= self._start:
+            return [buffer[begin:], buffer[:end]]
+        return [buffer[begin:end]]
+
+    def window(self, seconds=None, now=None):
+        """
+        Замеры за последние seconds секунд (все замеры, если seconds не задан)
+
+        Returns:
+            tuple: (array времен, array значений)
+        """
+        with self._lock:
+            position = 0
+            if seconds is not None:
+                since = (time.time() if now is None else now) - seconds
+                position = self._first_position(since)
+            times = array('d')
+            values = array('d')
+            for part in self._slices(self._times, position):
+                times.extend(part)
+            for part in self._slices(self._values, position):
+                values.extend(part)
+        return times, values
+
+    def values(self, seconds=None):
+        """Значения за последние seconds секунд (array('d'))"""
+        return self.window(seconds)[1]
+
+    def as_array(self, seconds=None):
+        """Значения за окно как массив NumPy (float64)"""
+        return np.frombuffer(self.values(seconds), dtype=np.float64)
+
+    def mean(self, seconds=None):
+        values = self.values(seconds)
+        if not values:
+            return None
+        if HAS_NUMPY and len(values) >= NUMPY_THRESHOLD:
+            return float(np.frombuffer(values, dtype=np.float64).mean())
+        return sum(values) / len(values)
+
+    def min(self, seconds=None):
+        values = self.values(seconds)
+        return min(values) if values else None
+
+    def max(self, seconds=None):
+        values = self.values(seconds)
+        return max(values) if values else None
+
+    def percentile(self, q, seconds=None):
+        """
+        Перцентиль q (0-100) значений за окно с линейной интерполяцией,
+        как numpy.percentile по умолчанию
+        """
+        values = self.values(seconds)
+        if not values:
+            return None
+        if HAS_NUMPY:
+            return float(np.percentile(np.frombuffer(values, dtype=np.float64), q))
+        return _percentile(sorted(values), q)
+
+    def stats(self, seconds=None):
+        """
+        Сводка по окну
+
+        Returns:
+            dict: {"count", "mean", "min", "max", "p95"} или None, если замеров нет
+        """
+        values = self.values(seconds)
+        if not values:
+            return None
+        if HAS_NUMPY:
+            data = np.frombuffer(values, dtype=np.float64)
+            return {
+                "count": len(data),
+                "mean": float(data.mean()),
+                "min": float(data.min()),
+                "max": float(data.max()),
+                "p95": float(np.percentile(data, 95))
+            }
+        return {
+            "count": len(values),
+            "mean": sum(values) / len(values),
+            "min": min(values),
+            "max": max(values),
+            "p95": _percentile(sorted(values), 95)
+        }
+
+    def downsample(self, points, seconds=None):
+        """
+        Прореживает историю до points точек для графика: окно делится на равные
+        по времени интервалы, для каждого непустого интервала берется среднее
+
+        Returns:
+            list: [(время середины интервала, среднее, минимум, максимум), ...]
+        """
+        times, values = self.window(seconds)
+        if not values or points <= 0:
+            return []
+        first, last = times[0], times[-1]
+        span = last - first
+        if span <= 0 or len(values) <= points:
+            return [(t, v, v, v) for t, v in zip(times, values)]
+        step = span / points
+
+        if HAS_NUMPY:
+            t = np.frombuffer(times, dtype=np.float64)
+            v = np.frombuffer(values, dtype=np.float64)
+            buckets = np.minimum(((t - first) / step).astype(np.int64), points - 1)
+            # Границы непрерывных групп одинаковых интервалов (время упорядочено)
+            starts = np.flatnonzero(np.r_[True, buckets[1:] != buckets[:-1]])
+            counts = np.diff(np.r_[starts, len(v)])
+            means = np.add.reduceat(v, starts) / counts
+            minimums = np.minimum.reduceat(v, starts)
+            maximums = np.maximum.reduceat(v, starts)
+            centers = first + (buckets[starts] + 0.5) * step
+            return list(zip(centers.tolist(), means.tolist(), minimums.tolist(), maximums.tolist()))
+
+        result = []
+        bucket = None
+        total = count = 0
+        low = high = 0.0
+        for t, v in zip(times, values):
+            index = min(int((t - first) / step), points - 1)
+            if index != bucket:
+                if count:
+                    result.append((first + (bucket + 0.5) * step, total / count, low, high))
+                bucket, total, count, low, high = index, 0.0, 0, v, v
+            total += v
+            count += 1
+            if v < low:
+                low = v
+            elif v > high:
+                high = v
+        if count:
+            result.append((first + (bucket + 0.5) * step, total / count, low, high))
+        return result
+
+
+class MetricsStore:
+    """
+    Набор именованных кольцевых буферов, например "cpu.total" или "net.eth0.recv"
+
+    Буфер метрики создается при первой записи. Для накопительных счетчиков
+    (байты, пакеты) record_counters сохраняет скорость изменения в секунду.
+    """
+    def __init__(self, capacity=DEFAULT_CAPACITY):
+        self.capacity = capacity
+        self._series = {}
+        self._counters = {}
+        self._lock = threading.Lock()
+
+    def series(self, name):
+        """Буфер метрики (создается при первом обращении)"""
+        buffer = self._series.get(name)
+        if buffer is None:
+            with self._lock:
+                buffer = self._series.get(name)
+                if buffer is None:
+                    buffer = RingBuffer(self.capacity)
+                    self._series[name] = buffer
+        return buffer
+
+    def get(self, name):
+        """Буфер метрики или None, если замеров еще не было"""
+        return self._series.get(name)
+
+    def names(self, prefix=""):
+        return sorted(name for name in list(self._series) if name.startswith(prefix))
+
+    def record(self, values, timestamp=None):
+        """Добавляет замеры {имя: значение} с общим временем"""
+        if timestamp is None:
+            timestamp = time.time()
+        for name, value in values.items():
+            if value is not None:
+                self.series(name).append(value, timestamp)
+
+    def record_counters(self, values, timestamp=None):
+        """
+        Сохраняет скорость изменения накопительных счетчиков {имя: значение}.
+        Первое значение счетчика только запоминается; сброс счетчика
+        (значение уменьшилось) пропускается
+
+        Returns:
+            dict: Сохраненные скорости {имя: значение в секунду}
+        """
+        if timestamp is None:
+            timestamp = time.time()
+        rates = {}
+        with self._lock:
+            for name, value in values.items():
+                previous = self._counters.get(name)
+                self._counters[name] = (timestamp, value)
+                if previous is None:
+                    continue
+                elapsed = timestamp - previous[0]
+                if elapsed > 0 and value >= previous[1]:
+                    rates[name] = (value - previous[1]) / elapsed
+        self.record(rates, timestamp)
+        return rates
+
+    def stats(self, name, seconds=None):
+        """Сводка по метрике за окно или None"""
+        buffer = self._series.get(name)
+        return buffer.stats(seconds) if buffer is not None else None
+
+    def latest(self, prefix=""):
+        """Последние значения метрик {имя: значение}"""
+        result = {}
+        for name in self.names(prefix):
+            last = self._series[name].last()
+            if last is not None:
+                result[name] = last[1]
+        return result
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_metrics_store():
+    """Общее хранилище метрик для всех потоков мониторинга"""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = MetricsStore()
+    return _store
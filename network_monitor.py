@@ -7,35 +7,58 @@ import time
 import ipaddress
 import math  # Добавляем импорт модуля math
 import threading  # Добавляем импорт модуля threading
-import os  # Добавляем импорт os для работы с системными командами
-import sys
-from PyQt5.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QTabWidget, QLabel, 
-                           QTableWidget, QTableWidgetItem, QHeaderView, QGroupBox,
+from PyQt5.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QLabel, 
+                           QTableWidget, QTableWidgetItem, QTableView, QHeaderView, QGroupBox,
                            QPushButton, QComboBox, QSplitter, QApplication,
                            QProgressBar, QToolButton, QMenu, QAction, QGridLayout,
                            QToolTip, QCheckBox, QLineEdit)  # Добавляем QCheckBox и QLineEdit
-from PyQt5.QtCore import Qt, QThread, pyqtSignal, QTimer, QRectF, QPointF, QRect, QSize, QEvent
+from PyQt5.QtCore import Qt, QThread, pyqtSignal, QTimer, QRectF, QPointF, QRect, QPoint, QEvent
 from PyQt5.QtGui import (QPainter, QColor, QPen, QBrush, QFont, QPixmap, QPainterPath, 
-                       QPolygonF, QLinearGradient, QRadialGradient, QIcon)  # Добавляем QIcon
+                       QPolygonF, QLinearGradient, QRadialGradient, QIcon, QFontMetricsF)  # Добавляем QIcon
 import logging
 import concurrent.futures
+from network_scanner import (ArpSweeper, PortProbeEngine, ScanCheckpoint, ScanPlanner, SweepEngine,
+                             get_probe_pool, touch_neighbor, touch_neighbors)
+from device_inventory import DeviceInventory, DEVICE_REMOVED
+from device_classifier import DeviceClassifier
+import ipv4
+from network_tables import ArpSnapshotService, read_default_routes, read_neighbor_table
+from oui_database import lookup_vendor
 
-# Перенаправляем stderr в /dev/null (или NUL на Windows) перед импортом Scapy
-# чтобы скрыть предупреждение "No libpcap provider available"
-old_stderr = sys.stderr
-devnull = open(os.devnull, 'w')
-sys.stderr = devnull
+from lazy_loader import is_available, lazy_import
+from lazy_widgets import LazyTabWidget, PollingThread
+from table_models import SnapshotTableModel
+from topology_layout import (LAYOUT_CIRCULAR, LAYOUT_FORCE, LAYOUT_HIERARCHICAL, ForceLayout,
+                             ForceLayoutThread, SpatialGrid, circular_layout, fit_to_view,
+                             hierarchical_layout, infer_links)
+from icon_atlas import IconAtlas
 
-# Пытаемся импортировать Scapy, но не выдаем ошибку, если не получится
-try:
-    from scapy.all import ARP, Ether, srp
-    SCAPY_AVAILABLE = True
-except Exception as e:
-    logging.warning(f"Scapy недоступен: {e}")
-    SCAPY_AVAILABLE = False
+# Scapy импортируется только при первом ARP-сканировании через нее: импорт долгий
+# и выводит в stderr предупреждения вроде "No libpcap provider available"
+SCAPY_AVAILABLE = is_available("scapy")
+scapy_all = lazy_import("scapy.all", quiet=True)
 
-# Возвращаем stderr обратно
-sys.stderr = old_stderr
+# Общий кэш снимков ARP-таблицы для всех мониторов, вкладок и потоков сканирования
+ARP_CACHE_TTL = 1.0
+_arp_snapshot_service = ArpSnapshotService(ttl=ARP_CACHE_TTL)
+
+# Через сколько секунд MAC-адрес шлюза считается устаревшим и обновляется в фоне
+GATEWAY_MAC_MAX_AGE = 30.0
+# Сколько ждать ответа шлюза после запроса на обновление ARP-записи
+GATEWAY_REFRESH_WAIT = 0.5
+# Минимальный интервал между попытками обновления, если шлюз не отвечает
+GATEWAY_RETRY_INTERVAL = 5.0
+# Сколько ждать ответов на ARP-запросы при разрешении MAC-адресов в конце сканирования
+NEIGHBOR_RESOLVE_WAIT = 0.5
+
+# Поля изображения иконки вокруг устройства: место для подсветки и рамки неактивного
+ICON_SPRITE_MARGIN = 11
+# Поля изображения подписи: место для контура фона
+LABEL_MARGIN = 1
+
+# Запас в пикселях вокруг области просмотра, в пределах которого устройство
+# все еще рисуется: подпись с IP шире и ниже иконки
+DEVICE_PAINT_MARGIN = 90
 
 
 # Добавляем новый класс AnimatedProgressBar
@@ -143,10 +166,27 @@ class NetworkMonitor:
         self.local_ip = "Не определен"
         self.gateway = "Не определен"
         self.discovered_devices = {}
+        # IP устройств, обновленных сканированием с последнего take_changed_devices
+        self._changed_devices = set()
+        self._discovered_lock = threading.Lock()
+        # Движок асинхронного опроса хостов создается при первом сканировании
+        self._sweep_engine = None
+        # Позиция сканирования (индекс сети и номер рабочего блока) и ее контрольная точка на диске
+        self.current_subnet_index = 0
+        self.current_batch = 0
+        self._scan_checkpoint = ScanCheckpoint()
+        # Кэш шлюзов: (маршруты по умолчанию, построенный список шлюзов)
+        self._gateway_cache = None
+        # Последние известные MAC-адреса шлюзов: {ip: {"MAC", "Интерфейс", "checked"}}
+        self._gateway_macs = {}
+        self._gateway_refreshing = set()
+        self._gateway_attempts = {}
+        self._gateway_lock = threading.Lock()
+        # Классификатор типов устройств с кэшем по MAC-адресу
+        self._classifier = DeviceClassifier(self._get_mac_vendor)
         
         self.interfaces = self.get_network_interfaces()
         # История трафика для плавности графиков
-        self.traffic_history = {}
     
     def get_network_interfaces(self):
         """
@@ -228,9 +268,56 @@ class NetworkMonitor:
         
         return stats
     
-    def get_arp_table(self):
+    def get_arp_table(self, max_age=None):
+        """
+        Получение ARP таблицы из общего кэша снимков
+        
+        Args:
+            max_age (float): Допустимый возраст снимка в секундах (по умолчанию TTL кэша,
+                             0 - прочитать таблицу заново)
+            
+        Returns:
+            list: Записи ARP-таблицы; список общий для всех потребителей и не должен изменяться
+        """
+        return self.get_arp_snapshot(max_age).entries
+    
+    def add_discovered_devices(self, devices):
+        """
+        Сохраняет устройства, найденные сканированием, и запоминает их IP,
+        чтобы список устройств обновил только их
+        """
+        with self._discovered_lock:
+            self.discovered_devices.update(devices)
+            self._changed_devices.update(devices)
+    
+    def take_changed_devices(self):
+        """
+        Возвращает IP устройств, обновленных сканированием с прошлого вызова
+        """
+        with self._discovered_lock:
+            changed, self._changed_devices = self._changed_devices, set()
+        return changed
+    
+    def get_arp_snapshot(self, max_age=None):
+        """
+        Возвращает снимок ARP-таблицы с индексом записей по IP (ArpSnapshot.by_ip).
+        Снимок общий для всех вкладок и потоков: одновременные запросы в пределах
+        TTL обслуживаются одним чтением таблицы
+        """
+        return _arp_snapshot_service.get(self._read_arp_table, max_age)
+    
+    def get_arp_entry(self, ip, max_age=None):
+        """
+        Возвращает запись ARP-таблицы для IP-адреса или None
+        """
+        return self.get_arp_snapshot(max_age).by_ip.get(ip)
+    
+    def _read_arp_table(self):
         """
         Получение ARP таблицы с улучшенной фильтрацией и классификацией устройств
+        
+        Таблица читается напрямую из ядра (/proc/net/arp, netlink, GetIpNetTable),
+        команда arp запускается только если нативный источник недоступен.
         """
         arp_table = []
         
@@ -241,13 +328,9 @@ class NetworkMonitor:
             
             # Если запись явно указана как статическая или
             # если это специальный IP-адрес или MAC-адрес, то это статическая запись
+            # (мультикастовые и широковещательные адреса тоже считаются служебными)
             if is_static or self.is_special_ip(ip) or self.is_special_mac(mac):
                 device_type = "статический"
-                
-            # Проверяем, является ли IP-адрес мультикастовым или широковещательным
-            octets = list(map(int, ip.split('.')))
-            if 224 <= octets[0] <= 239 or octets[0] == 255:
-                device_type = "статический"
             
             # Проверяем мультикастовый MAC-адрес (начинается с 01:00:5e)
             mac_lower = mac.lower().replace('-', ':')
@@ -256,6 +339,22 @@ class NetworkMonitor:
                 
             return device_type
         
+        try:
+            neighbors = read_neighbor_table()
+        except Exception as e:
+            logging.error(f"Ошибка при чтении таблицы соседей: {e}")
+            neighbors = None
+        
+        if neighbors is not None:
+            for ip, mac, is_static, interface in neighbors:
+                arp_table.append({
+                    "IP": ip,
+                    "MAC": mac,
+                    "Тип": determine_device_type(ip, mac, is_static),
+                    "Интерфейс": interface or "Не определен"
+                })
+            return arp_table
+        
         try:
             if hasattr(psutil, 'WINDOWS') and psutil.WINDOWS:
                 # Windows-специфичный код
@@ -318,6 +417,12 @@ class NetworkMonitor:
     def get_gateway_info(self):
         """
         Получение информации о шлюзе с улучшенным алгоритмом выбора
+
+        Метод не блокируется на сети: MAC-адрес берется из общего снимка
+        ARP-таблицы или из последнего известного значения, а если запись
+        отсутствует или устарела, ее обновление запускается в фоне.
+        Поля "Возраст MAC" (секунды или None) и "Источник MAC" показывают,
+        насколько свежи данные.
         """
         try:
             # Получаем все шлюзы, отсортированные по приоритету
@@ -329,47 +434,94 @@ class NetworkMonitor:
             # Берем шлюз с наивысшим приоритетом
             primary_gateway = all_gateways[0]
             gateway_ip = primary_gateway["gateway"]
-            
-            # Пингуем шлюз для обновления ARP-записи
-            try:
-                subprocess.call(f"ping -n 1 {gateway_ip}", shell=True, 
-                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
-            except:
-                pass
+            now = time.time()
+
+            entry = self.get_arp_entry(gateway_ip)
+            with self._gateway_lock:
+                known = self._gateway_macs.get(gateway_ip)
+                if entry:
+                    if known is None or known["MAC"] != entry["MAC"]:
+                        known = {"MAC": entry["MAC"], "checked": now}
+                        self._gateway_macs[gateway_ip] = known
+                    known["Интерфейс"] = entry.get("Интерфейс")
+                    source = "ARP-таблица"
+                else:
+                    source = "Кэш" if known else None
+                stale = known is None or not entry or now - known["checked"] > GATEWAY_MAC_MAX_AGE
+
+            if stale:
+                self._refresh_gateway_mac(gateway_ip)
+
+            if known:
+                # Определяем производителя по MAC
+                vendor = self._get_mac_vendor(known["MAC"])
                 
-            # Получаем MAC-адрес шлюза из ARP-таблицы
-            arp_table = self.get_arp_table()
-            for entry in arp_table:
-                if entry["IP"] == gateway_ip:
-                    # Определяем производителя по MAC
-                    vendor = self._get_mac_vendor(entry["MAC"])
-                    
-                    # Определяем тип устройства с помощью улучшенного метода
-                    device_type = self._determine_device_type(gateway_ip, entry["MAC"], True)
-                    
-                    return {
-                        "IP": gateway_ip,
-                        "MAC": entry["MAC"],
-                        "Интерфейс": entry["Интерфейс"] if "Интерфейс" in entry else primary_gateway["name"],
-                        "Производитель": vendor if vendor else "Неизвестно",
-                        "Тип": device_type,
-                        "Виртуальный": primary_gateway["is_virtual"]
-                    }
+                # Определяем тип устройства с помощью улучшенного метода
+                device_type = self._determine_device_type(gateway_ip, known["MAC"], True)
+                
+                return {
+                    "IP": gateway_ip,
+                    "MAC": known["MAC"],
+                    "Интерфейс": known.get("Интерфейс") or primary_gateway["name"],
+                    "Производитель": vendor if vendor else "Неизвестно",
+                    "Тип": device_type,
+                    "Виртуальный": primary_gateway["is_virtual"],
+                    "Возраст MAC": round(now - known["checked"], 1),
+                    "Источник MAC": source
+                }
                     
-            # Если MAC-адрес не найден в ARP-таблице, возвращаем информацию без MAC
+            # Если MAC-адрес еще не известен, возвращаем информацию без MAC
             return {
                 "IP": gateway_ip,
                 "MAC": "Не определен",
                 "Интерфейс": primary_gateway["name"],
                 "Производитель": "Неизвестно",
                 "Тип": "Маршрутизатор",  # Значение по умолчанию, если не удалось определить MAC
-                "Виртуальный": primary_gateway["is_virtual"]
+                "Виртуальный": primary_gateway["is_virtual"],
+                "Возраст MAC": None,
+                "Источник MAC": None
             }
         except Exception as e:
             logging.error(f"Ошибка при получении информации о шлюзе: {str(e)}")
         
         return None
 
+    def _refresh_gateway_mac(self, gateway_ip):
+        """
+        Запускает фоновое обновление ARP-записи шлюза
+
+        Для каждого шлюза одновременно работает не более одного обновления.
+        """
+        now = time.time()
+        with self._gateway_lock:
+            if gateway_ip in self._gateway_refreshing:
+                return
+            if now - self._gateway_attempts.get(gateway_ip, 0) < GATEWAY_RETRY_INTERVAL:
+                return
+            self._gateway_refreshing.add(gateway_ip)
+            self._gateway_attempts[gateway_ip] = now
+
+        def refresh():
+            try:
+                touch_neighbor(gateway_ip)
+                time.sleep(GATEWAY_REFRESH_WAIT)
+                entry = self.get_arp_entry(gateway_ip, max_age=0)
+                now = time.time()
+                with self._gateway_lock:
+                    if entry:
+                        self._gateway_macs[gateway_ip] = {
+                            "MAC": entry["MAC"],
+                            "Интерфейс": entry.get("Интерфейс"),
+                            "checked": now
+                        }
+            except Exception as e:
+                logging.error(f"Ошибка при обновлении MAC-адреса шлюза {gateway_ip}: {e}")
+            finally:
+                with self._gateway_lock:
+                    self._gateway_refreshing.discard(gateway_ip)
+
+        get_probe_pool().submit(refresh)
+
     def _get_mac_vendor(self, mac):
         """
         Определяет производителя по MAC-адресу
@@ -377,64 +529,8 @@ class NetworkMonitor:
         if not mac or mac == "Не определен":
             return None
         
-        # Преобразуем MAC в стандартный формат без разделителей
-        mac = mac.replace('-', '').replace(':', '').replace('.', '').upper()
-        if len(mac) < 6:
-            return None
-        
-        # Берем первые 6 символов (OUI - Organizationally Unique Identifier)
-        oui = mac[0:6]
-        
-        # Базовый список известных производителей сетевого оборудования
-        vendors = {
-            # Cisco
-            "00000C": "Cisco", "000142": "Cisco", "000143": "Cisco", "000163": "Cisco", 
-            "000164": "Cisco", "000196": "Cisco", "000197": "Cisco", "0001C7": "Cisco",
-            "0001C9": "Cisco", "000216": "Cisco", "000217": "Cisco", "00022D": "Cisco",
-            "000F8F": "Cisco", "001007": "Cisco", "001111": "Cisco", "0016C7": "Cisco",
-            "001A2F": "Cisco", "001C7E": "Cisco", "001DA1": "Cisco", "001EBD": "Cisco",
-            "001F6C": "Cisco", "00223A": "Cisco", "002413": "Cisco", "002584": "Cisco",
-            # TP-Link
-            "000AEB": "TP-Link", "001018": "TP-Link", "0019E0": "TP-Link", "001D0F": "TP-Link",
-            "002127": "TP-Link", "5C63BF": "TP-Link", "645601": "TP-Link", "78C3E9": "TP-Link",
-            "8CFABA": "TP-Link", "94D9B3": "TP-Link", "A0F3C1": "TP-Link", "C4E984": "TP-Link",
-            "D8150D": "TP-Link", "EC172F": "TP-Link", "EC888F": "TP-Link", "F4EC38": "TP-Link",
-            # D-Link
-            "00055D": "D-Link", "000D88": "D-Link", "000F3D": "D-Link", "001195": "D-Link",
-            "0015E9": "D-Link", "00179A": "D-Link", "0019D1": "D-Link", "001B11": "D-Link",
-            "001CF0": "D-Link", "001E58": "D-Link", "002191": "D-Link", "0022B0": "D-Link",
-            "14D64D": "D-Link", "1C7EE5": "D-Link", "28107B": "D-Link", "3CBDD8": "D-Link",
-            # Huawei
-            "00259E": "Huawei", "001882": "Huawei", "00464B": "Huawei", "0C2C54": "Huawei",
-            "105172": "Huawei", "283152": "Huawei", "2CAB00": "Huawei", "3CDFBD": "Huawei",
-            "48AD08": "Huawei", "4C5499": "Huawei", "4CB16C": "Huawei", "547595": "Huawei",
-            "585F5A": "Huawei", "5CB395": "Huawei", "70725C": "Huawei", "78D752": "Huawei",
-            # ASUS
-            "001BFC": "ASUS", "001E8C": "ASUS", "002354": "ASUS", "00248C": "ASUS",
-            "0026ED": "ASUS", "00E018": "ASUS", "08606E": "ASUS", "107B44": "ASUS",
-            "149EDC": "ASUS", "1C872C": "ASUS", "305A3A": "ASUS", "38D547": "ASUS",
-            "485B39": "ASUS", "50465D": "ASUS", "54A050": "ASUS", "60A44C": "ASUS",
-            # Netgear
-            "00095B": "Netgear", "000FB5": "Netgear", "00146C": "Netgear", "001882": "Netgear",
-            "001E2A": "Netgear", "00224E": "Netgear", "002611": "Netgear", "008EF2": "Netgear",
-            "04A151": "Netgear", "08028E": "Netgear", "0826B9": "Netgear", "0C5415": "Netgear",
-            "100C6B": "Netgear", "10DA43": "Netgear", "205D47": "Netgear", "28C68E": "Netgear",
-            # Mikrotik
-            "001107": "MikroTik", "001149": "MikroTik", "00126E": "MikroTik", "001313": "MikroTik",
-            "0014D1": "MikroTik", "0015D5": "MikroTik", "0016C9": "MikroTik", "0017D1": "MikroTik",
-            "0021A5": "MikroTik", "002326": "MikroTik", "002401": "MikroTik", "0025B3": "MikroTik",
-            "002700": "MikroTik", "002728": "MikroTik", "00273F": "MikroTik", "002755": "MikroTik",
-            # ZyXEL
-            "001349": "ZyXEL", "00617C": "ZyXEL", "009C02": "ZyXEL", "105F06": "ZyXEL",
-            "18E225": "ZyXEL", "2C6BF5": "ZyXEL", "40B620": "ZyXEL", "547975": "ZyXEL",
-            "58863B": "ZyXEL", "5CA39D": "ZyXEL", "94638C": "ZyXEL", "A0E4CB": "ZyXEL",
-            "B0B20F": "ZyXEL", "B4C6F8": "ZyXEL", "BCEC23": "ZyXEL", "CC5D4E": "ZyXEL"
-        }
-        
-        if oui in vendors:
-            return vendors[oui]
-        
-        return None
+        # Поиск по базе префиксов IEEE (MA-S, MA-M, MA-L), загружаемой при первом обращении
+        return lookup_vendor(mac)
     
     def get_disk_io(self):
         """
@@ -651,6 +747,11 @@ class NetworkMonitor:
     
     def is_special_ip(self, ip):
         """Проверяет, является ли IP-адрес служебным"""
+        # IPv4-адреса проверяются по таблицам масок без создания объектов ipaddress
+        special = ipv4.is_special_ip(ip)
+        if special is not None:
+            return special
+        
         try:
             # Проверка с помощью библиотеки ipaddress
             ip_obj = ipaddress.ip_address(ip)
@@ -767,22 +868,27 @@ class NetworkMonitor:
         """
         Определяет подсеть IP-адреса и возвращает её
         
+        Для адресов из сетей локальных интерфейсов используется реальная маска
+        интерфейса, для остальных адресов маска неизвестна и считается /24.
+        
         Args:
             ip_address (str): IP-адрес для проверки
             
         Returns:
-            str: Подсеть в формате "A.B.C.0", где A.B.C - первые три октета IP-адреса
+            str: Подсеть в формате CIDR, например "192.168.0.0/22"
         """
-        if not ip_address or self.is_special_ip(ip_address):
+        if not ip_address:
             return None
-            
-        # Разбиваем IP-адрес на октеты
-        octets = ip_address.split('.')
-        if len(octets) != 4:
+        
+        value = ipv4.ip_to_int(ip_address)
+        if value is None or ipv4.is_special(value):
             return None
-            
-        # Возвращаем подсеть (первые три октета + ".0")
-        return f"{octets[0]}.{octets[1]}.{octets[2]}.0"
+        
+        for network, prefix, cidr in self._get_local_network_ranges():
+            if ipv4.in_network(value, network, prefix):
+                return cidr
+        
+        return f"{ipv4.int_to_ip(ipv4.network_of(value, 24))}/24"
     
     def is_same_subnet(self, ip1, ip2):
         """
@@ -801,79 +907,113 @@ class NetworkMonitor:
         if subnet1 is None or subnet2 is None:
             return False
             
-        # Сравниваем первые три октета
         return subnet1 == subnet2
     
-    def scan_network(self, start_subnet_index=0, start_batch=1):
+    def scan_network(self, start_subnet_index=0, start_batch=0, max_scan_time=120):
         """
         Активное сканирование сети для обнаружения всех устройств
         Использует улучшенный универсальный алгоритм сканирования
-        :param start_subnet_index: Индекс для начала сканирования при возобновлении
-        :param start_batch: Номер батча для начала сканирования
-        :return: Словарь с обнаруженными устройствами и флагом завершения
+        
+        Сети делятся на рабочие блоки (батчи). После каждого блока прогресс
+        сохраняется в контрольную точку на диске, поэтому прерванное или
+        ограниченное по времени сканирование продолжается с того же блока,
+        даже после перезапуска программы.
+        
+        :param start_subnet_index: Индекс сети, с которой начинать сканирование
+        :param start_batch: Номер рабочего блока в этой сети, с которого начинать
+        :param max_scan_time: Ограничение времени одного запуска в секундах
+        :return: Словарь с устройствами, флагом завершения и позицией для продолжения
         """
         try:
             # Получаем список всех IP-адресов интерфейсов
             interfaces = self.get_network_interfaces()
-            subnets = []
             
-            discovered_devices = {}
             completed = True  # Флаг завершения сканирования
             
-            # Получаем все подсети для сканирования
+            # Оставляем активные физические интерфейсы, VPN и виртуальные пропускаем
+            scan_interfaces = {}
             for interface_name, interface in interfaces.items():
-                # Пропускаем неактивные интерфейсы
                 if not interface.get('Активен', False):
                     continue
-                    
-                # Пропускаем VPN и виртуальные интерфейсы
                 if self._is_virtual_adapter(interface_name, interface.get('Описание', '')):
                     continue
-                
-                # Определяем подсеть для каждого интерфейса
-                ip_list = interface.get('IP', [])
-                if isinstance(ip_list, str):
-                    ip_list = [ip_list]
-                
-                for ip in ip_list:
-                    if ip and not self.is_special_ip(ip):
-                        subnet = self.get_subnet(ip)
-                        if subnet and subnet not in subnets:
-                            subnets.append(subnet)
+                scan_interfaces[interface_name] = interface
+            
+            # Сети берем по реальным маскам интерфейсов и делим на рабочие блоки
+            planner = ScanPlanner()
+            subnets = planner.networks_for_interfaces(scan_interfaces, skip_ip=self.is_special_ip)
             
             # Если подсетей не найдено, используем стандартную
             if not subnets:
-                subnets = ["192.168.1.0/24"]
-            
-            # Устанавливаем максимальное время сканирования (в секундах)
-            max_scan_time = 120
+                subnets = [ipaddress.IPv4Network("192.168.1.0/24")]
+            
+            # Продолжаем незавершенное сканирование того же плана: уже пройденные
+            # блоки пропускаются, найденные в них устройства восстанавливаются
+            if self._scan_checkpoint.load(subnets):
+                if (start_subnet_index, start_batch) == (0, 0):
+                    start_subnet_index = self._scan_checkpoint.subnet_index
+                    start_batch = self._scan_checkpoint.batch
+                logging.info(f"Продолжение сканирования с сети {start_subnet_index}, блока {start_batch}")
+            
+            discovered_devices = dict(self._scan_checkpoint.devices)
+            local_ips = self._get_local_ipv4_addresses()
             start_time = time.time()
             
-            # Для каждой подсети запускаем сканирование
-            for subnet_index, subnet in enumerate(subnets[start_subnet_index:], start_subnet_index):
-                # Пропускаем, если время сканирования превышено
-                current_time = time.time()
-                if current_time - start_time > max_scan_time:
-                    completed = False
-                    break
+            self.current_subnet_index = start_subnet_index
+            self.current_batch = start_batch
+            
+            for subnet_index, subnet in enumerate(subnets):
+                if subnet_index < start_subnet_index:
+                    continue
                 
-                # Используем универсальный алгоритм сканирования
-                subnet_devices = self._scan_network_alternative(subnet)
+                units = planner.split(subnet, exclude=local_ips)
+                for unit in units:
+                    if subnet_index == start_subnet_index and unit.index < start_batch:
+                        continue
+                    if self._scan_checkpoint.is_done(subnet, unit.index):
+                        continue
+                    
+                    # Прерываемся, если время сканирования превышено
+                    if time.time() - start_time > max_scan_time:
+                        completed = False
+                        break
+                    
+                    self.current_subnet_index = subnet_index
+                    self.current_batch = unit.index
+                    
+                    # Используем универсальный алгоритм сканирования для рабочего блока
+                    unit_devices = self._scan_network_alternative(str(unit.network), hosts=unit.hosts)
+                    
+                    # Объединяем результаты
+                    for ip, device in unit_devices.items():
+                        if ip not in discovered_devices:
+                            discovered_devices[ip] = device
+                    
+                    if unit.index + 1 < len(units):
+                        next_position = (subnet_index, unit.index + 1)
+                    else:
+                        next_position = (subnet_index + 1, 0)
+                    self._scan_checkpoint.mark_done(subnet, unit.index, unit_devices, next_position)
+                    self.current_subnet_index, self.current_batch = next_position
                 
-                # Объединяем результаты
-                for ip, device in subnet_devices.items():
-                    if ip not in discovered_devices:
-                        discovered_devices[ip] = device
+                if not completed:
+                    break
             
             # Если сканирование не было завершено полностью
             if not completed:
-                # Запоминаем индекс последней сканированной подсети для возможности продолжения
+                # Возвращаем позицию, с которой нужно продолжить
                 return {
                     "devices": discovered_devices,
                     "completed": completed,
-                    "subnet_index": subnet_index
+                    "subnet_index": self.current_subnet_index,
+                    "batch": self.current_batch
                 }
             
+            # Весь план пройден - контрольная точка больше не нужна
+            self._scan_checkpoint.clear()
+            self.current_subnet_index = 0
+            self.current_batch = 0
+            
             return {
                 "devices": discovered_devices,
                 "completed": completed
@@ -909,6 +1049,78 @@ class NetworkMonitor:
         """
         Получает информацию о всех шлюзах из всех сетевых адаптеров
         Возвращает список словарей с информацией о шлюзах, отсортированный по приоритету
+
+        Маршруты по умолчанию читаются из таблицы маршрутизации ядра на каждом
+        вызове (это дешево), а список шлюзов перестраивается только когда
+        маршруты изменились. Разбор ipconfig остается запасным вариантом.
+        """
+        try:
+            routes = read_default_routes()
+        except Exception as e:
+            logging.error(f"Ошибка при чтении таблицы маршрутизации: {e}")
+            routes = None
+
+        if routes is not None:
+            key = tuple(routes)
+            if self._gateway_cache is None or self._gateway_cache[0] != key:
+                self._gateway_cache = (key, self._build_gateways_from_routes(routes))
+            return list(self._gateway_cache[1])
+
+        return self._get_gateways_from_ipconfig()
+
+    def _build_gateways_from_routes(self, routes):
+        """
+        Строит список шлюзов из маршрутов по умолчанию
+
+        Args:
+            routes (list): Кортежи (шлюз, интерфейс, метрика) из read_default_routes(),
+                           отсортированные по метрике
+
+        Returns:
+            list: Словари шлюзов в том же формате, что и при разборе ipconfig
+        """
+        interface_ips = {}
+        try:
+            for name, addrs in psutil.net_if_addrs().items():
+                for addr in addrs:
+                    if addr.family == socket.AF_INET:
+                        interface_ips.setdefault(name, addr.address)
+        except Exception as e:
+            logging.error(f"Ошибка при получении адресов интерфейсов: {e}")
+        names_by_ip = {ip: name for name, ip in interface_ips.items()}
+
+        gateways = []
+        seen = set()
+        for gateway_ip, interface, metric in routes:
+            if gateway_ip in seen:
+                continue
+            seen.add(gateway_ip)
+
+            # На Linux интерфейс задан именем, на Windows - адресом адаптера
+            if interface in interface_ips:
+                name, adapter_ip = interface, interface_ips[interface]
+            elif interface in names_by_ip:
+                name, adapter_ip = names_by_ip[interface], interface
+            else:
+                name, adapter_ip = interface or "Неизвестный адаптер", None
+
+            is_virtual = self._is_virtual_adapter(name, name) or self._is_virtual_ip(gateway_ip)
+            gateways.append({
+                "name": name,
+                "description": name,
+                "IP": adapter_ip,
+                "gateway": gateway_ip,
+                "is_virtual": is_virtual,
+                "priority": self._calculate_gateway_priority(gateway_ip, is_virtual)
+            })
+
+        # Сортировка устойчивая, поэтому при равном приоритете сохраняется порядок метрик
+        gateways.sort(key=lambda x: x["priority"])
+        return gateways
+
+    def _get_gateways_from_ipconfig(self):
+        """
+        Получает шлюзы разбором вывода ipconfig /all и route print (только Windows)
         """
         gateways = []
         
@@ -1079,69 +1291,7 @@ class NetworkMonitor:
         Returns:
             str: Тип устройства ("Маршрутизатор", "Коммутатор", "Компьютер" и т.д.)
         """
-        # Если MAC отсутствует или не определен
-        if not mac or mac == "Не определен":
-            if is_gateway:
-                return "Маршрутизатор"
-            return "Неизвестное устройство"
-        
-        # Нормализуем MAC-адрес для проверки
-        mac_lower = mac.lower().replace('-', ':').replace('.', ':')
-        
-        # Получаем название производителя
-        vendor = self._get_mac_vendor(mac)
-        vendor_lower = vendor.lower() if vendor else ""
-        
-        # Префиксы MAC-адресов известных производителей коммутаторов
-        switch_prefixes = [
-            # Cisco Catalyst коммутаторы
-            "00:1a:a1", "00:1b:54", "00:21:1b", "00:23:5e", "00:25:45", 
-            # HP/Aruba коммутаторы
-            "00:0e:b3", "00:14:c2", "00:16:b9", "00:1f:fe", "24:be:05", 
-            # Dell коммутаторы
-            "00:1e:c9", "14:fe:b5", "24:b6:fd", "f8:ca:b8", "f8:db:88",
-            # Juniper коммутаторы
-            "00:05:85", "00:10:db", "2c:6b:f5", "28:8a:1c", "54:1e:56"
-        ]
-        
-        # Определение на основе префикса MAC
-        for prefix in switch_prefixes:
-            if mac_lower.startswith(prefix.lower()):
-                return "Коммутатор"
-        
-        # Определение на основе имени производителя
-        switch_vendors = ["cisco systems", "cisco switch", "d-link switch", "hp procurve", 
-                          "hp enterprise", "juniper networks", "aruba", "allied telesis", 
-                          "netgear switch", "dell switch", "brocade", "extreme networks"]
-        
-        for switch_vendor in switch_vendors:
-            if switch_vendor in vendor_lower:
-                return "Коммутатор"
-                
-        # Проверка на маршрутизатор по производителю
-        router_vendors = ["tp-link technologies", "mikrotik", "asus router", "d-link router", 
-                          "netgear router", "cisco router", "huawei router", "zyxel", "edge router", 
-                          "ubiquiti", "sagemcom", "actiontec", "arris", "technicolor"]
-        
-        for router_vendor in router_vendors:
-            if router_vendor in vendor_lower:
-                return "Маршрутизатор"
-        
-        # Если устройство является шлюзом, проверяем дополнительные признаки коммутатора
-        if is_gateway:
-            # Если есть признаки коммутатора в имени производителя
-            switch_keywords = ["switch", "коммутатор", "dell powerconnect", "juniper ex", 
-                              "cisco catalyst", "hp procurve", "hp switch", "aruba switch"]
-            
-            for keyword in switch_keywords:
-                if vendor_lower and keyword in vendor_lower:
-                    return "Коммутатор"
-                
-            # По умолчанию считаем шлюз маршрутизатором, если нет явных признаков коммутатора
-            return "Маршрутизатор"
-        
-        # По умолчанию считаем устройство компьютером
-        return "Компьютер"
+        return self._classifier.classify(ip, mac, is_gateway)
 
     def _check_common_ports(self, ip, timeout=0.5):
         """
@@ -1155,31 +1305,257 @@ class NetworkMonitor:
         Returns:
             bool: True если хотя бы один порт открыт, False в противном случае
         """
-        # Добавляем порты, часто используемые мобильными устройствами
-        # HTTP, HTTPS, SSH, Telnet, FTP, mDNS, DLNA/UPnP, SNMP, AirPlay, Chromecast
-        common_ports = [80, 443, 22, 23, 21, 5353, 1900, 161, 7000, 8008, 8009, 32768, 32769, 49152, 62078]
+        open_ports = self._probe_ports([ip], timeout).get(ip)
+        return bool(open_ports)
+
+    def _probe_ports(self, ips, timeout=0.5):
+        """
+        Проверяет популярные порты сразу у всех адресов движком PortProbeEngine
+        
+        Args:
+            ips (list): IP-адреса для проверки
+            timeout (float): Таймаут соединения в секундах
+            
+        Returns:
+            dict: {ip: set открытых портов} для хостов, ответивших на TCP
+        """
+        if not ips:
+            return {}
+        
+        try:
+            responsive = PortProbeEngine(timeout=timeout).probe(ips)
+        except Exception as e:
+            logging.error(f"Ошибка при проверке портов: {e}")
+            return {}
+        
+        logging.info(f"Проверка портов у {len(ips)} адресов: ответили {len(responsive)}")
+        # Открытые порты помогают уточнить тип устройства
+        for ip, open_ports in responsive.items():
+            if open_ports:
+                self._classifier.observe(ip, ports=open_ports)
+        return responsive
+
+    def _get_local_ipv4_addresses(self):
+        """
+        Возвращает множество IPv4-адресов всех интерфейсов этого компьютера
+        """
+        addresses = set()
+        try:
+            for addrs in psutil.net_if_addrs().values():
+                for addr in addrs:
+                    if addr.family == socket.AF_INET:
+                        addresses.add(addr.address)
+        except Exception as e:
+            logging.error(f"Ошибка при получении локальных адресов: {e}")
+        return addresses
+
+    def _ip_in_network(self, ip, network):
+        """
+        Проверяет принадлежность IPv4-адреса сети IPv4Network
+        """
+        value = ipv4.ip_to_int(ip)
+        if value is None:
+            return False
+        return ipv4.in_network(value, int(network.network_address), network.prefixlen)
+
+    def _get_local_networks(self):
+        """
+        Возвращает реальные сети (по маскам) активных интерфейсов.
+        Результат кэшируется на несколько секунд, так как вызывается для каждого устройства
+        """
+        now = time.time()
+        cached = getattr(self, '_local_networks_cache', None)
+        if cached and now - cached[0] < 10:
+            return cached[1]
+        
+        networks = []
+        try:
+            active = {name: iface for name, iface in self.get_network_interfaces().items()
+                      if iface.get('Активен', False)}
+            networks = ScanPlanner().networks_for_interfaces(active, skip_ip=self.is_special_ip)
+        except Exception as e:
+            logging.error(f"Ошибка при определении локальных сетей: {e}")
+        
+        self._local_networks_cache = (now, networks)
+        self._local_network_ranges = [(int(n.network_address), n.prefixlen, str(n)) for n in networks]
+        return networks
+
+    def _get_local_network_ranges(self):
+        """
+        Сети локальных интерфейсов в виде (адрес сети числом, префикс, строка CIDR)
+        """
+        self._get_local_networks()
+        return self._local_network_ranges
+
+    def _mark_device_active(self, ip, current_time):
+        """
+        Отмечает устройство активным в истории обнаруженных устройств
+        """
+        if ip in self._devices_history:
+            self._devices_history[ip]["last_active"] = current_time
+            self._devices_history[ip]["active"] = True
+        else:
+            self._devices_history[ip] = {
+                "last_active": current_time,
+                "active": True,
+                "first_seen": current_time
+            }
+
+    def _sweep_hosts(self, ips):
+        """
+        Опрашивает список адресов асинхронным движком SweepEngine
+        
+        Args:
+            ips (list): IP-адреса для проверки
+            
+        Returns:
+            dict: {ip: {"Метод", "RTT", "TTL"}} для ответивших хостов
+        """
+        if not ips:
+            return {}
+        
+        if self._sweep_engine is None:
+            self._sweep_engine = SweepEngine()
+        
+        try:
+            responded = self._sweep_engine.sweep(ips)
+            logging.info(f"Опрос {len(ips)} адресов ({self._sweep_engine.last_method}): ответили {len(responded)}")
+            # TTL ответа уточняет тип устройства (сетевое оборудование отвечает с TTL 255)
+            for ip, info in responded.items():
+                if info.get("TTL"):
+                    self._classifier.observe(ip, ttl=info["TTL"])
+            return responded
+        except Exception as e:
+            logging.error(f"Ошибка асинхронного опроса хостов: {e}")
+            return self._ping_sweep_fallback(ips)
+
+    def _arp_sweep(self, network, hosts):
+        """
+        ARP-сканирование сети
+        
+        На Linux используется встроенный ArpSweeper (raw-сокет AF_PACKET),
+        Scapy остается запасным вариантом для других систем и для случая,
+        когда raw-сокет открыть нельзя.
         
-        for port in common_ports:
+        Args:
+            network (IPv4Network): Сканируемая сеть
+            hosts (list): Адреса для опроса
+            
+        Returns:
+            tuple: ({ip: MAC}, название метода) или ({}, None)
+        """
+        if ArpSweeper.available():
+            interface = self._interface_for_network(network)
+            if interface:
+                try:
+                    replies = ArpSweeper().sweep(hosts, *interface)
+                    return {ip: reply["MAC"] for ip, reply in replies.items()}, "ARP"
+                except OSError as e:
+                    logging.info(f"Встроенное ARP-сканирование недоступно: {e}")
+        
+        if SCAPY_AVAILABLE:
             try:
-                sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-                sock.settimeout(timeout)
-                result = sock.connect_ex((ip, port))
-                sock.close()
-                if result == 0:  # Порт открыт
-                    return True
-            except:
-                pass
+                # Создаем ARP-запрос для всей подсети
+                arp_request_broadcast = (scapy_all.Ether(dst="ff:ff:ff:ff:ff:ff") /
+                                         scapy_all.ARP(pdst=str(network)))
+                
+                # Отправляем запрос с небольшим таймаутом
+                answered, _ = scapy_all.srp(arp_request_broadcast, timeout=2, verbose=False)
+                return {received.psrc: received.hwsrc for _, received in answered}, "Scapy"
+            except Exception as e:
+                logging.error(f"Ошибка при сканировании через Scapy: {e}")
         
-        return False
+        return {}, None
 
-    def _scan_network_alternative(self, subnet=None, max_devices=30):
+    def _interface_for_network(self, network):
+        """
+        Находит интерфейс, подключенный к сети
+        
+        Сеть может быть рабочим блоком плана (например, /24 из /22), в который
+        адрес интерфейса не попадает, поэтому блок сравнивается и с сетью
+        интерфейса по его маске
+        
+        Returns:
+            tuple: (имя интерфейса, IPv4-адрес, MAC-адрес) или None
+        """
+        try:
+            for name, addrs in psutil.net_if_addrs().items():
+                address = next((a.address for a in addrs if a.family == socket.AF_INET
+                                and self._interface_serves(a, network)), None)
+                mac = next((a.address for a in addrs if a.family == psutil.AF_LINK), None)
+                if address and mac and len(mac.replace('-', ':')) == 17:
+                    return name, address, mac
+        except Exception as e:
+            logging.error(f"Ошибка при поиске интерфейса сети {network}: {e}")
+        return None
+
+    def _interface_serves(self, addr, network):
+        """
+        Проверяет, что сеть network доступна напрямую с IPv4-адреса интерфейса addr
+        """
+        if self._ip_in_network(addr.address, network):
+            return True
+        if not addr.netmask:
+            return False
+        try:
+            interface_network = ipaddress.IPv4Network(f"{addr.address}/{addr.netmask}", strict=False)
+        except ValueError:
+            return False
+        return network.subnet_of(interface_network)
+
+    def resolve_neighbors(self, ips, wait=NEIGHBOR_RESOLVE_WAIT):
+        """
+        Разрешает MAC-адреса списка соседей одним проходом
+        
+        Адресам, которых нет в текущем снимке ARP-таблицы, одновременно
+        отправляются датаграммы (ядро рассылает ARP-запросы), затем после
+        одного общего ожидания таблица читается один раз. Время не зависит
+        от числа адресов.
+        
+        Args:
+            ips (list): IP-адреса соседей
+            wait (float): Время ожидания ответов на ARP-запросы, в секундах
+            
+        Returns:
+            dict: {ip: запись ARP-таблицы} для адресов, у которых известен MAC
+        """
+        if not ips:
+            return {}
+        
+        known = self.get_arp_snapshot().by_ip
+        resolved = {ip: known[ip] for ip in ips if ip in known}
+        missing = [ip for ip in ips if ip not in resolved]
+        if not missing:
+            return resolved
+        
+        if touch_neighbors(missing):
+            time.sleep(wait)
+        fresh = self.get_arp_snapshot(max_age=0).by_ip
+        for ip in missing:
+            if ip in fresh:
+                resolved[ip] = fresh[ip]
+        return resolved
+
+    def _ping_sweep_fallback(self, ips):
+        """
+        Резервный опрос через системный ping, если движок SweepEngine не смог работать
+        (например, сокеты запрещены политикой безопасности)
+        """
+        pool = get_probe_pool()
+        alive = pool.map(self._ping_ip, ips)
+        logging.info(f"Опрос через ping: {pool.metrics()}")
+        return {ip: {"Метод": "PING", "RTT": None, "TTL": None}
+                for ip, is_alive in zip(ips, alive) if is_alive}
+
+    def _scan_network_alternative(self, subnet=None, max_devices=30, hosts=None):
         """
         Улучшенный универсальный алгоритм сканирования сети, объединяющий различные методы
         обнаружения устройств для работы в домашних и корпоративных сетях.
         
         Args:
-            subnet (str): Подсеть для сканирования (если None, используется текущая подсеть)
-            max_devices (int): Максимальное количество устройств для проверки
+            subnet (str): Подсеть в формате CIDR (если None, используется подсеть локального IP)
+            max_devices (int): Максимальное количество адресов для проверки портов
+            hosts (list): Адреса для опроса (по умолчанию - все хосты подсети по плану ScanPlanner)
             
         Returns:
             dict: Словарь обнаруженных устройств
@@ -1199,67 +1575,56 @@ class NetworkMonitor:
                 # Если не можем определить подсеть, используем стандартную
                 subnet = "192.168.1.0/24"
         
-        # Удаляем ".0" из конца подсети, если она есть и добавляем "/24"
+        # Подсеть без префикса ("A.B.C.0") считаем /24
         if '/' not in subnet:
-            base_ip = subnet.split('/')[0].rsplit('.', 1)[0]
-            subnet = f"{base_ip}.0/24"
-        else:
-            base_ip = subnet.split('/')[0].rsplit('.', 1)[0]
-        
-        # 2. Пытаемся использовать Scapy, если она доступна
-        if SCAPY_AVAILABLE:
-            try:
-                # Создаем ARP-запрос для всей подсети
-                arp_request = ARP(pdst=subnet)
-                broadcast = Ether(dst="ff:ff:ff:ff:ff:ff")
-                arp_request_broadcast = broadcast / arp_request
-                
-                # Отправляем запрос с небольшим таймаутом
-                answered, _ = srp(arp_request_broadcast, timeout=2, verbose=False)
+            subnet = f"{subnet}/24"
+        network = ipaddress.IPv4Network(subnet, strict=False)
+        subnet = str(network)
+        
+        local_ips = self._get_local_ipv4_addresses()
+        if hosts is None:
+            hosts = [ip for unit in ScanPlanner().split(network, exclude=local_ips) for ip in unit.hosts]
+        
+        # 2. Рассылаем ARP-запросы всей сети: встроенным сканером через AF_PACKET,
+        #    а если он недоступен - через Scapy
+        arp_replies, arp_method = self._arp_sweep(network, hosts)
+        for ip, mac in arp_replies.items():
+            if not self.is_special_ip(ip) and not self.is_special_mac(mac):
+                # Сохраняем статус и время последней активности
+                if ip in self._devices_history:
+                    self._devices_history[ip]["last_active"] = current_time
+                    self._devices_history[ip]["active"] = True
+                else:
+                    self._devices_history[ip] = {
+                        "last_active": current_time,
+                        "active": True,
+                        "first_seen": current_time
+                    }
                 
-                # Обрабатываем ответы
-                for sent, received in answered:
-                    ip = received.psrc
-                    mac = received.hwsrc
-                    
-                    if not self.is_special_ip(ip) and not self.is_special_mac(mac):
-                        # Проверяем, активно ли устройство
-                        is_active = True
-                        
-                        # Сохраняем статус и время последней активности
-                        if ip in self._devices_history:
-                            self._devices_history[ip]["last_active"] = current_time
-                            self._devices_history[ip]["active"] = True
-                        else:
-                            self._devices_history[ip] = {
-                                "last_active": current_time,
-                                "active": True,
-                                "first_seen": current_time
-                            }
-                        
-                        # Определяем тип устройства
-                        device_type = self._determine_device_type(ip, mac)
-                        
-                        discovered_devices[ip] = {
-                            "IP": ip,
-                            "MAC": mac,
-                            "Тип": device_type,
-                            "Метод": "Scapy",
-                            "Статус": "Активно"
-                        }
+                # Определяем тип устройства
+                device_type = self._determine_device_type(ip, mac)
                 
-                # Если Scapy нашел устройства, можно вернуть результат
-                if discovered_devices:
-                    logging.info(f"Scapy успешно обнаружил {len(discovered_devices)} устройств")
-                    # Но продолжим сканирование другими методами для повышения надежности
-            except Exception as e:
-                logging.error(f"Ошибка при сканировании через Scapy: {e}")
+                discovered_devices[ip] = {
+                    "IP": ip,
+                    "MAC": mac,
+                    "Тип": device_type,
+                    "Метод": arp_method,
+                    "Статус": "Активно"
+                }
+        
+        if discovered_devices:
+            # Продолжаем сканирование другими методами для повышения надежности
+            logging.info(f"ARP-сканирование ({arp_method}) обнаружило {len(discovered_devices)} устройств")
         
         # 3. Собираем устройства из ARP-таблицы (этот метод работает даже когда пинги заблокированы)
         arp_entries = self.get_arp_table()
+        # Адреса сканируемой сети без служебных отбираются одним пакетным проходом
+        arp_ips = [entry.get("IP") for entry in arp_entries]
+        network_ips = {arp_ips[i] for i in ipv4.filter_addresses(
+            arp_ips, int(network.network_address), network.prefixlen)}
         for entry in arp_entries:
             ip = entry.get("IP")
-            if ip and not self.is_special_ip(ip):
+            if ip in network_ips:
                 mac = entry.get("MAC", "Не определен")
                 if not self.is_special_mac(mac):
                     # Если устройство не было обнаружено через Scapy
@@ -1296,165 +1661,72 @@ class NetworkMonitor:
                                 "Статус": active_status
                             }
         
-        # 4. Если обнаружено мало устройств, используем параллельное сканирование (как в module_from_seti.py)
-        if len(discovered_devices) < max_devices // 2:
-            import threading
-            
-            # Список потоков
-            threads = []
-            # Блокировка для безопасного доступа к общим данным
-            lock = threading.Lock()
-            
-            # Функция для проверки одного IP-адреса
-            def check_ip(ip):
-                try:
-                    if ip not in discovered_devices and not self.is_special_ip(ip):
-                        # Используем ping для проверки доступности
-                        if os.name == 'nt':  # Windows
-                            ping_cmd = ['ping', '-n', '1', '-w', '100', ip]
-                        else:  # Linux/Mac
-                            ping_cmd = ['ping', '-c', '1', '-W', '1', ip]
-                        
-                        # Запускаем ping
-                        result = subprocess.run(ping_cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
-                        ping_success = (result.returncode == 0)
-                        
-                        # Если ping успешен, получаем MAC из ARP-таблицы
-                        if ping_success:
-                            # Пингуем еще раз, чтобы обновить ARP-таблицу
-                            subprocess.run(ping_cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
-                            
-                            # Получаем MAC-адрес из ARP-таблицы
-                            mac = "Не определен"
-                            for entry in self.get_arp_table():
-                                if entry["IP"] == ip:
-                                    mac = entry["MAC"]
-                                    break
-                            
-                            # Безопасно добавляем устройство в словарь
-                            with lock:
-                                if ip not in discovered_devices and not self.is_special_mac(mac):
-                                    # Обновляем историю устройств
-                                    if ip in self._devices_history:
-                                        self._devices_history[ip]["last_active"] = current_time
-                                        self._devices_history[ip]["active"] = True
-                                    else:
-                                        self._devices_history[ip] = {
-                                            "last_active": current_time,
-                                            "active": True,
-                                            "first_seen": current_time
-                                        }
-                                    
-                                    # Определяем тип устройства
-                                    device_type = self._determine_device_type(ip, mac)
-                                    
-                                    discovered_devices[ip] = {
-                                        "IP": ip,
-                                        "MAC": mac,
-                                        "Тип": device_type,
-                                        "Метод": "PING",
-                                        "Статус": "Активно"
-                                    }
-                except Exception:
-                    pass
-            
-            # Сначала сканируем наиболее вероятные IP-адреса
-            common_last_octets = [1, 2, 3, 254, 100, 101, 10, 20, 30, 40, 50, 60, 70, 80, 90, 110, 120, 130, 140, 150]
-            for last_octet in common_last_octets:
-                ip = f"{base_ip}.{last_octet}"
-                thread = threading.Thread(target=check_ip, args=(ip,))
-                thread.start()
-                threads.append(thread)
-            
-            # Ожидаем завершения потоков
-            for thread in threads:
-                thread.join()
-            
-            # Если все еще мало устройств, сканируем остальные IP-адреса с шагом
-            if len(discovered_devices) < max_devices:
-                threads = []
-                step = max(1, 254 // (max_devices * 2))  # Увеличиваем шаг для сканирования меньшего числа IP
-                
-                for last_octet in range(1, 255, step):
-                    # Пропускаем уже проверенные IP
-                    if last_octet in common_last_octets:
-                        continue
-                    
-                    ip = f"{base_ip}.{last_octet}"
-                    thread = threading.Thread(target=check_ip, args=(ip,))
-                    thread.start()
-                    threads.append(thread)
-                    
-                    # Ограничиваем количество одновременных потоков
-                    if len(threads) >= 20:
-                        for t in threads:
-                            t.join()
-                        threads = []
+        # 4. Опрашиваем всю подсеть одним асинхронным проходом вместо потока и процесса ping
+        #    на каждый адрес, MAC-адреса берем из одного чтения ARP-таблицы в конце
+        candidates = [hosts[i] for i in ipv4.filter_addresses(hosts)
+                      if hosts[i] not in discovered_devices and hosts[i] not in local_ips]
+        
+        responded = self._sweep_hosts(candidates)
+        if responded:
+            arp_by_ip = self.get_arp_snapshot(max_age=0).by_ip
+            for ip, reply in responded.items():
+                mac = arp_by_ip[ip]["MAC"] if ip in arp_by_ip else "Не определен"
+                if self.is_special_mac(mac):
+                    continue
                 
-                # Ожидаем завершения оставшихся потоков
-                for thread in threads:
-                    thread.join()
+                self._mark_device_active(ip, current_time)
+                discovered_devices[ip] = {
+                    "IP": ip,
+                    "MAC": mac,
+                    "Тип": self._determine_device_type(ip, mac),
+                    "Метод": reply["Метод"],
+                    "Статус": "Активно"
+                }
         
-        # 5. Проверяем порты для устройств, которые не ответили на ping
+        # 5. Проверяем порты у всех адресов, которые не ответили на ping, одним проходом.
+        #    TCP-соединение само обновляет ARP-запись, поэтому таблица читается один раз
         if len(discovered_devices) < max_devices:
-            # Проверяем порты у IP-адресов с шагом
-            step = max(1, 254 // max_devices)
-            for last_octet in range(1, 255, step):
-                ip = f"{base_ip}.{last_octet}"
-                if ip not in discovered_devices and not self.is_special_ip(ip):
-                    # Проверяем порты
-                    if self._check_common_ports(ip):
-                        # Пытаемся пинговать для обновления ARP-таблицы
-                        self._ping_ip(ip)
-                        
-                        # Ищем MAC-адрес
-                        mac = "Не определен"
-                        for entry in self.get_arp_table():
-                            if entry["IP"] == ip:
-                                mac = entry["MAC"]
-                                break
-                        
-                        if not self.is_special_mac(mac):
-                            # Обновляем историю устройств
-                            if ip in self._devices_history:
-                                self._devices_history[ip]["last_active"] = current_time
-                                self._devices_history[ip]["active"] = True
-                            else:
-                                self._devices_history[ip] = {
-                                    "last_active": current_time,
-                                    "active": True,
-                                    "first_seen": current_time
-                                }
-                            
-                            # Определяем тип устройства
-                            device_type = self._determine_device_type(ip, mac)
-                            
-                            discovered_devices[ip] = {
-                                "IP": ip,
-                                "MAC": mac,
-                                "Тип": device_type,
-                                "Метод": "PORT",
-                                "Статус": "Активно"
-                            }
-        
-        # 6. Пингуем все обнаруженные устройства для обновления ARP-таблицы
-        for ip in list(discovered_devices.keys()):
-            try:
-                subprocess.call(f"ping -n 1 {ip}", shell=True, 
-                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
-            except:
-                pass
+            silent = [ip for ip in candidates if ip not in discovered_devices]
+            responsive = self._probe_ports(silent)
+            arp_by_ip = self.get_arp_snapshot(max_age=0).by_ip if responsive else {}
+            for ip in silent:
+                if ip not in responsive:
+                    continue
+                entry = arp_by_ip.get(ip)
+                mac = entry["MAC"] if entry else "Не определен"
+                
+                if not self.is_special_mac(mac):
+                    # Обновляем историю устройств
+                    if ip in self._devices_history:
+                        self._devices_history[ip]["last_active"] = current_time
+                        self._devices_history[ip]["active"] = True
+                    else:
+                        self._devices_history[ip] = {
+                            "last_active": current_time,
+                            "active": True,
+                            "first_seen": current_time
+                        }
+                
+                    # Определяем тип устройства
+                    device_type = self._determine_device_type(ip, mac)
+                
+                    discovered_devices[ip] = {
+                        "IP": ip,
+                        "MAC": mac,
+                        "Тип": device_type,
+                        "Метод": "PORT",
+                        "Статус": "Активно"
+                    }
         
-        # 7. Обновляем MAC-адреса для всех обнаруженных устройств
-        updated_arp = self.get_arp_table()
-        for entry in updated_arp:
-            ip = entry.get("IP")
-            if ip in discovered_devices and discovered_devices[ip].get("MAC") == "Не определен":
-                discovered_devices[ip]["MAC"] = entry.get("MAC", "Не определен")
-                # Обновляем тип устройства на основе MAC
-                discovered_devices[ip]["Тип"] = self._determine_device_type(ip, entry.get("MAC"))
+        # 6. Разрешаем MAC-адреса всех устройств без MAC одним проходом
+        unresolved = [ip for ip, device in discovered_devices.items()
+                      if device.get("MAC") == "Не определен"]
+        for ip, entry in self.resolve_neighbors(unresolved).items():
+            discovered_devices[ip]["MAC"] = entry["MAC"]
+            # Обновляем тип устройства на основе MAC
+            discovered_devices[ip]["Тип"] = self._determine_device_type(ip, entry["MAC"])
         
-        # 8. Очистка истории устройств (удаляем устройства, не видимые более 2 часов)
+        # 7. Очистка истории устройств (удаляем устройства, не видимые более 2 часов)
         cleanup_time = current_time - 7200  # 2 часа
         ips_to_remove = [ip for ip, data in self._devices_history.items() 
                          if data["last_active"] < cleanup_time]
@@ -1463,30 +1735,23 @@ class NetworkMonitor:
         
         return discovered_devices
 
-class NetworkMonitorThread(QThread):
+class NetworkMonitorThread(PollingThread):
     """
     Поток для обновления информации о сетевой активности
     """
-    update_signal = pyqtSignal(dict)
+    interval = 2.0
     
     def __init__(self):
         super().__init__()
         self.monitor = NetworkMonitor()
-        self._running = True
-    
-    def run(self):
-        while self._running:
-            data = {
-                "interfaces": self.monitor.get_network_interfaces(),
-                "stats": self.monitor.get_network_stats(),
-                "arp_table": self.monitor.get_arp_table(),
-                "gateway": self.monitor.get_gateway_info()
-            }
-            self.update_signal.emit(data)
-            time.sleep(2)
     
-    def stop(self):
-        self._running = False
+    def poll(self):
+        return {
+            "interfaces": self.monitor.get_network_interfaces(),
+            "stats": self.monitor.get_network_stats(),
+            "arp_table": self.monitor.get_arp_table(),
+            "gateway": self.monitor.get_gateway_info()
+        }
 
 class NetworkInfoTab(QWidget):
     """
@@ -1509,23 +1774,24 @@ class NetworkInfoTab(QWidget):
         interfaces_layout = QVBoxLayout()
         
         # Таблица интерфейсов
-        self.interfaces_table = QTableWidget()
-        self.interfaces_table.setColumnCount(7)
-        self.interfaces_table.setHorizontalHeaderLabels([
+        self.interfaces_model = SnapshotTableModel([
             "Интерфейс", "IP адрес", "Маска сети", "MAC адрес", 
             "Статус", "MTU", "Скорость"
-        ])
+        ], parent=self)
+        self.interfaces_table = QTableView()
+        self.interfaces_table.setModel(self.interfaces_model)
+        self.interfaces_table.verticalHeader().setVisible(False)
         self.interfaces_table.setColumnWidth(0, 150)
         self.interfaces_table.setColumnWidth(1, 120)
         self.interfaces_table.setColumnWidth(2, 120)
         self.interfaces_table.setColumnWidth(3, 150)
         # Делаем таблицу нередактируемой
-        self.interfaces_table.setEditTriggers(QTableWidget.NoEditTriggers)
-        self.interfaces_table.setSelectionBehavior(QTableWidget.SelectRows)
+        self.interfaces_table.setEditTriggers(QTableView.NoEditTriggers)
+        self.interfaces_table.setSelectionBehavior(QTableView.SelectRows)
         
         # Применяем стили к таблицам
         table_style = """
-            QTableWidget {
+            QTableView {
                 border: 1px solid #c0c8e0;
                 border-radius: 0px;
                 background-color: white;
@@ -1533,11 +1799,11 @@ class NetworkInfoTab(QWidget):
                 selection-color: #1976D2;
                 gridline-color: #e0e6f0;
             }
-            QTableWidget::item {
+            QTableView::item {
                 padding: 3px;
                 border-bottom: 1px solid #f0f5ff;
             }
-            QTableWidget::item:selected {
+            QTableView::item:selected {
                 background-color: #e3f2fd;
                 color: #1976D2;
             }
@@ -1570,15 +1836,16 @@ class NetworkInfoTab(QWidget):
         stats_layout = QVBoxLayout()
         
         # Таблица статистики
-        self.stats_table = QTableWidget()
-        self.stats_table.setColumnCount(5)
-        self.stats_table.setHorizontalHeaderLabels([
+        self.stats_model = SnapshotTableModel([
             "Интерфейс", "Отправлено (МБ)", "Получено (МБ)", 
             "Отправлено пакетов", "Получено пакетов"
-        ])
+        ], parent=self)
+        self.stats_table = QTableView()
+        self.stats_table.setModel(self.stats_model)
+        self.stats_table.verticalHeader().setVisible(False)
         # Делаем таблицу нередактируемой
-        self.stats_table.setEditTriggers(QTableWidget.NoEditTriggers)
-        self.stats_table.setSelectionBehavior(QTableWidget.SelectRows)
+        self.stats_table.setEditTriggers(QTableView.NoEditTriggers)
+        self.stats_table.setSelectionBehavior(QTableView.SelectRows)
         self.stats_table.setStyleSheet(table_style)
         
         stats_layout.addWidget(self.stats_table)
@@ -1592,83 +1859,52 @@ class NetworkInfoTab(QWidget):
         self.update_gateway_info()
         self.update_stats_table()
     
-    def update_interface_table(self):
-        interfaces = self.monitor.get_network_interfaces()
-        
-        self.interfaces_table.setRowCount(len(interfaces))
-        
-        for row, (interface, info) in enumerate(interfaces.items()):
-            self.interfaces_table.setItem(row, 0, QTableWidgetItem(interface))
+    @staticmethod
+    def _interface_rows(interfaces):
+        rows = []
+        for interface, info in interfaces.items():
             # Преобразуем список IP-адресов в строку
             ip_text = ", ".join(info["IP"]) if isinstance(info["IP"], list) else str(info["IP"])
             netmask_text = ", ".join(info["Маска сети"]) if isinstance(info["Маска сети"], list) else str(info["Маска сети"])
-            
-            self.interfaces_table.setItem(row, 1, QTableWidgetItem(ip_text))
-            self.interfaces_table.setItem(row, 2, QTableWidgetItem(netmask_text))
-            self.interfaces_table.setItem(row, 3, QTableWidgetItem(info["MAC"]))
-            self.interfaces_table.setItem(row, 4, QTableWidgetItem("Активен" if info["Активен"] else "Неактивен"))
-            self.interfaces_table.setItem(row, 5, QTableWidgetItem(str(info["MTU"])))
-            self.interfaces_table.setItem(row, 6, QTableWidgetItem(info["Скорость"]))
+            rows.append((interface, ip_text, netmask_text, info["MAC"],
+                         "Активен" if info["Активен"] else "Неактивен", info["MTU"], info["Скорость"]))
+        return rows
+    
+    @staticmethod
+    def _stats_rows(stats):
+        return [(interface, info["Отправлено (МБ)"], info["Получено (МБ)"],
+                 info["Отправлено пакетов"], info["Получено пакетов"])
+                for interface, info in stats.items()]
+    
+    def update_interface_table(self, interfaces=None):
+        if interfaces is None:
+            interfaces = self.monitor.get_network_interfaces()
+        self.interfaces_model.set_rows(self._interface_rows(interfaces))
     
-    def update_gateway_info(self):
-        gateway = self.monitor.get_gateway_info()
+    def update_gateway_info(self, gateway=None):
+        if gateway is None:
+            gateway = self.monitor.get_gateway_info()
         
         if gateway:
-            self.gateway_info.setText(
-                f"<span style='color: #2196F3; font-weight: bold;'>IP адрес:</span> {gateway['IP']}\n"
-                f"<span style='color: #2196F3; font-weight: bold;'>MAC адрес:</span> {gateway['MAC']}"
-            )
+            age = gateway.get("Возраст MAC")
+            freshness = f" <span style='color: #607D8B;'>({int(age)} с назад)</span>" if age is not None else ""
+            text = (f"<span style='color: #2196F3; font-weight: bold;'>IP адрес:</span> {gateway['IP']}\n"
+                    f"<span style='color: #2196F3; font-weight: bold;'>MAC адрес:</span> {gateway['MAC']}{freshness}")
         else:
-            self.gateway_info.setText("<span style='color: #607D8B; font-style: italic;'>Нет информации о шлюзе</span>")
+            text = "<span style='color: #607D8B; font-style: italic;'>Нет информации о шлюзе</span>"
+        # QLabel заново раскладывает rich text при каждом setText, даже если текст тот же
+        if text != self.gateway_info.text():
+            self.gateway_info.setText(text)
     
-    def update_stats_table(self):
-        stats = self.monitor.get_network_stats()
-        
-        self.stats_table.setRowCount(len(stats))
-        
-        for row, (interface, info) in enumerate(stats.items()):
-            self.stats_table.setItem(row, 0, QTableWidgetItem(interface))
-            self.stats_table.setItem(row, 1, QTableWidgetItem(str(info["Отправлено (МБ)"])))
-            self.stats_table.setItem(row, 2, QTableWidgetItem(str(info["Получено (МБ)"])))
-            self.stats_table.setItem(row, 3, QTableWidgetItem(str(info["Отправлено пакетов"])))
-            self.stats_table.setItem(row, 4, QTableWidgetItem(str(info["Получено пакетов"])))
+    def update_stats_table(self, stats=None):
+        if stats is None:
+            stats = self.monitor.get_network_stats()
+        self.stats_model.set_rows(self._stats_rows(stats))
     
     def update_data(self, data):
-        interfaces = data["interfaces"]
-        
-        self.interfaces_table.setRowCount(len(interfaces))
-        
-        for row, (interface, info) in enumerate(interfaces.items()):
-            self.interfaces_table.setItem(row, 0, QTableWidgetItem(interface))
-            # Преобразуем список IP-адресов в строку
-            ip_text = ", ".join(info["IP"]) if isinstance(info["IP"], list) else str(info["IP"])
-            netmask_text = ", ".join(info["Маска сети"]) if isinstance(info["Маска сети"], list) else str(info["Маска сети"])
-            
-            self.interfaces_table.setItem(row, 1, QTableWidgetItem(ip_text))
-            self.interfaces_table.setItem(row, 2, QTableWidgetItem(netmask_text))
-            self.interfaces_table.setItem(row, 3, QTableWidgetItem(info["MAC"]))
-            self.interfaces_table.setItem(row, 4, QTableWidgetItem("Активен" if info["Активен"] else "Неактивен"))
-            self.interfaces_table.setItem(row, 5, QTableWidgetItem(str(info["MTU"])))
-            self.interfaces_table.setItem(row, 6, QTableWidgetItem(info["Скорость"]))
-        
-        gateway = data["gateway"]
-        if gateway:
-            self.gateway_info.setText(
-                f"<span style='color: #2196F3; font-weight: bold;'>IP адрес:</span> {gateway['IP']}\n"
-                f"<span style='color: #2196F3; font-weight: bold;'>MAC адрес:</span> {gateway['MAC']}"
-            )
-        else:
-            self.gateway_info.setText("<span style='color: #607D8B; font-style: italic;'>Нет информации о шлюзе</span>")
-        
-        stats = data["stats"]
-        self.stats_table.setRowCount(len(stats))
-        
-        for row, (interface, info) in enumerate(stats.items()):
-            self.stats_table.setItem(row, 0, QTableWidgetItem(interface))
-            self.stats_table.setItem(row, 1, QTableWidgetItem(str(info["Отправлено (МБ)"])))
-            self.stats_table.setItem(row, 2, QTableWidgetItem(str(info["Получено (МБ)"])))
-            self.stats_table.setItem(row, 3, QTableWidgetItem(str(info["Отправлено пакетов"])))
-            self.stats_table.setItem(row, 4, QTableWidgetItem(str(info["Получено пакетов"])))
+        self.update_interface_table(data["interfaces"])
+        self.update_gateway_info(data["gateway"] or {})
+        self.update_stats_table(data["stats"])
 
 class ARPTableTab(QWidget):
     """
@@ -1696,31 +1932,32 @@ class ARPTableTab(QWidget):
         header_layout.addStretch()
         
         # Создаем таблицу для отображения ARP записей
-        self.arp_table = QTableWidget()
-        self.arp_table.setColumnCount(3)
-        self.arp_table.setHorizontalHeaderLabels([
+        self.arp_model = SnapshotTableModel([
             "IP адрес", 
             "MAC адрес", 
             "Тип устройства"
-        ])
+        ], parent=self)
+        self.arp_table = QTableView()
+        self.arp_table.setModel(self.arp_model)
+        self.arp_table.verticalHeader().setVisible(False)
         
         # Устанавливаем свойства таблицы
         self.arp_table.setAlternatingRowColors(True)
         # Делаем таблицу нередактируемой
-        self.arp_table.setEditTriggers(QTableWidget.NoEditTriggers)
-        self.arp_table.setSelectionBehavior(QTableWidget.SelectRows)
+        self.arp_table.setEditTriggers(QTableView.NoEditTriggers)
+        self.arp_table.setSelectionBehavior(QTableView.SelectRows)
         self.arp_table.setStyleSheet("""
-            QTableWidget {
+            QTableView {
                 background-color: white;
                 gridline-color: #e0e0e0;
                 border: 1px solid #d0d0d0;
                 border-radius: 4px;
             }
-            QTableWidget::item {
+            QTableView::item {
                 padding: 4px;
                 border-bottom: 1px solid #f0f0f0;
             }
-            QTableWidget::item:selected {
+            QTableView::item:selected {
                 background-color: #e6f2ff;
                 color: #2196F3;
             }
@@ -1733,7 +1970,7 @@ class ARPTableTab(QWidget):
                 font-weight: bold;
                 color: #424242;
             }
-            QTableWidget::item:hover {
+            QTableView::item:hover {
                 background-color: #f5f5f5;
             }
         """)
@@ -1754,37 +1991,25 @@ class ARPTableTab(QWidget):
         # Подключаем сигнал обновления данных
         self.monitor_thread.update_signal.connect(self.update_data)
     
-    def update_arp_table(self):
+    def update_arp_table(self, arp_data=None):
         """
         Обновляет таблицу ARP записей
         """
         # Получаем данные ARP таблицы
-        arp_data = self.monitor_thread.monitor.get_arp_table()
+        if arp_data is None:
+            arp_data = self.monitor_thread.monitor.get_arp_table()
         
-        # Очищаем таблицу
-        self.arp_table.setRowCount(0)
-        
-        # Заполняем таблицу данными
-        for i, record in enumerate(arp_data):
-            self.arp_table.insertRow(i)
-            self.arp_table.setItem(i, 0, QTableWidgetItem(record.get("IP", "N/A")))
-            self.arp_table.setItem(i, 1, QTableWidgetItem(record.get("MAC", "N/A")))
-            self.arp_table.setItem(i, 2, QTableWidgetItem(record.get("Тип", "N/A")))
+        self.arp_model.set_rows([
+            (record.get("IP", "N/A"), record.get("MAC", "N/A"), record.get("Тип", "N/A"))
+            for record in arp_data
+        ])
     
     def update_data(self, data):
         """
         Обновляет данные от потока мониторинга
         """
         if "arp_table" in data:
-            # Очищаем таблицу
-            self.arp_table.setRowCount(0)
-            
-            # Заполняем таблицу данными
-            for i, record in enumerate(data["arp_table"]):
-                self.arp_table.insertRow(i)
-                self.arp_table.setItem(i, 0, QTableWidgetItem(record.get("IP", "N/A")))
-                self.arp_table.setItem(i, 1, QTableWidgetItem(record.get("MAC", "N/A")))
-                self.arp_table.setItem(i, 2, QTableWidgetItem(record.get("Тип", "N/A")))
+            self.update_arp_table(data["arp_table"])
 
 class NetworkTopologyCanvas(QWidget):
     """
@@ -1796,6 +2021,23 @@ class NetworkTopologyCanvas(QWidget):
         self.devices = []
         self.connections = []
         self.selected_device = None
+        self.gateway = None
+        self.trace_hops = []
+        # Режим раскладки и позиции силовой раскладки, полученные из потока
+        self.layout_mode = LAYOUT_HIERARCHICAL
+        self._tree_positions = None
+        self._force_positions = {}
+        self._positions_version = 0
+        self._layout_generation = 0
+        self._layout_threads = []
+        if QApplication.instance() is not None:
+            QApplication.instance().aboutToQuit.connect(self.stop_layout)
+        # Линии соединений одним путем; ключ - позиции, по которым путь построен
+        self._connections_path = QPainterPath()
+        self._connections_key = None
+        # Готовые изображения иконок и подписей устройств (до setStyleSheet,
+        # который уже вызывает changeEvent)
+        self.icon_atlas = IconAtlas()
         self.setMinimumHeight(450)
         self.setMinimumWidth(600)
         self.setStyleSheet("background-color: #FFFFFF; border: 2px solid #cccccc; border-radius: 4px;")
@@ -1814,6 +2056,14 @@ class NetworkTopologyCanvas(QWidget):
         # Базовый размер иконок (не меняется при масштабировании)
         self.base_icon_size = 45
         
+        # Кэш раскладки: позиции и сетка для поиска устройств пересчитываются
+        # только при изменении данных (set_data), размера холста или масштаба
+        self.router = None
+        self._data_version = 0
+        self._layout_key = None
+        self._positions = {}
+        self._grid = SpatialGrid(self.base_icon_size)
+        
         # Цвета для лучшего восприятия
         self.colors = {
             "router_fill": QColor(231, 76, 60),  # Красный из Flat UI Colors
@@ -1863,10 +2113,8 @@ class NetworkTopologyCanvas(QWidget):
             painter.translate(self.offset_x, self.offset_y)
             painter.scale(self.scale, self.scale)
             
-            # Рассчитываем позиции устройств
-            width = self.width() / self.scale
-            height = self.height() / self.scale
-            positions = self._calculate_positions(width, height)
+            # Позиции устройств (из кэша, если данные и размеры не менялись)
+            positions = self._layout()
             
             # Рисуем соединения между устройствами
             self._draw_connections(painter, positions)
@@ -1874,7 +2122,9 @@ class NetworkTopologyCanvas(QWidget):
             # Восстанавливаем трансформацию перед рисованием устройств
             painter.restore()
             
-            # Рисуем устройства с фиксированным размером независимо от масштаба
+            # Рисуем устройства с фиксированным размером независимо от масштаба;
+            # при переходе окна на экран с другой плотностью пикселей атлас очищается
+            self.icon_atlas.set_device_pixel_ratio(self.devicePixelRatioF())
             self._draw_scaled_devices(painter, positions)
             
         except Exception as e:
@@ -1902,65 +2152,19 @@ class NetworkTopologyCanvas(QWidget):
         for y in range(int(offset_y), self.height() + grid_size, grid_size):
             painter.drawLine(0, y, self.width(), y)
     
-    def _calculate_positions(self, width, height):
-        """
-        Размещение устройств с маршрутизатором в центре
-        """
-        positions = {}
-        
-        # Находим шлюз и классифицируем устройства
-        gateway = None
-        for device in self.devices:
-            if device.get("Тип") == "Маршрутизатор":
-                gateway = device
-                break
-            
-        other_devices = [d for d in self.devices if d != gateway]
-        
-        # Определяем центр области отображения
-        center_x = width / 2
-        center_y = height / 2
-        
-        # Увеличиваем радиус для большего расстояния между устройствами
-        radius = min(width, height) * 0.4
-        
-        # Шлюз размещаем в центре
-        if gateway:
-            gateway_ip = gateway["IP"]
-            if isinstance(gateway_ip, list):
-                gateway_ip = gateway_ip[0]
-            positions[gateway_ip] = QPointF(center_x, center_y)
-        
-        # Равномерно распределяем остальные устройства по окружности
-        if other_devices:
-            # Вычисляем угол между устройствами
-            angle_step = 2 * math.pi / len(other_devices)
-            
-            # Начинаем с верхней точки окружности
-            start_angle = -math.pi / 2
-            
-            for i, device in enumerate(other_devices):
-                # Вычисляем угол для текущего устройства
-                angle = start_angle + i * angle_step
-                
-                # Вычисляем координаты
-                x = center_x + radius * math.cos(angle)
-                y = center_y + radius * math.sin(angle)
-                
-                # Получаем IP для позиционирования
-                device_ip = device["IP"]
-                if isinstance(device_ip, list):
-                    device_ip = device_ip[0]
-                
-                positions[device_ip] = QPointF(x, y)
-        
-        return positions
-    
     def _draw_scaled_devices(self, painter, positions):
         """
         Рисует устройства с учетом масштаба, но с фиксированным размером иконок
         """
-        for device in self.devices:
+        selected_ips = ()
+        if self.selected_device is not None:
+            selected_ips = self.selected_device["IP"] if isinstance(self.selected_device["IP"], list) else [self.selected_device["IP"]]
+        hover_ips = ()
+        if self.hover_device is not None:
+            hover_ips = self.hover_device["IP"] if isinstance(self.hover_device["IP"], list) else [self.hover_device["IP"]]
+        
+        # Рисуем только устройства в области просмотра (с запасом на подпись)
+        for device in self._visible_devices(DEVICE_PAINT_MARGIN):
             device_ips = device["IP"] if isinstance(device["IP"], list) else [device["IP"]]
             # Используем первый IP-адрес для позиционирования
             ip = device_ips[0]
@@ -1971,117 +2175,41 @@ class NetworkTopologyCanvas(QWidget):
                     positions[ip].y() * self.scale + self.offset_y
                 )
                 
-                is_selected = False
-                if self.selected_device is not None:
-                    selected_ips = self.selected_device["IP"] if isinstance(self.selected_device["IP"], list) else [self.selected_device["IP"]]
-                    is_selected = any(ip in device_ips for ip in selected_ips)
-                
-                is_hovered = False
-                if self.hover_device is not None:
-                    hover_ips = self.hover_device["IP"] if isinstance(self.hover_device["IP"], list) else [self.hover_device["IP"]]
-                    is_hovered = any(ip in device_ips for ip in hover_ips)
+                is_selected = any(ip in device_ips for ip in selected_ips)
+                is_hovered = any(ip in device_ips for ip in hover_ips)
                 
                 # Рисуем устройство с фиксированным размером
                 self._draw_device_fixed_size(painter, scaled_pos, device, is_selected, is_hovered)
     
     def _draw_device_fixed_size(self, painter, position, device, is_selected=False, is_hovered=False):
         """
-        Рисует устройство фиксированного размера с улучшенным определением типа
+        Рисует устройство фиксированного размера с улучшенным определением типа.
+        Иконка и подпись рисуются один раз в атлас изображений, а здесь только
+        копируются на холст
         """
-        # Сохраняем текущее состояние художника
-        painter.save()
-        
-        # Получаем тип устройства, статус и дополнительные атрибуты
-        device_type = device.get("Тип", "Неизвестное устройство")
-        is_virtual_interface = False  # По умолчанию не виртуальный интерфейс
-        
         # Проверяем статус устройства (активно/неактивно)
         device_status = device.get("Статус", "Активно")
         is_active = device_status == "Активно"
         
         # Проверяем IP адреса виртуальных интерфейсов
+        is_virtual_interface = False  # По умолчанию не виртуальный интерфейс
         if isinstance(device.get("IP", ""), str):
             known_virtual_interfaces = ["192.168.204.254", "192.168.10.254"]
             is_virtual_interface = device.get("IP", "") in known_virtual_interfaces
         
-        # Размер устройства
-        device_size = QSize(40, 40)
-        if is_selected:
-            device_size = QSize(45, 45)  # Увеличиваем размер выделенного устройства
-        
-        # Создаем прямоугольник для отрисовки устройства
-        rect = QRectF(position.x() - device_size.width() / 2, 
-                     position.y() - device_size.height() / 2,
-                     device_size.width(), device_size.height())
+        # Размер устройства: выделенное устройство немного крупнее
+        size = 45 if is_selected else 40
+        kind = self._device_icon_kind(device, is_virtual_interface)
         
-        # Обрабатываем эффект подсветки при наведении или выделении
-        if is_hovered or is_selected:
-            try:
-                # Создаем эффект сияния вокруг устройства
-                glow_radius = 10
-                glow_rect = rect.adjusted(-glow_radius, -glow_radius, glow_radius, glow_radius)
-                
-                # Создаем радиальный градиент для эффекта сияния
-                gradient = QRadialGradient(rect.center(), glow_radius + rect.width() / 2)
-                
-                if is_selected:
-                    # Яркое свечение для выделенного устройства
-                    gradient.setColorAt(0, QColor(52, 152, 219, 150))
-                    gradient.setColorAt(0.7, QColor(52, 152, 219, 80))
-                    gradient.setColorAt(1, QColor(52, 152, 219, 0))
-                else:
-                    # Более мягкое свечение для наведения
-                    gradient.setColorAt(0, QColor(52, 152, 219, 100))
-                    gradient.setColorAt(0.8, QColor(52, 152, 219, 40))
-                    gradient.setColorAt(1, QColor(52, 152, 219, 0))
-                
-                painter.setBrush(gradient)
-                painter.setPen(Qt.NoPen)
-                painter.drawEllipse(glow_rect.center(), glow_radius + rect.width() / 2, glow_radius + rect.width() / 2)
-            except Exception as e:
-                # В случае ошибки с градиентом, просто пропускаем его отрисовку
-                print(f"Ошибка при создании градиента: {str(e)}")
-        
-        # Если устройство неактивно, рисуем вокруг него серую полупрозрачную рамку
-        if not is_active:
-            # Создаем эффект "отключения" для неактивных устройств
-            inactive_rect = rect.adjusted(-5, -5, 5, 5)
-            painter.setBrush(Qt.NoBrush)
-            painter.setPen(QPen(QColor(100, 100, 100, 120), 2, Qt.DashLine))
-            painter.drawEllipse(inactive_rect)
-        
-        # Определяем, какое устройство рисовать
-        if device.get("Локальный", False):
-            self._draw_local_computer(painter, rect)
-        elif "Маршрутизатор" in device_type:
-            # Получаем дополнительные атрибуты маршрутизатора
-            is_primary = device.get("Основной", False)
-            is_virtual = device.get("Виртуальный", False)
-            
-            # Выбираем метод отрисовки в зависимости от типа маршрутизатора
-            if is_primary and not is_virtual:
-                # Основной физический маршрутизатор
-                self._draw_router_primary(painter, rect)
-            elif is_virtual:
-                # Виртуальный маршрутизатор
-                self._draw_router_virtual(painter, rect)
-            else:
-                # Обычный маршрутизатор
-                self._draw_router(painter, rect)
-        elif "Коммутатор" in device_type:
-            self._draw_switch(painter, rect)
-        elif "Компьютер" in device_type or is_virtual_interface:
-            # Проверяем подсеть устройства
-            is_same_subnet = device.get("СамаяПодсеть", True)  # По умолчанию считаем из той же подсети
-            
-            # Если это виртуальный интерфейс, используем специальный метод отрисовки
-            if is_virtual_interface:
-                self._draw_virtual_interface(painter, rect)
-            else:
-                self._draw_computer(painter, rect, is_same_subnet)
-        else:
-            # Для всех других устройств используем прежний метод отрисовки
-            self._draw_other_device(painter, rect)
+        # Иконка вместе с подсветкой и рамкой неактивного устройства
+        sprite_size = size + 2 * ICON_SPRITE_MARGIN
+        icon = self.icon_atlas.get(
+            ("icon", kind, size, is_selected, is_hovered, is_active), sprite_size, sprite_size,
+            lambda icon_painter, area: self._render_device_icon(
+                icon_painter, area, kind, size, is_selected, is_hovered, is_active))
+        # Целые координаты: изображение копируется без пересчета пикселей
+        painter.drawPixmap(QPoint(int(round(position.x() - sprite_size / 2)),
+                                  int(round(position.y() - sprite_size / 2))), icon)
         
         # Получаем IP-адрес для отображения
         ip_address = ""
@@ -2093,59 +2221,145 @@ class NetworkTopologyCanvas(QWidget):
                 if len(device_ip) > 1:
                     ip_address += " +"
             else:
-                ip_address = str(device_ip)
+                ip_address = str(device_ip)
+        
+        # Добавляем маркеры статуса к тексту IP-адреса
+        if not is_active:
+            ip_address = ip_address + " [!]"
+        
+        label_key = ("label", ip_address, is_selected, is_active, is_virtual_interface)
+        label = self.icon_atlas.find(label_key)
+        if label is None:
+            # Размер подписи зависит от шрифта, поэтому считается только при первой отрисовке
+            label_width, label_height = self._label_size(ip_address, is_selected, is_virtual_interface)
+            label = self.icon_atlas.get(label_key, label_width, label_height,
+                                        lambda label_painter, area: self._render_device_label(
+                                            label_painter, area, ip_address, is_selected, is_active,
+                                            is_virtual_interface))
+        # Подпись под иконкой, по центру
+        label_width = label.width() / label.devicePixelRatio()
+        painter.drawPixmap(QPoint(int(round(position.x() - label_width / 2)),
+                                  int(round(position.y() + size / 2 + 5 - LABEL_MARGIN))), label)
+    
+    def _device_icon_kind(self, device, is_virtual_interface):
+        """Вид иконки устройства (ключ атласа и выбор метода отрисовки)"""
+        device_type = device.get("Тип", "Неизвестное устройство")
+        
+        if device.get("Локальный", False):
+            return "local"
+        if "Маршрутизатор" in device_type:
+            # Получаем дополнительные атрибуты маршрутизатора
+            is_primary = device.get("Основной", False)
+            is_virtual = device.get("Виртуальный", False)
+            if is_primary and not is_virtual:
+                # Основной физический маршрутизатор
+                return "router_primary"
+            if is_virtual:
+                return "router_virtual"
+            return "router"
+        if "Коммутатор" in device_type:
+            return "switch"
+        if "Компьютер" in device_type or is_virtual_interface:
+            if is_virtual_interface:
+                return "virtual_interface"
+            # По умолчанию считаем устройство из той же подсети
+            return "computer" if device.get("СамаяПодсеть", True) else "computer_other_subnet"
+        return "other"
+    
+    def _render_device_icon(self, painter, area, kind, size, is_selected, is_hovered, is_active):
+        """Рисует иконку устройства в центре области area (для атласа)"""
+        center = area.center()
+        rect = QRectF(center.x() - size / 2, center.y() - size / 2, size, size)
+        
+        # Обрабатываем эффект подсветки при наведении или выделении
+        if is_hovered or is_selected:
+            # Создаем эффект сияния вокруг устройства
+            glow_radius = 10
+            
+            # Создаем радиальный градиент для эффекта сияния
+            gradient = QRadialGradient(rect.center(), glow_radius + rect.width() / 2)
+            
+            if is_selected:
+                # Яркое свечение для выделенного устройства
+                gradient.setColorAt(0, QColor(52, 152, 219, 150))
+                gradient.setColorAt(0.7, QColor(52, 152, 219, 80))
+                gradient.setColorAt(1, QColor(52, 152, 219, 0))
+            else:
+                # Более мягкое свечение для наведения
+                gradient.setColorAt(0, QColor(52, 152, 219, 100))
+                gradient.setColorAt(0.8, QColor(52, 152, 219, 40))
+                gradient.setColorAt(1, QColor(52, 152, 219, 0))
+            
+            painter.setBrush(gradient)
+            painter.setPen(Qt.NoPen)
+            painter.drawEllipse(rect.center(), glow_radius + rect.width() / 2, glow_radius + rect.width() / 2)
         
-        # Добавляем маркеры статуса к тексту IP-адреса
+        # Если устройство неактивно, рисуем вокруг него серую полупрозрачную рамку
         if not is_active:
-            ip_address = ip_address + " [!]"
-        # Добавляем специальную метку для виртуального интерфейса
-        elif is_virtual_interface:
-            # Для расчета ширины будем использовать IP без маркера, а для отображения - с маркером
-            display_ip = ip_address + " (V)"
-        else:
-            display_ip = ip_address
-        
-        # Вычисляем примерную ширину текста (для виртуальных интерфейсов без маркера)
-        font_metrics = painter.fontMetrics()
-        text_width = font_metrics.width(ip_address)  # Ширина без (V) для виртуальных интерфейсов
+            # Создаем эффект "отключения" для неактивных устройств
+            inactive_rect = rect.adjusted(-5, -5, 5, 5)
+            painter.setBrush(Qt.NoBrush)
+            painter.setPen(QPen(QColor(100, 100, 100, 120), 2, Qt.DashLine))
+            painter.drawEllipse(inactive_rect)
         
-        # Определяем параметры прямоугольника в зависимости от типа устройства
-        if is_virtual_interface:
-            # Для виртуальных интерфейсов делаем минимальные отступы
-            padding = 0  # Нулевой отступ для виртуальных интерфейсов
-            rect_height = 12  # Ещё меньшая высота
-            adjust_x = 0  # Нет расширения по горизонтали
-            adjust_y = 0  # Нет расширения по вертикали
-            font_size = 6  # Самый мелкий шрифт
-            corner_radius = 2  # Меньшее закругление углов
+        if kind == "local":
+            self._draw_local_computer(painter, rect)
+        elif kind == "router_primary":
+            self._draw_router_primary(painter, rect)
+        elif kind == "router_virtual":
+            self._draw_router_virtual(painter, rect)
+        elif kind == "router":
+            self._draw_router(painter, rect)
+        elif kind == "switch":
+            self._draw_switch(painter, rect)
+        elif kind == "virtual_interface":
+            self._draw_virtual_interface(painter, rect)
+        elif kind in ("computer", "computer_other_subnet"):
+            self._draw_computer(painter, rect, kind == "computer")
         else:
-            display_ip = ip_address
-            # Для остальных устройств
-            padding = 5  # Стандартный минимальный отступ
-            rect_height = 16  # Стандартная высота
-            adjust_x = 2  # Стандартное расширение по горизонтали
-            adjust_y = 1  # Стандартное расширение по вертикали
-            font_size = 7  # Стандартный размер шрифта
-            corner_radius = 4  # Стандартное закругление углов
-        
-        # Рисуем текст с IP-адресом под устройством
-        text_rect = QRectF(
-            rect.center().x() - text_width/2 - padding, 
-            rect.bottom() + 5, 
-            text_width + padding*2,  # Размер рамки основан на ширине текста с запасом
-            rect_height  # Высота для отображения
-        )
-        
-        # Устанавливаем стиль текста
-        font = painter.font()
-        font.setPointSize(font_size)
+            # Для всех других устройств используем прежний метод отрисовки
+            self._draw_other_device(painter, rect)
+    
+    def _label_style(self, is_virtual_interface):
+        """Отступ, высота, расширение фона по x и y, размер шрифта и закругление подписи"""
+        if is_virtual_interface:
+            # Для виртуальных интерфейсов - минимальные отступы и самый мелкий шрифт
+            return 0, 12, 0, 0, 6, 2
+        return 5, 16, 2, 1, 7, 4
+    
+    def _label_font(self, is_selected, is_virtual_interface):
+        font = self.font()
+        font.setPointSize(self._label_style(is_virtual_interface)[4])
         if is_selected:
             font.setBold(True)
-        painter.setFont(font)
+        return font
+    
+    def _label_size(self, ip_address, is_selected, is_virtual_interface):
+        """
+        Размер изображения подписи: фон по ширине текста (ширина считается
+        шрифтом холста, как и раньше) плюс место для текста, который шире фона
+        """
+        padding, rect_height, adjust_x, adjust_y, _, _ = self._label_style(is_virtual_interface)
+        text_width = self.fontMetrics().width(ip_address)
+        display_ip = ip_address + " (V)" if is_virtual_interface else ip_address
+        drawn_width = QFontMetricsF(self._label_font(is_selected, is_virtual_interface)).width(display_ip)
+        width = max(text_width + 2 * padding + 2 * adjust_x, drawn_width) + 2 * LABEL_MARGIN
+        height = rect_height + 2 * adjust_y + 2 * LABEL_MARGIN
+        return int(math.ceil(width)), int(math.ceil(height))
+    
+    def _render_device_label(self, painter, area, ip_address, is_selected, is_active, is_virtual_interface):
+        """Рисует подпись с IP-адресом в центре области area (для атласа)"""
+        padding, rect_height, adjust_x, adjust_y, _, corner_radius = self._label_style(is_virtual_interface)
+        # Для виртуальных интерфейсов ширина фона считается без маркера (V)
+        text_width = self.fontMetrics().width(ip_address)
+        display_ip = ip_address + " (V)" if is_virtual_interface else ip_address
         
-        # Рисуем цветной фон для текста с более точным размером
-        text_bg = QRectF(text_rect)
-        text_bg.adjust(-adjust_x, -adjust_y, adjust_x, adjust_y)  # Расширение фона
+        text_bg = QRectF(0, 0, text_width + 2 * padding + 2 * adjust_x, rect_height + 2 * adjust_y)
+        text_bg.moveCenter(area.center())
+        # Текст центрируется по фону, но может выходить за его края
+        text_rect = QRectF(area.left(), text_bg.top() + adjust_y, area.width(), rect_height)
+        
+        painter.setFont(self._label_font(is_selected, is_virtual_interface))
         
         # Выбираем цвет фона в зависимости от статуса устройства
         if is_selected:
@@ -2170,15 +2384,17 @@ class NetworkTopologyCanvas(QWidget):
         else:
             painter.setPen(QColor(30, 30, 30))  # Почти черный для активных устройств
         
-        # Если устройство неактивно, применяем эффект полупрозрачности ко всему изображению
+        # Текст неактивного устройства полупрозрачный, даже если оно выделено
         if not is_active:
-            painter.setOpacity(0.6)  # Устанавливаем полупрозрачность для неактивных устройств
+            painter.setOpacity(0.6)
         
-        # Рисуем текст
         painter.drawText(text_rect, Qt.AlignCenter, display_ip)
-        
-        # Восстанавливаем состояние художника
-        painter.restore()
+    
+    def changeEvent(self, event):
+        # Смена темы, стиля или шрифта меняет вид иконок и подписей
+        if event.type() in (QEvent.PaletteChange, QEvent.StyleChange, QEvent.FontChange):
+            self.icon_atlas.clear()
+        super().changeEvent(event)
 
     def _draw_router_primary(self, painter, rect):
         """
@@ -2311,22 +2527,30 @@ class NetworkTopologyCanvas(QWidget):
     
     def _draw_connections(self, painter, positions):
         """
-        Рисует соединения между устройствами простыми линиями
+        Рисует соединения между устройствами простыми линиями: все линии
+        собраны в один путь, который рисуется одним вызовом
         """
         if not self.connections:
             return
         
+        # Путь строится заново, только если изменились соединения или позиции
+        if self._connections_key != self._layout_key:
+            path = QPainterPath()
+            for connection in self.connections:
+                start_pos = positions.get(connection["from"])
+                end_pos = positions.get(connection["to"])
+                if start_pos is not None and end_pos is not None:
+                    path.moveTo(start_pos)
+                    path.lineTo(end_pos)
+            self._connections_path = path
+            self._connections_key = self._layout_key
+        
         # Устанавливаем стиль линий
         pen = QPen(self.colors["connection"], 1.5)  # Уменьшаем толщину линий
         pen.setStyle(Qt.SolidLine)  # Сплошная линия
         painter.setPen(pen)
-        
-        # Рисуем линии соединений
-        for connection in self.connections:
-            if connection["from"] in positions and connection["to"] in positions:
-                start_pos = positions[connection["from"]]
-                end_pos = positions[connection["to"]]
-                painter.drawLine(start_pos, end_pos)
+        painter.setBrush(Qt.NoBrush)
+        painter.drawPath(self._connections_path)
     
     def _draw_router(self, painter, rect):
         """
@@ -2647,131 +2871,189 @@ class NetworkTopologyCanvas(QWidget):
         
         self.devices = devices
         
-        # Ищем маршрутизатор среди устройств
+        # Корень схемы - основной шлюз: явно переданный, отмеченный как основной
+        # или, если таких нет, первый маршрутизатор
         self.router = None
-        for device in self.devices:
-            if device.get("Тип") == "Маршрутизатор":
-                self.router = device
-                break
-        
-        # Устанавливаем соединения между устройствами
-        self.connections = []
+        if gateway:
+            self.router = next((device for device in self.devices
+                                if self._device_key(device) == gateway), None)
+        if self.router is None:
+            self.router = next((device for device in self.devices if device.get("Основной")), None)
+        if self.router is None:
+            self.router = next((device for device in self.devices
+                                if device.get("Тип") == "Маршрутизатор"), None)
         
-        # Если есть маршрутизатор, все устройства соединяем с ним
-        if self.router:
-            router_ip = self.router["IP"] if isinstance(self.router["IP"], str) else self.router["IP"][0]
-            for device in self.devices:
-                if device != self.router:  # Не соединяем маршрутизатор с самим собой
-                    device_ip = device["IP"] if isinstance(device["IP"], str) else device["IP"][0]
-                    self.connections.append({
-                        "from": router_ip,
-                        "to": device_ip
-                    })
-        else:
-            # Если нет маршрутизатора, соединяем все устройства каждое с каждым
-            for i, device1 in enumerate(self.devices):
-                device1_ip = device1["IP"] if isinstance(device1["IP"], str) else device1["IP"][0]
-                for j, device2 in enumerate(self.devices[i+1:], i+1):
-                    device2_ip = device2["IP"] if isinstance(device2["IP"], str) else device2["IP"][0]
-                    self.connections.append({
-                        "from": device1_ip,
-                        "to": device2_ip
-                    })
+        # Основной шлюз - явно переданный или найденный маршрутизатор
+        self.gateway = gateway if gateway else (self._device_key(self.router) if self.router else None)
+        self._update_connections()
         
-        # Рассчитываем позиции устройств
-        self._calculate_positions()
+        # Позиции устройств будут пересчитаны при следующей отрисовке
+        self._data_version += 1
         
         # Перерисовываем сцену
         self.update()
 
-    def _calculate_positions(self, width=None, height=None):
+    def set_trace_route(self, hops):
         """
-        Равномерное распределение устройств по окружности с маршрутизатором в центре
+        Задает адреса узлов последней трассировки: узлы, которые есть на схеме,
+        соединяются по цепочке от локального компьютера
         """
-        positions = {}
-        
-        # Если width и height не переданы, используем размеры виджета
-        if width is None:
-            width = self.width() / self.scale
-        if height is None:
-            height = self.height() / self.scale
-        
-        # Определяем центр области отображения
-        center_x = width / 2
-        center_y = height / 2
+        self.trace_hops = list(hops)
+        self._update_connections()
+        self._data_version += 1
+        self.update()
+    
+    def _update_connections(self):
+        """Пересчитывает соединения по подсетям, шлюзу и трассировке"""
+        self.connections = [{"from": first, "to": second}
+                            for first, second in infer_links(self.devices, self._device_key,
+                                                             self.gateway, self.trace_hops)]
+        # Путь с линиями соединений будет построен заново при отрисовке
+        self._connections_key = None
+        # Иерархическая раскладка зависит от соединений
+        self._tree_positions = None
+        self._start_force_layout()
+    
+    def set_layout_mode(self, mode):
+        """
+        Переключает раскладку схемы: LAYOUT_HIERARCHICAL, LAYOUT_FORCE или LAYOUT_CIRCULAR
+        """
+        if mode == self.layout_mode:
+            return
+        self.layout_mode = mode
+        self._start_force_layout()
+        self.update()
+    
+    def _start_force_layout(self):
+        """
+        Запускает расчет силовой раскладки в потоке (в режиме LAYOUT_FORCE).
+        Устройства, которые уже были на схеме, начинают с прежних позиций,
+        новые - с позиций иерархической раскладки
+        """
+        # Результаты прежних запусков больше не нужны
+        self._layout_generation += 1
+        for thread in self._layout_threads:
+            thread.stop()
         
-        # Сначала размещаем маршрутизатор в центре
-        if self.router:
-            router_ip = self.router["IP"]
-            if isinstance(router_ip, list):
-                router_ip = router_ip[0]
-            positions[router_ip] = QPointF(center_x, center_y)
+        if self.layout_mode != LAYOUT_FORCE or not self.devices:
+            return
         
-        # Находим все остальные устройства (не маршрутизатор)
-        other_devices = [d for d in self.devices if d != self.router]
+        keys = [self._device_key(device) for device in self.devices]
+        links = [(connection["from"], connection["to"]) for connection in self.connections]
+        layout = ForceLayout(keys, links, self._force_positions, self._tree_layout())
+        thread = ForceLayoutThread(self._layout_generation, layout)
+        thread.positions_ready.connect(self._on_force_positions)
+        thread.finished.connect(self._on_layout_thread_finished)
+        self._layout_threads.append(thread)
+        thread.start(QThread.LowPriority)
+    
+    def _on_force_positions(self, generation, positions):
+        """Принимает очередные позиции силовой раскладки и перерисовывает схему"""
+        if generation != self._layout_generation:
+            return
+        self._force_positions = positions
+        self._positions_version += 1
+        self.update()
+    
+    def _on_layout_thread_finished(self):
+        self._layout_threads = [thread for thread in self._layout_threads if not thread.isFinished()]
+    
+    def stop_layout(self):
+        """Останавливает расчет раскладки и дожидается завершения потоков"""
+        self._layout_generation += 1
+        for thread in self._layout_threads:
+            thread.stop()
+            thread.wait()
+        self._layout_threads = []
+    
+    def _tree_layout(self):
+        """Иерархическая раскладка в естественных координатах (пересчитывается при смене соединений)"""
+        if self._tree_positions is None:
+            keys = [self._device_key(device) for device in self.devices]
+            links = [(connection["from"], connection["to"]) for connection in self.connections]
+            self._tree_positions = hierarchical_layout(keys, links, self.gateway)
+        return self._tree_positions
+    
+    @staticmethod
+    def _device_key(device):
+        """IP, по которому устройство размещается на схеме (первый, если их несколько)"""
+        device_ip = device["IP"]
+        return device_ip[0] if isinstance(device_ip, list) else device_ip
+    
+    def _calculate_positions(self, width=None, height=None):
+        """
+        Позиции устройств в логических координатах для текущего режима раскладки.
         
-        # Равномерно распределяем остальные устройства по окружности
-        if other_devices:
-            # Увеличиваем радиус для большего расстояния между устройствами
-            radius = min(width, height) * 0.4
-            
-            # Вычисляем угол между устройствами
-            angle_step = 2 * math.pi / len(other_devices)
-            
-            # Начинаем с верхней точки окружности
-            start_angle = -math.pi / 2
+        По кругу: устройства равномерно по окружности с маршрутизатором в центре.
+        Иерархическая и силовая раскладки вписываются в холст при масштабе 1 и от
+        масштаба не зависят, поэтому при увеличении устройства расходятся
+        """
+        if self.layout_mode == LAYOUT_CIRCULAR:
+            # Если width и height не переданы, используем размеры виджета
+            if width is None:
+                width = self.width() / self.scale
+            if height is None:
+                height = self.height() / self.scale
             
-            for i, device in enumerate(other_devices):
-                # Вычисляем угол для текущего устройства
-                angle = start_angle + i * angle_step
-                
-                # Вычисляем координаты
-                x = center_x + radius * math.cos(angle)
-                y = center_y + radius * math.sin(angle)
-                
-                # Получаем IP для позиционирования
-                device_ip = device["IP"]
-                if isinstance(device_ip, list):
-                    device_ip = device_ip[0]
-                
-                positions[device_ip] = QPointF(x, y)
-        
-        return positions
+            keys = [self._device_key(device) for device in self.devices]
+            center = self._device_key(self.router) if self.router else None
+            positions = circular_layout(keys, center, width, height)
+        else:
+            natural = self._tree_layout()
+            if self.layout_mode == LAYOUT_FORCE and self._force_positions:
+                # Пока поток не пришлет позиции новых устройств, они стоят на местах из иерархии
+                natural = {key: self._force_positions.get(key, point) for key, point in natural.items()}
+            positions = fit_to_view(natural,
+                                    self.width() if width is None else width,
+                                    self.height() if height is None else height)
+        return {key: QPointF(x, y) for key, (x, y) in positions.items()}
+    
+    def _layout(self):
+        """
+        Позиции устройств из кэша; пересчитываются вместе с сеткой поиска при
+        изменении данных, режима раскладки, размера холста или масштаба (ячейка
+        сетки задана в логических координатах) и при получении позиций из
+        потока силовой раскладки
+        """
+        key = (self._data_version, self._positions_version, self.layout_mode,
+               self.width(), self.height(), self.scale)
+        if key != self._layout_key:
+            self._positions = self._calculate_positions()
+            # Ячейка сетки - размер иконки в логических координатах
+            self._grid = SpatialGrid(self.base_icon_size / self.scale)
+            for device in self.devices:
+                point = self._positions.get(self._device_key(device))
+                if point is not None:
+                    self._grid.insert(device, point.x(), point.y())
+            self._layout_key = key
+        return self._positions
+    
+    def _viewport_rect(self, margin):
+        """Видимая область (left, top, right, bottom) в логических координатах с запасом margin пикселей"""
+        return ((-self.offset_x - margin) / self.scale,
+                (-self.offset_y - margin) / self.scale,
+                (self.width() - self.offset_x + margin) / self.scale,
+                (self.height() - self.offset_y + margin) / self.scale)
+    
+    def _visible_devices(self, margin):
+        """Устройства, центры которых попадают в область просмотра с запасом margin пикселей"""
+        self._layout()
+        return self._grid.query_rect(*self._viewport_rect(margin))
     
     def _find_device_at_pos(self, pos):
         """
         Находит устройство в заданной позиции
         """
-        # Рассчитываем позиции устройств
-        width = self.width() / self.scale
-        height = self.height() / self.scale
-        positions = self._calculate_positions(width, height)
-        
-        # Проверяем каждое устройство
-        for device in self.devices:
-            device_ip = device["IP"]
-            if isinstance(device_ip, list):
-                device_ip = device_ip[0]  # Используем первый IP для позиционирования
-            
-            if device_ip in positions:
-                device_pos = positions[device_ip]
-                scaled_pos = QPointF(
-                    device_pos.x() * self.scale + self.offset_x,
-                    device_pos.y() * self.scale + self.offset_y
-                )
-                
-                # Проверяем, находится ли позиция в пределах иконки устройства
-                rect = QRectF(
-                    scaled_pos.x() - self.base_icon_size / 2,
-                    scaled_pos.y() - self.base_icon_size / 2,
-                    self.base_icon_size,
-                    self.base_icon_size
-                )
-                
-                if rect.contains(pos):
-                    return device
-        
-        return None
+        if not self.devices:
+            return None
+        self._layout()
+        
+        # Переводим позицию курсора в логические координаты и ищем иконку,
+        # которая ее содержит, только в соседних ячейках сетки
+        x = (pos.x() - self.offset_x) / self.scale
+        y = (pos.y() - self.offset_y) / self.scale
+        found = self._grid.query_point(x, y, self.base_icon_size / 2 / self.scale)
+        return found[0] if found else None
     
     def reset_view(self):
         """
@@ -3118,16 +3400,47 @@ class NetworkTopologyTab(QWidget):
         super().__init__()
         self.monitor_thread = monitor_thread
         self.monitor = self.monitor_thread.monitor
-        self.devices = []  # Добавляем список для хранения устройств
+        self.devices = []  # Устройства, показанные в таблице (в порядке строк) и на схеме
+        # Инвентарь всех устройств между обновлениями и строки таблицы по IP
+        self.inventory = DeviceInventory()
+        self._device_rows = {}
+        # Параметры фильтра отображения: (только своя подсеть, локальный IP, основной шлюз)
+        self._view_filter = None
+        # Источники последнего обновления списка: (локальное окружение, снимок ARP-таблицы)
+        self._device_sources = None
         self.init_ui()
         
         # Инициализируем таймер для автоматического обновления
-        self.auto_update_timer = QTimer()
+        self.auto_update_timer = QTimer(self)
+        self.auto_update_timer.setInterval(30000)  # Обновляем каждые 30 секунд
         self.auto_update_timer.timeout.connect(self.refresh_data)
-        self.auto_update_timer.start(30000)  # Обновляем каждые 30 секунд
+        # Время последнего обновления (time.monotonic) для догоняющего обновления после паузы
+        self._last_refresh = time.monotonic()
         
-        # Автоматически определяем локальный IP и шлюз при запуске
-        QTimer.singleShot(500, self.initialize_network_info)
+        # Таймер запускается при показе вкладки (set_auto_update), а локальный IP
+        # и шлюз определяет NetworkMonitorWidget.on_tab_changed при ее открытии
+    
+    def set_auto_update(self, active):
+        """
+        Включает или приостанавливает автоматическое обновление.
+        Если за время паузы пропущено плановое обновление, оно выполняется сразу
+        """
+        if not active:
+            self.auto_update_timer.stop()
+            return
+        if self.auto_update_timer.isActive():
+            return
+        if time.monotonic() - self._last_refresh >= self.auto_update_timer.interval() / 1000:
+            self.refresh_data()
+        self.auto_update_timer.start()
+    
+    def showEvent(self, event):
+        super().showEvent(event)
+        self.set_auto_update(not self.window().isMinimized())
+    
+    def hideEvent(self, event):
+        super().hideEvent(event)
+        self.set_auto_update(False)
     
     def initialize_network_info(self):
         """Инициализирует информацию о сети при запуске"""
@@ -3245,6 +3558,25 @@ class NetworkTopologyTab(QWidget):
         self.show_only_local_subnet.toggled.connect(self.update_devices_info)
         top_panel.addWidget(self.show_only_local_subnet)
         
+        # Выбор раскладки схемы
+        self.layout_mode_combo = QComboBox()
+        self.layout_mode_combo.addItem("Иерархия", LAYOUT_HIERARCHICAL)
+        self.layout_mode_combo.addItem("Силовая раскладка", LAYOUT_FORCE)
+        self.layout_mode_combo.addItem("По кругу", LAYOUT_CIRCULAR)
+        self.layout_mode_combo.setToolTip("Расположение устройств на схеме топологии")
+        self.layout_mode_combo.setStyleSheet("""
+            QComboBox {
+                border: 2px solid #c0c8e0;
+                border-radius: 4px;
+                padding: 4px 8px;
+                color: #2196F3;
+                font-weight: bold;
+                background-color: white;
+            }
+        """)
+        self.layout_mode_combo.currentIndexChanged.connect(self.on_layout_mode_changed)
+        top_panel.addWidget(self.layout_mode_combo)
+        
         # Добавляем кнопки для управления
         scan_button = QPushButton("Сканировать сеть")
         scan_button.setStyleSheet("""
@@ -3360,6 +3692,7 @@ class NetworkTopologyTab(QWidget):
         """
         Обновление данных о сети
         """
+        self._last_refresh = time.monotonic()
         self.update_devices_info()
     
     def reset_view(self, event=None):
@@ -3368,6 +3701,10 @@ class NetworkTopologyTab(QWidget):
         """
         self.topology_canvas.reset_view()
     
+    def on_layout_mode_changed(self, index):
+        """Применяет выбранную раскладку схемы"""
+        self.topology_canvas.set_layout_mode(self.layout_mode_combo.itemData(index))
+    
     def scan_network(self):
         """
         Выполняет сканирование сети в отдельном потоке
@@ -3444,7 +3781,7 @@ class NetworkTopologyTab(QWidget):
             if not hasattr(self.monitor, 'scan_state'):
                 self.monitor.scan_state = {
                     'subnet_index': 0,
-                    'batch': 1,
+                    'batch': 0,
                     'completed': False
                 }
             
@@ -3456,10 +3793,15 @@ class NetworkTopologyTab(QWidget):
             prev_count = len(getattr(self.monitor, 'discovered_devices', {}))
             
             # Сканируем сеть с учетом сохраненного состояния
-            devices, completed = self.monitor.scan_network(
+            result = self.monitor.scan_network(
                 start_subnet_index=start_subnet_index,
                 start_batch=start_batch
             )
+            if result.get("error"):
+                raise RuntimeError(result["error"])
+            
+            devices = result.get("devices", {})
+            completed = result.get("completed", False)
             
             # Если устройств не обнаружено или их очень мало, пробуем альтернативные методы
             if len(devices) < 2:  # Только локальный компьютер или пусто
@@ -3474,20 +3816,22 @@ class NetworkTopologyTab(QWidget):
                     # Игнорируем ошибки при альтернативном сканировании
                     logging.error(f"Ошибка при альтернативном сканировании: {str(e)}")
             
+            # Сохраняем найденные устройства в мониторе
+            self.monitor.add_discovered_devices(devices)
+            
             # Обновляем состояние сканирования для возможного продолжения
             if not completed:
-                # Если не завершено - сохраняем текущее состояние для следующего запуска
-                # Обновляем значения в scan_state, но не сбрасываем их
+                # Если не завершено - запоминаем позицию, которую вернуло сканирование
                 self.monitor.scan_state = {
-                    'subnet_index': self.monitor.current_subnet_index,
-                    'batch': self.monitor.current_batch,
+                    'subnet_index': result.get("subnet_index", self.monitor.current_subnet_index),
+                    'batch': result.get("batch", self.monitor.current_batch),
                     'completed': completed
                 }
             else:
                 # Если сканирование завершено - сбрасываем состояние
                 self.monitor.scan_state = {
                     'subnet_index': 0,
-                    'batch': 1,
+                    'batch': 0,
                     'completed': True
                 }
             
@@ -3495,7 +3839,10 @@ class NetworkTopologyTab(QWidget):
             self.monitor.scan_error = None
             
             # Если не обнаружено новых устройств, выводим информационное сообщение
-            if len(devices) <= prev_count and len(devices) <= 2:
+            if not completed:
+                self.monitor.scan_info = (f"Сканирование приостановлено по времени, найдено устройств: {len(devices)}. "
+                                          f"Повторный запуск продолжит с места остановки")
+            elif len(devices) <= prev_count and len(devices) <= 2:
                 self.monitor.scan_info = "Мало устройств обнаружено. Возможно, в сети настроены ограничения."
             else:
                 self.monitor.scan_info = None
@@ -3515,6 +3862,12 @@ class NetworkTopologyTab(QWidget):
     def update_devices_info(self):
         """
         Обновляет информацию об устройствах в сети с улучшенным определением типов
+        
+        Шлюзы и локальные адреса (их единицы) собираются заново при каждом
+        обновлении. Остальные устройства пересобираются, только если изменилась
+        их запись в ARP-таблице (по сравнению с прошлым снимком) или их нашло
+        сканирование; полный обход нужен только при смене локального окружения
+        (адресов, предпочтительного IP, набора шлюзов).
         """
         try:
             # Получаем все локальные IP-адреса
@@ -3546,35 +3899,24 @@ class NetworkTopologyTab(QWidget):
                             local_macs[ip_address] = mac_address
                         break
 
-            # Получаем информацию о всех шлюзах с улучшенным алгоритмом
+            # Получаем информацию о всех шлюзах (список кэшируется по таблице маршрутов),
+            # основной шлюз - первый по приоритету
             all_gateways = self.monitor.get_all_gateways()
+            primary_gateway_ip = all_gateways[0]["gateway"] if all_gateways else ''
             
-            # Получаем основной шлюз через улучшенный метод
-            primary_gateway_info = self.monitor.get_gateway_info()
-            primary_gateway_ip = primary_gateway_info.get('IP', '') if primary_gateway_info else ''
-            
-            # Словарь для хранения уникальных устройств
+            # Шлюзы и локальные адреса
             unique_devices = {}
             
+            # Снимок ARP-таблицы уже проиндексирован по IP
+            arp_snapshot = self.monitor.get_arp_snapshot()
+            arp_by_ip = arp_snapshot.by_ip
+            
             # Добавляем все шлюзы в список устройств
             for gw in all_gateways:
                 gateway_ip = gw["gateway"]
                 
-                # Проверяем, есть ли информация о MAC-адресе
-                gateway_mac = "Не определен"
-                
-                # Пингуем шлюз для обновления ARP-записи (если еще не пинговали)
-                try:
-                    subprocess.call(f"ping -n 1 {gateway_ip}", shell=True, 
-                                 stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
-                except:
-                    pass
-                
-                # Ищем в ARP-таблице
-                for entry in self.monitor.get_arp_table():
-                    if entry["IP"] == gateway_ip:
-                        gateway_mac = entry["MAC"]
-                        break
+                # MAC-адрес шлюза берем из ARP-таблицы
+                gateway_mac = arp_by_ip.get(gateway_ip, {}).get("MAC", "Не определен")
                 
                 # Определяем производителя по MAC
                 vendor = self.monitor._get_mac_vendor(gateway_mac)
@@ -3637,119 +3979,207 @@ class NetworkTopologyTab(QWidget):
                     'Подсеть': self.monitor.get_subnet(ip)
                 }
             
-            # Получаем ARP таблицу и обнаруженные устройства
-            arp_entries = self.monitor.get_arp_table()
-            discovered_devices = getattr(self.monitor, 'discovered_devices', {})
-            
-            # Объединяем устройства из ARP-таблицы и обнаруженные устройства
-            all_device_ips = set()
-            for entry in arp_entries:
-                all_device_ips.add(entry.get('IP', ''))
-            
-            for ip in discovered_devices:
-                all_device_ips.add(ip)
-                
-            # Перебираем все найденные IP
-            for ip in all_device_ips:
-                # Пропускаем специальные IP и уже добавленные устройства
-                if (not ip or self.monitor.is_special_ip(ip) or ip in unique_devices):
-                    continue
-                
-                # Ищем информацию об устройстве в ARP-таблице
-                mac = "Не определен"
-                is_local = ip in local_ips
-                
-                for entry in arp_entries:
-                    if entry.get('IP', '') == ip:
-                        mac = entry.get('MAC', 'Не определен')
-                        break
-                
-                # Если MAC не найден, проверяем в обнаруженных устройствах
-                if mac == "Не определен" and ip in discovered_devices:
-                    device_info = discovered_devices[ip]
-                    mac = device_info.get('MAC', 'Не определен')
-                
-                # Проверяем специальные MAC-адреса
-                if mac != "Не определен" and self.monitor.is_special_mac(mac):
-                    continue
-                
-                # Определяем тип устройства и производителя
-                vendor = self.monitor._get_mac_vendor(mac)
-                
-                # Определяем тип устройства с помощью улучшенного метода
-                device_type = self.monitor._determine_device_type(ip, mac, False)
-                
-                # Проверяем, находится ли устройство в локальной подсети
-                subnet = self.monitor.get_subnet(ip)
-                same_subnet = preferred_ip and self.monitor.is_same_subnet(ip, preferred_ip)
-                
-                # Получаем статус устройства (активно/неактивно)
-                status = "Активно"
-                if ip in discovered_devices:
-                    status = discovered_devices[ip].get('Статус', 'Активно')
-                
-                # Проверяем, есть ли информация о статусе в истории устройств
-                if hasattr(self.monitor, '_devices_history') and ip in self.monitor._devices_history:
-                    is_active = self.monitor._devices_history[ip].get('active', True)
-                    if not is_active:
-                        status = "Неактивно"
-                        # Для неактивных устройств добавляем время последней активности в подсказке
-                        last_active_time = self.monitor._devices_history[ip].get('last_active', 0)
-                        if last_active_time > 0:
-                            last_active_str = time.strftime('%H:%M:%S', time.localtime(last_active_time))
-                            device_type += f" (последняя активность: {last_active_str})"
-                
-                unique_devices[ip] = {
-                    'IP': ip,
-                    'MAC': mac,
-                    'Тип': device_type,
-                    'Производитель': vendor if vendor else "Неизвестно",
-                    'Локальный': is_local,
-                    'Подсеть': subnet,
-                    'СамаяПодсеть': same_subnet,
-                    'Статус': status
-                }
-            
-            # Применяем фильтрацию подсетей, если включена
-            filtered_devices = {}
-            
-            for ip, device in unique_devices.items():
-                if self.show_only_local_subnet.isChecked() and preferred_ip:
-                    # Если включена фильтрация, добавляем только устройства из той же подсети
-                    # и всегда добавляем шлюзы и локальный компьютер
-                    if (ip == primary_gateway_ip or 
-                        device.get('Тип') in ['Маршрутизатор', 'Коммутатор'] or 
-                        device.get('Локальный', False) or 
-                        self.monitor.is_same_subnet(ip, preferred_ip)):
-                        filtered_devices[ip] = device
-                else:
-                    # Если фильтрация отключена, добавляем все устройства
-                    filtered_devices[ip] = device
+            # Устройства, найденные сканированием, и изменения ARP-таблицы с прошлого обновления
+            discovered_devices = self.monitor.discovered_devices
+            changed_ips = self.monitor.take_changed_devices()
+            environment = (preferred_ip, tuple(local_ips), tuple(unique_devices),
+                           self.monitor.get_subnet(preferred_ip) if preferred_ip else None)
+            previous = self._device_sources
+            full_rebuild = previous is None or previous[0] != environment
+            if full_rebuild:
+                neighbor_ips = set(arp_by_ip)
+                neighbor_ips.update(discovered_devices)
+            else:
+                neighbor_ips = changed_ips | self._arp_changes(previous[1], arp_snapshot)
+            
+            neighbors = {}
+            removed = []
+            for ip in neighbor_ips:
+                device = self._neighbor_device(ip, arp_by_ip, discovered_devices, local_ips,
+                                               preferred_ip, unique_devices)
+                if device:
+                    neighbors[ip] = device
+                elif ip not in unique_devices:
+                    removed.append(ip)
+            unique_devices.update(neighbors)
+            
+            # Дальше обрабатываются только изменения инвентаря
+            if full_rebuild:
+                events = self.inventory.sync(unique_devices)
+            else:
+                events = self.inventory.apply(unique_devices, removed)
+            self._device_sources = (environment, arp_snapshot)
             
-            # Преобразуем словарь в список для таблицы
-            self.devices = list(filtered_devices.values())
+            # Смена фильтра требует перестроить представления, иначе применяем события
+            view_filter = (self.show_only_local_subnet.isChecked(), preferred_ip, primary_gateway_ip)
+            if view_filter != self._view_filter:
+                self._view_filter = view_filter
+                self._rebuild_device_views()
+            elif events:
+                self._apply_inventory_events(events)
             
             # Обновляем информацию о сети в верхней панели
             subnet_text = ""
             if preferred_ip:
                 subnet = self.monitor.get_subnet(preferred_ip)
                 if subnet:
-                    subnet_text = f"Подсеть: {subnet.rstrip('.0')}.x"
+                    subnet_text = f"Подсеть: {subnet}"
             
             gateway_text = f"Основной шлюз: {primary_gateway_ip}" if primary_gateway_ip else "Шлюз не найден"
             
             self.network_info.setText(f"{subnet_text} | {gateway_text}")
             
-            # Обновляем таблицу устройств
-            self.update_device_table()
-            
-            # Отображаем устройства в топологии
-            self.topology_canvas.set_data(self.devices)
-            
         except Exception as e:
+            # Изменения, взятые у монитора, могли не попасть в инвентарь -
+            # следующее обновление пройдет по всем устройствам
+            self._device_sources = None
             self.network_info.setText(f"Ошибка при обновлении устройств: {str(e)}")
             logging.error(f"Ошибка при обновлении устройств: {str(e)}")
 
+    @staticmethod
+    def _arp_changes(previous, current):
+        """
+        IP, у которых запись ARP-таблицы появилась, пропала или сменила MAC
+        """
+        if previous is current:
+            return set()
+        before, after = previous.by_ip, current.by_ip
+        changed = {ip for ip, entry in after.items()
+                   if ip not in before or before[ip].get("MAC") != entry.get("MAC")}
+        changed.update(ip for ip in before if ip not in after)
+        return changed
+
+    def _neighbor_device(self, ip, arp_by_ip, discovered_devices, local_ips, preferred_ip, known_devices):
+        """
+        Собирает запись устройства из ARP-таблицы и результатов сканирования
+        
+        Returns:
+            dict: Словарь устройства или None, если устройство не показывается
+                  (пропало, специальный адрес или уже учтено как шлюз/локальное)
+        """
+        # Пропускаем специальные IP и уже добавленные устройства
+        if (not ip or self.monitor.is_special_ip(ip) or ip in known_devices or
+                (ip not in arp_by_ip and ip not in discovered_devices)):
+            return None
+        
+        # Ищем информацию об устройстве в ARP-таблице
+        is_local = ip in local_ips
+        mac = arp_by_ip.get(ip, {}).get('MAC', 'Не определен')
+        
+        # Если MAC не найден, проверяем в обнаруженных устройствах
+        if mac == "Не определен" and ip in discovered_devices:
+            device_info = discovered_devices[ip]
+            mac = device_info.get('MAC', 'Не определен')
+        
+        # Проверяем специальные MAC-адреса
+        if mac != "Не определен" and self.monitor.is_special_mac(mac):
+            return None
+        
+        # Определяем тип устройства и производителя
+        vendor = self.monitor._get_mac_vendor(mac)
+        
+        # Определяем тип устройства с помощью улучшенного метода
+        device_type = self.monitor._determine_device_type(ip, mac, False)
+        
+        # Проверяем, находится ли устройство в локальной подсети
+        subnet = self.monitor.get_subnet(ip)
+        same_subnet = preferred_ip and self.monitor.is_same_subnet(ip, preferred_ip)
+        
+        # Получаем статус устройства (активно/неактивно)
+        status = "Активно"
+        if ip in discovered_devices:
+            status = discovered_devices[ip].get('Статус', 'Активно')
+        
+        # Проверяем, есть ли информация о статусе в истории устройств
+        if hasattr(self.monitor, '_devices_history') and ip in self.monitor._devices_history:
+            is_active = self.monitor._devices_history[ip].get('active', True)
+            if not is_active:
+                status = "Неактивно"
+                # Для неактивных устройств добавляем время последней активности в подсказке
+                last_active_time = self.monitor._devices_history[ip].get('last_active', 0)
+                if last_active_time > 0:
+                    last_active_str = time.strftime('%H:%M:%S', time.localtime(last_active_time))
+                    device_type += f" (последняя активность: {last_active_str})"
+        
+        return {
+            'IP': ip,
+            'MAC': mac,
+            'Тип': device_type,
+            'Производитель': vendor if vendor else "Неизвестно",
+            'Локальный': is_local,
+            'Подсеть': subnet,
+            'СамаяПодсеть': same_subnet,
+            'Статус': status
+        }
+
+    def _is_device_visible(self, device):
+        """
+        Проверяет, проходит ли устройство фильтр "Только текущая подсеть"
+        """
+        only_local_subnet, preferred_ip, primary_gateway_ip = self._view_filter or (False, None, None)
+        if not only_local_subnet or not preferred_ip:
+            return True
+        
+        # Шлюзы, сетевое оборудование и локальный компьютер показываем всегда
+        ip = device.get('IP')
+        return (ip == primary_gateway_ip or
+                device.get('Тип') in ['Маршрутизатор', 'Коммутатор'] or
+                device.get('Локальный', False) or
+                self.monitor.is_same_subnet(ip, preferred_ip))
+
+    def _primary_gateway_ip(self):
+        """
+        IP основного шлюза из последнего обновления списка устройств или None
+        """
+        return (self._view_filter[2] if self._view_filter else None) or None
+
+    def _rebuild_device_views(self):
+        """
+        Полностью перестраивает таблицу и схему по инвентарю (при смене фильтра)
+        """
+        self.devices = [device for device in self.inventory.devices() if self._is_device_visible(device)]
+        self.update_device_table()
+        self.topology_canvas.set_data(self.devices, gateway=self._primary_gateway_ip())
+
+    def _apply_inventory_events(self, events):
+        """
+        Применяет изменения инвентаря: трогаются только строки изменившихся устройств,
+        схема перестраивается, только если изменился состав или роли устройств
+        """
+        layout_changed = False
+        
+        for event in events:
+            visible = event.kind != DEVICE_REMOVED and self._is_device_visible(event.device)
+            shown = event.ip in self._device_rows
+            
+            if visible and not shown:
+                row = self.devices_table.rowCount()
+                self.devices_table.insertRow(row)
+                self._fill_device_row(row, event.device)
+                self._device_rows[event.ip] = row
+                self.devices.append(event.device)
+                layout_changed = True
+            elif shown and not visible:
+                row = self._device_rows.pop(event.ip)
+                self.devices_table.removeRow(row)
+                del self.devices[row]
+                for ip, other_row in self._device_rows.items():
+                    if other_row > row:
+                        self._device_rows[ip] = other_row - 1
+                layout_changed = True
+            elif visible:
+                self._fill_device_row(self._device_rows[event.ip], event.device)
+                if event.changes & {'Тип', 'Основной', 'Локальный', 'Виртуальный', 'Подсеть'}:
+                    layout_changed = True
+        
+        self.devices_table.resizeColumnsToContents()
+        
+        if layout_changed:
+            self.topology_canvas.set_data(self.devices, gateway=self._primary_gateway_ip())
+        else:
+            # Словари устройств обновлены на месте, достаточно перерисовать схему
+            self.topology_canvas.update()
+
     def event(self, event):
         """
         Обработчик пользовательских событий
@@ -3783,7 +4213,7 @@ class NetworkTopologyTab(QWidget):
                 if hasattr(self.monitor, 'local_ip') and self.monitor.local_ip:
                     subnet = self.monitor.get_subnet(self.monitor.local_ip)
                     if subnet:
-                        subnet_text = f"Подсеть: {subnet[:-2]}.x"
+                        subnet_text = f"Подсеть: {subnet}"
                 
                 # Считаем количество обнаруженных устройств
                 devices_count = len(getattr(self.monitor, 'discovered_devices', {}))
@@ -3812,98 +4242,119 @@ class NetworkTopologyTab(QWidget):
         """
         Обновляет таблицу устройств
         """
-        # Список виртуальных интерфейсов маршрутизатора
-        virtual_interfaces = ["192.168.204.254", "192.168.10.254"]
-        
         # Добавляем колонку для подсети и статуса
         if self.devices_table.columnCount() < 5:
             self.devices_table.setColumnCount(5)
             self.devices_table.setHorizontalHeaderLabels(["IP адрес", "MAC адрес", "Тип", "Подсеть", "Статус"])
         
         self.devices_table.setRowCount(len(self.devices))
+        self._device_rows = {}
         
         for row, device in enumerate(self.devices):
-            # IP адрес
-            ip_text = device['IP'] if isinstance(device['IP'], str) else ', '.join(device['IP'])
-            ip_item = QTableWidgetItem(ip_text)
-            
-            # Специальная обработка для виртуальных интерфейсов
-            is_virtual_interface = ip_text in virtual_interfaces
-            
-            if is_virtual_interface:
-                ip_item.setToolTip("Виртуальный интерфейс маршрутизатора")
-                # Добавляем светло-фиолетовый фон для выделения
-                ip_item.setBackground(QColor(243, 229, 245))  # Светло-фиолетовый
-            
-            self.devices_table.setItem(row, 0, ip_item)
-            
-            # MAC адрес
-            self.devices_table.setItem(row, 1, QTableWidgetItem(device.get('MAC', 'Н/Д')))
-            
-            # Тип устройства
-            type_item = QTableWidgetItem(device.get('Тип', 'Неизвестно'))
-            
-            # Если это виртуальный интерфейс, модифицируем тип устройства
-            if is_virtual_interface:
-                # Определяем подсеть для лучшего описания
-                subnet = device.get('Подсеть', '').replace('.0', '')
-                type_item = QTableWidgetItem(f"Виртуальный интерфейс ({subnet})")
-                type_item.setToolTip(f"Этот IP представляет виртуальный интерфейс маршрутизатора для подсети {subnet}.0/24")
-                type_item.setBackground(QColor(243, 229, 245))  # Светло-фиолетовый
-            
-            self.devices_table.setItem(row, 2, type_item)
-            
-            # Подсеть
-            subnet_item = QTableWidgetItem(device.get('Подсеть', 'Неизвестно'))
-            
-            # Определяем цвет фона ячейки в зависимости от подсети
-            if is_virtual_interface:
-                # Для виртуальных интерфейсов используем фиолетовый
-                subnet_item.setBackground(QColor(243, 229, 245))
-            elif device.get('СамаяПодсеть', True):
-                # Устройства из той же подсети с легким синим фоном
-                subnet_item.setBackground(QColor(230, 242, 255))
-            else:
-                # Устройства из других подсетей с легким желтым фоном
-                subnet_item.setBackground(QColor(255, 248, 225))
-                
-            self.devices_table.setItem(row, 3, subnet_item)
-            
-            # Статус устройства
-            status_text = device.get('Статус', 'Активно')
-            status_item = QTableWidgetItem(status_text)
-            
-            # Цветовая кодировка статуса
-            if status_text == 'Активно':
-                # Зеленый для активных устройств
-                status_item.setBackground(QColor(232, 245, 233))
-                status_item.setForeground(QColor(27, 94, 32))
-                status_item.setIcon(QIcon.fromTheme('network-connect', QIcon()))
-            elif status_text == 'Неактивно':
-                # Серый для неактивных устройств
-                status_item.setBackground(QColor(238, 238, 238))
-                status_item.setForeground(QColor(117, 117, 117))
-                status_item.setIcon(QIcon.fromTheme('network-disconnect', QIcon()))
-                status_item.setToolTip("Устройство недавно было в сети, но сейчас не отвечает")
-            else:
-                # Жёлтый для неопределённого статуса
-                status_item.setBackground(QColor(255, 248, 225))
-                status_item.setForeground(QColor(245, 124, 0))
-            
-            self.devices_table.setItem(row, 4, status_item)
+            self._fill_device_row(row, device)
+            self._device_rows[device['IP']] = row
         
-        # Подгоняем размеры столбцов под содержимое
         self.devices_table.resizeColumnsToContents()
 
-class NetworkMonitorWidget(QTabWidget):
+    def _fill_device_row(self, row, device):
+        """
+        Заполняет строку таблицы устройств
+        """
+        # Список виртуальных интерфейсов маршрутизатора
+        virtual_interfaces = ["192.168.204.254", "192.168.10.254"]
+        
+        # IP адрес
+        ip_text = device['IP'] if isinstance(device['IP'], str) else ', '.join(device['IP'])
+        ip_item = QTableWidgetItem(ip_text)
+        
+        # Специальная обработка для виртуальных интерфейсов
+        is_virtual_interface = ip_text in virtual_interfaces
+        
+        if is_virtual_interface:
+            ip_item.setToolTip("Виртуальный интерфейс маршрутизатора")
+            # Добавляем светло-фиолетовый фон для выделения
+            ip_item.setBackground(QColor(243, 229, 245))  # Светло-фиолетовый
+        
+        self.devices_table.setItem(row, 0, ip_item)
+        
+        # MAC адрес
+        self.devices_table.setItem(row, 1, QTableWidgetItem(device.get('MAC', 'Н/Д')))
+        
+        # Тип устройства
+        type_item = QTableWidgetItem(device.get('Тип', 'Неизвестно'))
+        
+        # Если это виртуальный интерфейс, модифицируем тип устройства
+        if is_virtual_interface:
+            # Определяем подсеть для лучшего описания
+            subnet = device.get('Подсеть', '')
+            type_item = QTableWidgetItem(f"Виртуальный интерфейс ({subnet})")
+            type_item.setToolTip(f"Этот IP представляет виртуальный интерфейс маршрутизатора для подсети {subnet}")
+            type_item.setBackground(QColor(243, 229, 245))  # Светло-фиолетовый
+        
+        self.devices_table.setItem(row, 2, type_item)
+        
+        # Подсеть
+        subnet_item = QTableWidgetItem(device.get('Подсеть', 'Неизвестно'))
+        
+        # Определяем цвет фона ячейки в зависимости от подсети
+        if is_virtual_interface:
+            # Для виртуальных интерфейсов используем фиолетовый
+            subnet_item.setBackground(QColor(243, 229, 245))
+        elif device.get('СамаяПодсеть', True):
+            # Устройства из той же подсети с легким синим фоном
+            subnet_item.setBackground(QColor(230, 242, 255))
+        else:
+            # Устройства из других подсетей с легким желтым фоном
+            subnet_item.setBackground(QColor(255, 248, 225))
+            
+        self.devices_table.setItem(row, 3, subnet_item)
+        
+        # Статус устройства
+        status_text = device.get('Статус', 'Активно')
+        status_item = QTableWidgetItem(status_text)
+        
+        # Цветовая кодировка статуса
+        if status_text == 'Активно':
+            # Зеленый для активных устройств
+            status_item.setBackground(QColor(232, 245, 233))
+            status_item.setForeground(QColor(27, 94, 32))
+            status_item.setIcon(QIcon.fromTheme('network-connect', QIcon()))
+        elif status_text == 'Неактивно':
+            # Серый для неактивных устройств
+            status_item.setBackground(QColor(238, 238, 238))
+            status_item.setForeground(QColor(117, 117, 117))
+            status_item.setIcon(QIcon.fromTheme('network-disconnect', QIcon()))
+            status_item.setToolTip("Устройство недавно было в сети, но сейчас не отвечает")
+        else:
+            # Жёлтый для неопределённого статуса
+            status_item.setBackground(QColor(255, 248, 225))
+            status_item.setForeground(QColor(245, 124, 0))
+        
+        self.devices_table.setItem(row, 4, status_item)
+
+class NetworkMonitorWidget(LazyTabWidget):
     """
     Виджет, содержащий вкладки для мониторинга сети
+    
+    Вкладки создаются при первом открытии. Поток мониторинга работает, только
+    пока видна одна из вкладок, которые показывают его данные.
     """
+    # Индексы вкладок
+    INFO_TAB, ARP_TAB, TOPOLOGY_TAB, TRACE_TAB = range(4)
+    # Вкладки, которые получают данные от потока мониторинга
+    POLLING_TABS = (INFO_TAB, ARP_TAB)
+    
     def __init__(self):
         super().__init__()
         
         # Создаем поток мониторинга
         self.monitor_thread = NetworkMonitorThread()
+        self.network_info_tab = None
+        self.arp_table_tab = None
+        self.network_topology_tab = None
+        self.trace_route_tab = None
+        # Узлы последней трассировки (для схемы топологии)
+        self.trace_hops = []
         
         # Устанавливаем стиль для вкладок
         self.setStyleSheet("""
@@ -3941,38 +4392,84 @@ class NetworkMonitorWidget(QTabWidget):
         # Инициализируем интерфейс
         self.init_ui()
         
-        # Инициализируем локальный IP и шлюз
-        self.monitor_thread.monitor.get_network_interfaces()
-        self.monitor_thread.monitor.get_gateway_info()
-        
-        # Запускаем поток мониторинга
-        self.monitor_thread.start()
+        # Поток мониторинга запускается при первом показе одной из вкладок POLLING_TABS
         
         # Автоматически обновляем визуализацию сети при отображении вкладки
         self.currentChanged.connect(self.on_tab_changed)
+        self.tab_built.connect(self.on_tab_built)
     
     def on_tab_changed(self, index):
         """Обрабатывает изменение активной вкладки"""
         # Если выбрана вкладка топологии сети, запускаем инициализацию
-        if index == 2 and hasattr(self, 'network_topology_tab'):
+        if index == self.TOPOLOGY_TAB and self.network_topology_tab is not None:
             QTimer.singleShot(100, self.network_topology_tab.initialize_network_info)
+        self.set_polling(True)
+    
+    def on_tab_built(self, index, tab):
+        """Новая вкладка получает данные сразу, а не при следующем плановом опросе"""
+        if index in self.POLLING_TABS and self.monitor_thread.isRunning():
+            self.monitor_thread.poll_now()
     
     def init_ui(self):
         # Вкладка с информацией о сетевых интерфейсах
-        self.network_info_tab = NetworkInfoTab(self.monitor_thread)
-        self.addTab(self.network_info_tab, "Сетевые интерфейсы")
+        self.add_lazy_tab(self._create_network_info_tab, "Сетевые интерфейсы")
         
         # Вкладка с ARP таблицей
-        self.arp_table_tab = ARPTableTab(self.monitor_thread)
-        self.addTab(self.arp_table_tab, "ARP таблица")
+        self.add_lazy_tab(self._create_arp_table_tab, "ARP таблица")
         
         # Вкладка с топологией сети
-        self.network_topology_tab = NetworkTopologyTab(self.monitor_thread)
-        self.addTab(self.network_topology_tab, "Топология сети")
+        self.add_lazy_tab(self._create_network_topology_tab, "Топология сети")
         
         # Вкладка с трассировкой маршрута
+        self.add_lazy_tab(self._create_trace_route_tab, "Трассировка")
+    
+    def _create_network_info_tab(self):
+        self.network_info_tab = NetworkInfoTab(self.monitor_thread)
+        return self.network_info_tab
+    
+    def _create_arp_table_tab(self):
+        self.arp_table_tab = ARPTableTab(self.monitor_thread)
+        return self.arp_table_tab
+    
+    def _create_network_topology_tab(self):
+        self.network_topology_tab = NetworkTopologyTab(self.monitor_thread)
+        if self.trace_hops:
+            self.network_topology_tab.topology_canvas.set_trace_route(self.trace_hops)
+        return self.network_topology_tab
+    
+    def _create_trace_route_tab(self):
         self.trace_route_tab = TraceRouteTab(self.monitor_thread)
-        self.addTab(self.trace_route_tab, "Трассировка")
+        self.trace_route_tab.route_traced.connect(self.on_route_traced)
+        return self.trace_route_tab
+    
+    def on_route_traced(self, hops):
+        """Маршрут последней трассировки показывается на схеме топологии"""
+        self.trace_hops = hops
+        if self.network_topology_tab is not None:
+            self.network_topology_tab.topology_canvas.set_trace_route(hops)
+    
+    def set_polling(self, active):
+        """
+        Включает или приостанавливает фоновые обновления сетевых данных.
+        Опрос включается, только если открыта вкладка с его данными,
+        виджет виден и окно не свернуто
+        """
+        visible = active and self.isVisible() and not self.window().isMinimized()
+        if visible and self.currentIndex() in self.POLLING_TABS:
+            self.monitor_thread.resume()
+        else:
+            self.monitor_thread.pause()
+        if self.network_topology_tab is not None:
+            self.network_topology_tab.set_auto_update(
+                visible and self.currentIndex() == self.TOPOLOGY_TAB)
+    
+    def showEvent(self, event):
+        super().showEvent(event)
+        self.set_polling(True)
+    
+    def hideEvent(self, event):
+        super().hideEvent(event)
+        self.set_polling(False)
     
     def closeEvent(self, event):
         # Останавливаем поток при закрытии
@@ -3983,6 +4480,9 @@ class TraceRouteTab(QWidget):
     """
     Вкладка с трассировкой до указанного IP-адреса
     """
+    # Адреса узлов завершенной трассировки по порядку
+    route_traced = pyqtSignal(list)
+    
     def __init__(self, monitor_thread):
         super().__init__()
         self.monitor_thread = monitor_thread
@@ -4174,6 +4674,7 @@ class TraceRouteTab(QWidget):
         
         # Очищаем таблицу
         self.trace_table.setRowCount(0)
+        self.trace_results = []
         
         # Запускаем трассировку в отдельном потоке
         class TraceThread(QThread):
@@ -4479,6 +4980,8 @@ class TraceRouteTab(QWidget):
         """
         Обрабатывает получение данных о новом хопе
         """
+        self.trace_results.append(hop_data)
+        
         # Добавляем новую строку в таблицу
         row = self.trace_table.rowCount()
         self.trace_table.insertRow(row)
@@ -4503,6 +5006,10 @@ class TraceRouteTab(QWidget):
         self.info_label.setText(f"Трассировка завершена. Найдено {total_hops} хопов.")
         self.info_label.setStyleSheet("color: #4CAF50; font-weight: bold;")
         
+        # Узлы без ответа ("—", "Превышен") на схему не попадают
+        self.route_traced.emit([hop["ip"] for hop in self.trace_results
+                                if ipv4.ip_to_int(hop["ip"]) is not None])
+        
         # Скрываем прогресс и разблокируем кнопку
         self.progress_bar.setCompleted(True)
         self.trace_button.setEnabled(True)
@@ -0,0 +1,914 @@
+"""
+Планирование и выполнение сканирования сети.
+
+ScanPlanner определяет реальные сети интерфейсов по маске и делит их на рабочие
+блоки, ScanCheckpoint сохраняет на диск прогресс по блокам, чтобы прерванное
+сканирование продолжалось с места остановки.
+
+SweepEngine опрашивает хосты из одного цикла событий вместо отдельного потока
+и процесса ping на каждый адрес: ICMP echo через raw-сокет, если ОС это
+разрешает, иначе непривилегированные TCP/UDP пробы. PortProbeEngine так же
+из одного цикла событий проверяет TCP-порты сразу у многих хостов.
+
+ArpSweeper на Linux рассылает ARP-запросы всей сети через raw-сокет AF_PACKET
+с заданной скоростью и собирает ответы в том же цикле, без Scapy.
+
+ProbePool - постоянный ограниченный пул потоков для блокирующих проб
+(системный ping, фоновое обновление ARP-записей), общий для всех сканирований.
+"""
+
+import asyncio
+import collections
+import concurrent.futures
+import ipaddress
+import json
+import logging
+import os
+import queue
+import select
+import socket
+import struct
+import threading
+import time
+
+# Каталог для служебных данных приложения
+APP_DATA_DIR = os.path.join(os.path.expanduser("~"), ".bulwark")
+
+# Порты для непривилегированной TCP-пробы. Отказ в соединении (RST) тоже
+# означает, что хост существует
+DEFAULT_PROBE_PORTS = (80, 443, 445, 22)
+
+# Порты сервисов для поиска устройств, не отвечающих на ping: HTTP, HTTPS,
+# SSH, Telnet, FTP, mDNS, DLNA/UPnP, SNMP, AirPlay, Chromecast, iOS
+COMMON_SERVICE_PORTS = (80, 443, 22, 23, 21, 5353, 1900, 161, 7000, 8008, 8009,
+                        32768, 32769, 49152, 62078)
+
+# Порт для UDP-пробы: закрытый порт отвечает ICMP Port Unreachable
+UDP_PROBE_PORT = 33434
+
+# Порт discard: датаграмма на него заставляет ОС разрешить MAC-адрес соседа
+DISCARD_PORT = 9
+
+ICMP_ECHO_REQUEST = 8
+ICMP_ECHO_REPLY = 0
+
+# Ethernet и ARP (linux/if_ether.h, linux/if_arp.h)
+ETH_P_ARP = 0x0806
+ETH_P_IP = 0x0800
+ARPHRD_ETHER = 1
+ARPOP_REQUEST = 1
+ARPOP_REPLY = 2
+BROADCAST_MAC = b"\xff" * 6
+
+# Размер рабочего блока сканирования (префикс) и предел адресов в одной сети
+DEFAULT_UNIT_PREFIX = 24
+DEFAULT_MAX_HOSTS = 65536
+
+
+def _int_to_ip(value):
+    return socket.inet_ntoa(struct.pack('!I', value))
+
+
+class ScanUnit:
+    """
+    Рабочий блок сканирования: часть сети не крупнее unit_prefix
+    """
+    __slots__ = ("network", "index", "hosts")
+
+    def __init__(self, network, index, hosts):
+        self.network = network
+        self.index = index
+        self.hosts = hosts
+
+    def __repr__(self):
+        return f"ScanUnit({self.network}, index={self.index}, hosts={len(self.hosts)})"
+
+
+class ScanPlanner:
+    """
+    Строит план сканирования по адресам и маскам сетевых интерфейсов
+    """
+    def __init__(self, unit_prefix=DEFAULT_UNIT_PREFIX, max_hosts=DEFAULT_MAX_HOSTS):
+        """
+        Args:
+            unit_prefix (int): Префикс рабочего блока (по умолчанию блоки по /24)
+            max_hosts (int): Максимум адресов в одной сети. Более крупные сети
+                             (например, /8) сужаются до окрестности адреса интерфейса
+        """
+        self.unit_prefix = unit_prefix
+        self.max_hosts = max_hosts
+
+    def network_for(self, ip, netmask=None):
+        """
+        Возвращает сеть интерфейса по адресу и маске
+
+        Args:
+            ip (str): IPv4-адрес интерфейса
+            netmask (str): Маска сети ("255.255.252.0"); если не задана, считается /24
+
+        Returns:
+            IPv4Network или None, если адрес или маску не удалось разобрать
+        """
+        try:
+            network = ipaddress.IPv4Interface(f"{ip}/{netmask or 24}").network
+        except ValueError:
+            return None
+
+        if network.num_addresses > self.max_hosts:
+            # Сужаем огромную сеть до блока вокруг адреса интерфейса
+            prefix = 32 - (self.max_hosts.bit_length() - 1)
+            network = ipaddress.IPv4Interface(f"{ip}/{prefix}").network
+        return network
+
+    def networks_for_interfaces(self, interfaces, skip_ip=None):
+        """
+        Собирает уникальные сети из словаря get_network_interfaces()
+
+        Args:
+            interfaces (dict): {имя: {"IP": [...], "Маска сети": [...], ...}}
+            skip_ip (callable): Функция, возвращающая True для адресов, которые не сканируются
+
+        Returns:
+            list: Список IPv4Network в порядке интерфейсов
+        """
+        networks = []
+        for interface in interfaces.values():
+            ip_list = interface.get("IP", [])
+            mask_list = interface.get("Маска сети", [])
+            if isinstance(ip_list, str):
+                ip_list = [ip_list]
+            if isinstance(mask_list, str):
+                mask_list = [mask_list]
+
+            for position, ip in enumerate(ip_list):
+                if not ip or (skip_ip and skip_ip(ip)):
+                    continue
+                netmask = mask_list[position] if position < len(mask_list) else None
+                network = self.network_for(ip, netmask)
+                # /32 не содержит соседей, сканировать нечего
+                if network is None or network.prefixlen == 32 or network in networks:
+                    continue
+                networks.append(network)
+        return networks
+
+    def split(self, network, exclude=()):
+        """
+        Делит сеть на рабочие блоки и перечисляет адреса хостов каждого блока
+
+        Адрес сети и широковещательный адрес исключаются только для всей сети,
+        поэтому в /22 адреса вида x.x.1.0 и x.x.2.255 тоже будут опрошены.
+
+        Args:
+            network (IPv4Network): Сеть для сканирования
+            exclude (iterable): Адреса, которые не нужно опрашивать (собственные адреса)
+
+        Returns:
+            list: Список ScanUnit
+        """
+        exclude = set(exclude)
+        first = int(network.network_address)
+        last = int(network.broadcast_address)
+        if network.prefixlen < 31:
+            # Адрес сети и broadcast не принадлежат хостам
+            host_first, host_last = first + 1, last - 1
+        else:
+            host_first, host_last = first, last
+
+        unit_prefix = max(self.unit_prefix, network.prefixlen)
+        unit_size = 1 << (32 - unit_prefix)
+
+        units = []
+        for index, unit_start in enumerate(range(first, last + 1, unit_size)):
+            unit_network = ipaddress.IPv4Network((unit_start, unit_prefix))
+            start = max(unit_start, host_first)
+            stop = min(unit_start + unit_size - 1, host_last)
+            hosts = [_int_to_ip(value) for value in range(start, stop + 1)]
+            if exclude:
+                hosts = [ip for ip in hosts if ip not in exclude]
+            units.append(ScanUnit(unit_network, index, hosts))
+        return units
+
+
+class ScanCheckpoint:
+    """
+    Контрольная точка сканирования: какие рабочие блоки каких сетей уже пройдены
+    и какие устройства в них найдены. Сохраняется на диск после каждого блока
+    """
+    def __init__(self, path=None, max_age=6 * 3600):
+        """
+        Args:
+            path (str): Путь к файлу контрольной точки
+            max_age (int): Возраст в секундах, после которого точка считается устаревшей
+        """
+        self.path = path or os.path.join(APP_DATA_DIR, "scan_checkpoint.json")
+        self.max_age = max_age
+        self._reset([])
+
+    def _reset(self, plan):
+        self.plan = list(plan)
+        self.done_units = {}
+        self.devices = {}
+        self.subnet_index = 0
+        self.batch = 0
+
+    def load(self, plan):
+        """
+        Загружает контрольную точку, если она относится к тому же плану сканирования
+
+        Args:
+            plan (list): Список сетей плана в виде строк CIDR
+
+        Returns:
+            bool: True, если найдена незавершенная точка для этого плана
+        """
+        plan = [str(network) for network in plan]
+        self._reset(plan)
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return False
+        except Exception as e:
+            logging.error(f"Ошибка при чтении контрольной точки сканирования: {e}")
+            return False
+
+        # План изменился (другая сеть или маска) или точка слишком старая
+        if data.get("plan") != plan or time.time() - data.get("updated", 0) > self.max_age:
+            return False
+
+        self.done_units = {network: set(indexes) for network, indexes in data.get("done_units", {}).items()}
+        self.devices = data.get("devices", {})
+        self.subnet_index = data.get("subnet_index", 0)
+        self.batch = data.get("batch", 0)
+        return True
+
+    def is_done(self, network, unit_index):
+        return unit_index in self.done_units.get(str(network), ())
+
+    def mark_done(self, network, unit_index, devices, next_position):
+        """
+        Отмечает рабочий блок пройденным и сразу сохраняет точку на диск
+
+        Args:
+            network: Сеть, к которой относится блок
+            unit_index (int): Номер блока в сети
+            devices (dict): Устройства, найденные в блоке
+            next_position (tuple): (индекс сети, номер блока), с которых продолжать
+        """
+        self.done_units.setdefault(str(network), set()).add(unit_index)
+        self.devices.update(devices)
+        self.subnet_index, self.batch = next_position
+        self.save()
+
+    def save(self):
+        data = {
+            "plan": self.plan,
+            "done_units": {network: sorted(indexes) for network, indexes in self.done_units.items()},
+            "devices": self.devices,
+            "subnet_index": self.subnet_index,
+            "batch": self.batch,
+            "updated": time.time()
+        }
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            # Пишем во временный файл и подменяем, чтобы не оставить обрезанный JSON
+            temp_path = self.path + ".tmp"
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False)
+            os.replace(temp_path, self.path)
+        except Exception as e:
+            logging.error(f"Ошибка при сохранении контрольной точки сканирования: {e}")
+
+    def clear(self):
+        """Удаляет контрольную точку после полного завершения сканирования"""
+        self._reset(self.plan)
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            logging.error(f"Ошибка при удалении контрольной точки сканирования: {e}")
+
+
+def _icmp_checksum(data):
+    """Контрольная сумма ICMP (RFC 1071)"""
+    if len(data) % 2:
+        data += b'\x00'
+    total = sum(struct.unpack('!%dH' % (len(data) // 2), data))
+    total = (total >> 16) + (total & 0xffff)
+    total += total >> 16
+    return ~total & 0xffff
+
+
+def _build_echo_request(identifier, sequence):
+    """Собирает пакет ICMP Echo Request"""
+    payload = b'bulwark-sweep'
+    header = struct.pack('!BBHHH', ICMP_ECHO_REQUEST, 0, 0, identifier, sequence)
+    checksum = _icmp_checksum(header + payload)
+    return struct.pack('!BBHHH', ICMP_ECHO_REQUEST, 0, checksum, identifier, sequence) + payload
+
+
+class _IcmpChannel:
+    """
+    Общий ICMP-сокет для всех проб: отправляет echo-запросы и раздает ответы
+    ожидающим по адресу источника
+    """
+    def __init__(self, loop, sock, raw, identifier):
+        self.loop = loop
+        self.sock = sock
+        self.raw = raw
+        self.identifier = identifier
+        self.waiters = {}
+        loop.add_reader(sock.fileno(), self._on_readable)
+
+    @classmethod
+    def open(cls, loop, identifier):
+        """
+        Открывает raw-сокет, а если нет прав - ICMP datagram-сокет (Linux, macOS)
+
+        Returns:
+            _IcmpChannel или None, если ICMP недоступен без повышенных прав
+        """
+        for sock_type in (socket.SOCK_RAW, socket.SOCK_DGRAM):
+            try:
+                sock = socket.socket(socket.AF_INET, sock_type, socket.IPPROTO_ICMP)
+            except (OSError, ValueError):
+                continue
+            try:
+                sock.setblocking(False)
+                if os.name == 'nt':
+                    # На Windows raw-сокет должен быть привязан до приема
+                    sock.bind(('0.0.0.0', 0))
+                return cls(loop, sock, sock_type == socket.SOCK_RAW, identifier)
+            except (OSError, NotImplementedError):
+                sock.close()
+        return None
+
+    def _on_readable(self):
+        while True:
+            try:
+                packet, address = self.sock.recvfrom(2048)
+            except (BlockingIOError, InterruptedError):
+                return
+            except OSError:
+                return
+
+            ttl = None
+            if self.raw:
+                # Raw-сокет возвращает пакет вместе с IP-заголовком
+                if len(packet) < 20:
+                    continue
+                ttl = packet[8]
+                packet = packet[(packet[0] & 0x0f) * 4:]
+            if len(packet) < 8:
+                continue
+
+            icmp_type, _, _, identifier, _ = struct.unpack('!BBHHH', packet[:8])
+            if icmp_type != ICMP_ECHO_REPLY:
+                continue
+            # Для datagram-сокета ядро подменяет идентификатор само
+            if self.raw and identifier != self.identifier:
+                continue
+
+            waiter = self.waiters.pop(address[0], None)
+            if waiter is not None and not waiter.done():
+                waiter.set_result(ttl)
+
+    def expect(self, ip):
+        waiter = self.loop.create_future()
+        self.waiters[ip] = waiter
+        return waiter
+
+    def send(self, ip, sequence):
+        self.sock.sendto(_build_echo_request(self.identifier, sequence & 0xffff), (ip, 0))
+
+    def close(self):
+        self.loop.remove_reader(self.sock.fileno())
+        self.sock.close()
+        for waiter in self.waiters.values():
+            waiter.cancel()
+        self.waiters.clear()
+
+
+async def _tcp_probe(ip, port, timeout):
+    """TCP-проба: успешное соединение или RST означают живой хост"""
+    try:
+        _, writer = await asyncio.wait_for(asyncio.open_connection(ip, port), timeout)
+    except ConnectionRefusedError:
+        return "TCP"
+    except (asyncio.TimeoutError, OSError):
+        return None
+    writer.close()
+    return "TCP"
+
+
+async def _udp_probe(ip, timeout):
+    """UDP-проба: ответ или ICMP Port Unreachable означают живой хост"""
+    loop = asyncio.get_running_loop()
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sock.setblocking(False)
+    try:
+        sock.connect((ip, UDP_PROBE_PORT))
+        sock.send(b'\x00')
+        await asyncio.wait_for(loop.sock_recv(sock, 1), timeout)
+        return "UDP"
+    except (ConnectionRefusedError, ConnectionResetError):
+        # Linux сообщает о Port Unreachable через ECONNREFUSED, Windows - через WSAECONNRESET
+        return "UDP"
+    except (asyncio.TimeoutError, OSError):
+        return None
+    finally:
+        sock.close()
+
+
+def _run_in_own_loop(coroutine):
+    """
+    Выполняет корутину в отдельном цикле событий (вызывается из рабочих потоков)
+    """
+    # Нужен selector-цикл: Proactor на Windows не поддерживает add_reader
+    loop = asyncio.SelectorEventLoop()
+    try:
+        return loop.run_until_complete(coroutine)
+    finally:
+        # Досрочно отмененные пробы должны завершиться до закрытия цикла
+        pending = asyncio.all_tasks(loop)
+        for task in pending:
+            task.cancel()
+        if pending:
+            loop.run_until_complete(asyncio.gather(*pending, return_exceptions=True))
+        loop.close()
+
+
+def touch_neighbor(ip, port=DISCARD_PORT):
+    """
+    Отправляет одну UDP-датаграмму, чтобы ОС обновила запись соседа в ARP-таблице
+
+    Вызов не ждет ответа: разрешение MAC-адреса выполняет ядро, результат
+    появляется в ARP-таблице через несколько миллисекунд.
+
+    Returns:
+        bool: True, если датаграмма отправлена
+    """
+    return bool(touch_neighbors([ip], port))
+
+
+def touch_neighbors(ips, port=DISCARD_PORT):
+    """
+    Отправляет по UDP-датаграмме на каждый адрес через один сокет, чтобы ядро
+    одновременно разослало ARP-запросы всем соседям
+
+    Returns:
+        int: Количество отправленных датаграмм
+    """
+    sent = 0
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    try:
+        for ip in ips:
+            try:
+                sock.sendto(b'\x00', (ip, port))
+                sent += 1
+            except OSError:
+                # Недоступный адрес или переполненный буфер не мешают остальным
+                continue
+    finally:
+        sock.close()
+    return sent
+
+
+class SweepEngine:
+    """
+    Параллельный опрос списка IP-адресов с ограниченным окном одновременных проб
+    """
+    def __init__(self, timeout=1.0, retries=1, max_in_flight=256, probe_ports=DEFAULT_PROBE_PORTS):
+        """
+        Args:
+            timeout (float): Время ожидания ответа на одну пробу, в секундах
+            retries (int): Количество повторных ICMP-запросов для неответивших хостов
+            max_in_flight (int): Максимальное число одновременно открытых проб
+            probe_ports (tuple): Порты для TCP-пробы, если ICMP недоступен
+        """
+        self.timeout = timeout
+        self.retries = retries
+        self.max_in_flight = max_in_flight
+        self.probe_ports = tuple(probe_ports)
+        self.identifier = os.getpid() & 0xffff
+        # Способ опроса, использованный в последнем проходе ("ICMP" или "TCP/UDP")
+        self.last_method = None
+
+    def sweep(self, ips):
+        """
+        Опрашивает все адреса одним проходом
+
+        Args:
+            ips (iterable): IP-адреса для проверки
+
+        Returns:
+            dict: {ip: {"Метод": "ICMP"/"TCP"/"UDP", "RTT": мс, "TTL": TTL ответа или None}}
+                  только для ответивших хостов
+        """
+        ips = list(dict.fromkeys(ips))
+        if not ips:
+            return {}
+
+        return _run_in_own_loop(self._sweep(ips))
+
+    async def _sweep(self, ips):
+        loop = asyncio.get_running_loop()
+        channel = _IcmpChannel.open(loop, self.identifier)
+
+        try:
+            if channel is not None:
+                self.last_method = "ICMP"
+                window = asyncio.Semaphore(self.max_in_flight)
+                probes = [self._probe_icmp(channel, window, ip, sequence)
+                          for sequence, ip in enumerate(ips)]
+            else:
+                self.last_method = "TCP/UDP"
+                # Каждый хост занимает сокет на каждый порт плюс один UDP
+                sockets_per_host = len(self.probe_ports) + 1
+                window = asyncio.Semaphore(max(1, self.max_in_flight // sockets_per_host))
+                probes = [self._probe_unprivileged(window, ip) for ip in ips]
+
+            replies = await asyncio.gather(*probes)
+        finally:
+            if channel is not None:
+                channel.close()
+
+        return {ip: reply for ip, reply in zip(ips, replies) if reply}
+
+    async def _probe_icmp(self, channel, window, ip, sequence):
+        async with window:
+            for _ in range(self.retries + 1):
+                waiter = channel.expect(ip)
+                started = time.perf_counter()
+                try:
+                    channel.send(ip, sequence)
+                except (BlockingIOError, InterruptedError):
+                    # Буфер отправки переполнен - даем ему освободиться и повторяем
+                    channel.waiters.pop(ip, None)
+                    await asyncio.sleep(0.01)
+                    continue
+                except OSError:
+                    channel.waiters.pop(ip, None)
+                    return None
+
+                try:
+                    ttl = await asyncio.wait_for(waiter, self.timeout)
+                except asyncio.TimeoutError:
+                    continue
+                finally:
+                    channel.waiters.pop(ip, None)
+
+                return {
+                    "Метод": "ICMP",
+                    "RTT": round((time.perf_counter() - started) * 1000, 1),
+                    "TTL": ttl
+                }
+        return None
+
+    async def _probe_unprivileged(self, window, ip):
+        async with window:
+            started = time.perf_counter()
+            probes = [asyncio.ensure_future(_tcp_probe(ip, port, self.timeout))
+                      for port in self.probe_ports]
+            probes.append(asyncio.ensure_future(_udp_probe(ip, self.timeout)))
+            try:
+                for finished in asyncio.as_completed(probes):
+                    method = await finished
+                    if method:
+                        return {
+                            "Метод": method,
+                            "RTT": round((time.perf_counter() - started) * 1000, 1),
+                            "TTL": None
+                        }
+            finally:
+                for probe in probes:
+                    probe.cancel()
+        return None
+
+
+class PortProbeEngine:
+    """
+    Параллельная проверка TCP-портов у списка хостов
+
+    Пары (хост, порт) перебираются по портам: сначала первый порт у всех
+    хостов, затем второй и так далее, поэтому популярные порты проверяются
+    первыми, а один хост не получает все соединения разом. Число одновременно
+    открытых соединений ограничено max_in_flight. Как только у хоста найдено
+    stop_after открытых портов, остальные его порты не проверяются.
+    """
+    def __init__(self, ports=COMMON_SERVICE_PORTS, timeout=0.5, max_in_flight=256, stop_after=1):
+        """
+        Args:
+            ports (tuple): Проверяемые порты в порядке приоритета
+            timeout (float): Время ожидания соединения, в секундах
+            max_in_flight (int): Максимальное число одновременно открытых соединений
+            stop_after (int): После скольких открытых портов прекращать проверку хоста
+                              (None - проверять все порты)
+        """
+        self.ports = tuple(ports)
+        self.timeout = timeout
+        self.max_in_flight = max_in_flight
+        self.stop_after = stop_after
+
+    def probe(self, ips):
+        """
+        Проверяет порты всех хостов одним проходом
+
+        Args:
+            ips (iterable): IP-адреса для проверки
+
+        Returns:
+            dict: {ip: set открытых портов} для ответивших хостов. Хост, который
+                  отклонил соединение (RST), существует - для него множество пустое
+        """
+        ips = list(dict.fromkeys(ips))
+        if not ips or not self.ports:
+            return {}
+        return _run_in_own_loop(self._probe(ips))
+
+    async def _probe(self, ips):
+        loop = asyncio.get_running_loop()
+        pairs = iter([(ip, port) for port in self.ports for ip in ips])
+        responsive = {}
+        finished = set()
+
+        async def worker():
+            for ip, port in pairs:
+                if ip in finished:
+                    continue
+                state = await self._connect(loop, ip, port)
+                if state is None:
+                    continue
+                open_ports = responsive.setdefault(ip, set())
+                if state:
+                    open_ports.add(port)
+                    if self.stop_after and len(open_ports) >= self.stop_after:
+                        finished.add(ip)
+
+        workers = min(self.max_in_flight, len(ips) * len(self.ports))
+        await asyncio.gather(*(worker() for _ in range(workers)))
+        return responsive
+
+    async def _connect(self, loop, ip, port):
+        """
+        Returns:
+            True - порт открыт, False - соединение отклонено (хост существует),
+            None - нет ответа
+        """
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.setblocking(False)
+        try:
+            await asyncio.wait_for(loop.sock_connect(sock, (ip, port)), self.timeout)
+            return True
+        except ConnectionRefusedError:
+            return False
+        except (asyncio.TimeoutError, OSError):
+            return None
+        finally:
+            sock.close()
+
+
+class ProbePool:
+    """
+    Ограниченный пул потоков для сетевых проб, живущий между сканированиями
+
+    Задачи берутся из общей очереди, поэтому медленный хост занимает только
+    один поток, а остальные продолжают разбирать очередь. Потоки создаются
+    по мере необходимости, но не больше max_workers.
+    """
+    # Окно, за которое считается пропускная способность, в секундах
+    THROUGHPUT_WINDOW = 10.0
+
+    def __init__(self, max_workers=32, name="probe"):
+        self.max_workers = max_workers
+        self.name = name
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._workers = []
+        self._idle = 0
+        self._busy = 0
+        self._submitted = 0
+        self._completed = 0
+        self._failed = 0
+        self._completions = collections.deque()
+
+    def submit(self, function, *args, **kwargs):
+        """
+        Ставит задачу в очередь
+
+        Returns:
+            concurrent.futures.Future: Результат задачи
+        """
+        future = concurrent.futures.Future()
+        with self._lock:
+            self._submitted += 1
+            self._queue.put((future, function, args, kwargs))
+            if self._idle < self._queue.qsize() and len(self._workers) < self.max_workers:
+                self._start_worker()
+        return future
+
+    def map(self, function, items):
+        """
+        Выполняет function для каждого элемента и возвращает результаты в исходном порядке
+        """
+        futures = [self.submit(function, item) for item in items]
+        return [future.result() for future in futures]
+
+    def metrics(self):
+        """
+        Текущее состояние пула
+
+        Returns:
+            dict: Потоки, занятые потоки, глубина очереди, счетчики задач
+                  и пропускная способность (задач в секунду за последние 10 с)
+        """
+        with self._lock:
+            self._trim_completions(time.monotonic())
+            return {
+                "workers": len(self._workers),
+                "busy": self._busy,
+                "queue_depth": self._queue.qsize(),
+                "submitted": self._submitted,
+                "completed": self._completed,
+                "failed": self._failed,
+                "throughput": round(len(self._completions) / self.THROUGHPUT_WINDOW, 2)
+            }
+
+    def _start_worker(self):
+        worker = threading.Thread(target=self._work, name=f"{self.name}-{len(self._workers)}", daemon=True)
+        self._workers.append(worker)
+        self._idle += 1
+        worker.start()
+
+    def _trim_completions(self, now):
+        while self._completions and now - self._completions[0] > self.THROUGHPUT_WINDOW:
+            self._completions.popleft()
+
+    def _work(self):
+        while True:
+            future, function, args, kwargs = self._queue.get()
+            with self._lock:
+                self._idle -= 1
+                self._busy += 1
+
+            failed = False
+            if future.set_running_or_notify_cancel():
+                try:
+                    future.set_result(function(*args, **kwargs))
+                except BaseException as e:
+                    failed = True
+                    future.set_exception(e)
+
+            with self._lock:
+                self._busy -= 1
+                self._idle += 1
+                self._completed += 1
+                if failed:
+                    self._failed += 1
+                now = time.monotonic()
+                self._completions.append(now)
+                self._trim_completions(now)
+
+
+_probe_pool = None
+_probe_pool_lock = threading.Lock()
+
+
+def get_probe_pool():
+    """Общий пул сетевых проб приложения"""
+    global _probe_pool
+    if _probe_pool is None:
+        with _probe_pool_lock:
+            if _probe_pool is None:
+                _probe_pool = ProbePool()
+    return _probe_pool
+
+
+def _mac_to_bytes(mac):
+    return bytes.fromhex(mac.replace(':', '').replace('-', ''))
+
+
+def _bytes_to_mac(data):
+    return ':'.join(f"{b:02x}" for b in data)
+
+
+class ArpSweeper:
+    """
+    ARP-сканирование сети через raw-сокет AF_PACKET (только Linux, нужен CAP_NET_RAW)
+
+    Запросы отправляются равномерно со скоростью rate пакетов в секунду, ответы
+    принимаются в том же цикле select между отправками. Неответившим адресам
+    запрос повторяется, весь /24 опрашивается примерно за секунду.
+    """
+    def __init__(self, rate=2000, timeout=0.5, retries=1):
+        """
+        Args:
+            rate (int): Скорость отправки запросов, пакетов в секунду
+            timeout (float): Ожидание ответов после последнего запроса, в секундах
+            retries (int): Сколько раз повторить запрос неответившим адресам
+        """
+        self.rate = max(1, rate)
+        self.timeout = timeout
+        self.retries = retries
+
+    @staticmethod
+    def available():
+        """Доступен ли AF_PACKET в этой системе"""
+        return hasattr(socket, "AF_PACKET")
+
+    def sweep(self, ips, interface, source_ip, source_mac):
+        """
+        Рассылает ARP-запросы и собирает ответы
+
+        Args:
+            ips (iterable): IP-адреса для опроса (в сети интерфейса)
+            interface (str): Имя интерфейса, например "eth0"
+            source_ip (str): IPv4-адрес интерфейса
+            source_mac (str): MAC-адрес интерфейса
+
+        Returns:
+            dict: {ip: {"MAC": MAC-адрес, "RTT": мс}} для ответивших хостов
+
+        Raises:
+            OSError: Если raw-сокет открыть нельзя (нет прав или интерфейса)
+        """
+        pending = list(dict.fromkeys(ips))
+        replies = {}
+        if not pending:
+            return replies
+
+        sender_mac = _mac_to_bytes(source_mac)
+        sender_ip = socket.inet_aton(source_ip)
+        sock = socket.socket(socket.AF_PACKET, socket.SOCK_RAW, socket.htons(ETH_P_ARP))
+        try:
+            sock.bind((interface, ETH_P_ARP))
+            sock.setblocking(False)
+            for _ in range(self.retries + 1):
+                self._round(sock, pending, sender_mac, sender_ip, replies)
+                pending = [ip for ip in pending if ip not in replies]
+                if not pending:
+                    break
+        finally:
+            sock.close()
+        return replies
+
+    def _round(self, sock, ips, sender_mac, sender_ip, replies):
+        interval = 1.0 / self.rate
+        sent_at = {}
+        started = time.monotonic()
+        next_index = 0
+        deadline = None
+
+        while True:
+            now = time.monotonic()
+            # Отправляем все запросы, время которых уже наступило
+            due = min(len(ips), int((now - started) / interval) + 1)
+            while next_index < due:
+                ip = ips[next_index]
+                next_index += 1
+                try:
+                    sock.send(self._build_request(sender_mac, sender_ip, socket.inet_aton(ip)))
+                    sent_at[ip] = time.monotonic()
+                except (BlockingIOError, InterruptedError):
+                    # Очередь интерфейса переполнена - повторим этот адрес позже
+                    next_index -= 1
+                    break
+            if next_index >= len(ips) and deadline is None:
+                deadline = time.monotonic() + self.timeout
+
+            if deadline is not None:
+                wait = deadline - time.monotonic()
+                if wait <= 0:
+                    return
+            else:
+                wait = max(0.0, started + next_index * interval - time.monotonic())
+
+            readable, _, _ = select.select([sock], [], [], wait)
+            if readable:
+                self._drain(sock, sent_at, replies)
+
+    @staticmethod
+    def _build_request(sender_mac, sender_ip, target_ip):
+        ethernet = BROADCAST_MAC + sender_mac + struct.pack("!H", ETH_P_ARP)
+        arp = struct.pack("!HHBBH", ARPHRD_ETHER, ETH_P_IP, 6, 4, ARPOP_REQUEST)
+        return ethernet + arp + sender_mac + sender_ip + b"\x00" * 6 + target_ip
+
+    @staticmethod
+    def _drain(sock, sent_at, replies):
+        while True:
+            try:
+                frame = sock.recv(2048)
+            except (BlockingIOError, InterruptedError):
+                return
+            if len(frame) < 42 or frame[12:14] != b"\x08\x06":
+                continue
+            htype, ptype, hlen, plen, op = struct.unpack_from("!HHBBH", frame, 14)
+            if op != ARPOP_REPLY or hlen != 6 or plen != 4:
+                continue
+            ip = socket.inet_ntoa(frame[28:32])
+            if ip in sent_at and ip not in replies:
+                replies[ip] = {
+                    "MAC": _bytes_to_mac(frame[22:28]),
+                    "RTT": round((time.monotonic() - sent_at[ip]) * 1000, 1)
+                }
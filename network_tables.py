@@ -0,0 +1,461 @@
+"""
+Чтение сетевых таблиц ядра без запуска внешних команд.
+
+ARP-таблица (таблица соседей) читается напрямую: на Linux из /proc/net/arp,
+а если он недоступен - через netlink (RTM_GETNEIGH); на Windows через
+GetIpNetTable из iphlpapi. Если нативный источник недоступен, функции
+возвращают None, и вызывающий код использует запасной путь через arp.
+
+Маршруты по умолчанию читаются так же напрямую: из /proc/net/route на Linux
+и через GetIpForwardTable на Windows.
+
+ArpSnapshotService раздает один снимок ARP-таблицы всем вкладкам и потокам:
+в пределах TTL повторные запросы получают тот же снимок, а одновременные
+запросы ждут одно чтение вместо того, чтобы запускать свое.
+"""
+
+import logging
+import os
+import socket
+import struct
+import sys
+import threading
+import time
+
+# Флаги записей /proc/net/arp (linux/if_arp.h)
+ATF_COM = 0x02   # Запись завершена (MAC известен)
+ATF_PERM = 0x04  # Постоянная (статическая) запись
+
+# Netlink (linux/netlink.h, linux/rtnetlink.h, linux/neighbour.h)
+NETLINK_ROUTE = 0
+NLMSG_ERROR = 2
+NLMSG_DONE = 3
+NLM_F_REQUEST = 0x01
+NLM_F_DUMP = 0x300
+RTM_NEWNEIGH = 28
+RTM_GETNEIGH = 30
+NDA_DST = 1
+NDA_LLADDR = 2
+NUD_INCOMPLETE = 0x01
+NUD_FAILED = 0x20
+NUD_NOARP = 0x40
+NUD_PERMANENT = 0x80
+
+_NLMSG_HEADER = struct.Struct('=IHHII')
+_NDMSG = struct.Struct('=BBHiHBB')
+_RTATTR = struct.Struct('=HH')
+
+# Флаги маршрутов /proc/net/route (linux/route.h)
+RTF_UP = 0x0001
+RTF_GATEWAY = 0x0002
+
+# Типы записей MIB_IPNETROW (Windows)
+MIB_IPNET_TYPE_INVALID = 2
+MIB_IPNET_TYPE_STATIC = 4
+
+
+def _format_mac(raw):
+    return ':'.join(f"{byte:02x}" for byte in raw)
+
+
+def read_neighbor_table():
+    """
+    Читает IPv4-таблицу соседей из ядра
+
+    Returns:
+        list: Список кортежей (ip, mac, is_static, интерфейс), MAC в виде "aa:bb:cc:dd:ee:ff";
+              None, если нативный источник на этой системе недоступен
+    """
+    if sys.platform.startswith('linux'):
+        entries = _read_proc_arp()
+        if entries is None:
+            entries = _read_netlink_neighbors()
+        return entries
+    if os.name == 'nt':
+        return _read_windows_ip_net_table()
+    return None
+
+
+def _read_proc_arp(path="/proc/net/arp"):
+    """
+    Разбирает /proc/net/arp:
+    IP address  HW type  Flags  HW address  Mask  Device
+    """
+    try:
+        with open(path, 'r') as f:
+            lines = f.read().splitlines()
+    except OSError:
+        return None
+
+    entries = []
+    for line in lines[1:]:
+        parts = line.split()
+        if len(parts) < 6:
+            continue
+        try:
+            flags = int(parts[2], 16)
+        except ValueError:
+            continue
+        # Незавершенные записи (MAC еще не получен) пропускаем
+        if not flags & ATF_COM:
+            continue
+        entries.append((parts[0], parts[3].lower(), bool(flags & ATF_PERM), parts[5]))
+    return entries
+
+
+def _read_netlink_neighbors():
+    """
+    Запрашивает дамп таблицы соседей через netlink (RTM_GETNEIGH)
+    """
+    if not hasattr(socket, 'AF_NETLINK'):
+        return None
+
+    try:
+        sock = socket.socket(socket.AF_NETLINK, socket.SOCK_RAW, NETLINK_ROUTE)
+    except OSError:
+        return None
+
+    entries = []
+    interface_names = {}
+    try:
+        sock.settimeout(1.0)
+        sock.bind((0, 0))
+        request = _NDMSG.pack(socket.AF_INET, 0, 0, 0, 0, 0, 0)
+        header = _NLMSG_HEADER.pack(_NLMSG_HEADER.size + len(request), RTM_GETNEIGH,
+                                    NLM_F_REQUEST | NLM_F_DUMP, 1, 0)
+        sock.send(header + request)
+
+        done = False
+        while not done:
+            data = sock.recv(65536)
+            if not data:
+                break
+            offset = 0
+            while offset + _NLMSG_HEADER.size <= len(data):
+                length, msg_type, _, _, _ = _NLMSG_HEADER.unpack_from(data, offset)
+                if length < _NLMSG_HEADER.size:
+                    done = True
+                    break
+                if msg_type == NLMSG_DONE:
+                    done = True
+                    break
+                if msg_type == NLMSG_ERROR:
+                    return None
+                if msg_type == RTM_NEWNEIGH:
+                    entry = _parse_neighbor_message(data, offset, length, interface_names)
+                    if entry:
+                        entries.append(entry)
+                offset += (length + 3) & ~3
+    except OSError as e:
+        logging.error(f"Ошибка при чтении таблицы соседей через netlink: {e}")
+        return None
+    finally:
+        sock.close()
+    return entries
+
+
+def _parse_neighbor_message(data, offset, length, interface_names):
+    body = offset + _NLMSG_HEADER.size
+    family, _, _, ifindex, state, _, _ = _NDMSG.unpack_from(data, body)
+    if family != socket.AF_INET or state & (NUD_INCOMPLETE | NUD_FAILED | NUD_NOARP):
+        return None
+
+    ip = None
+    mac = None
+    attr = body + _NDMSG.size
+    end = offset + length
+    while attr + _RTATTR.size <= end:
+        attr_len, attr_type = _RTATTR.unpack_from(data, attr)
+        if attr_len < _RTATTR.size:
+            break
+        payload = data[attr + _RTATTR.size:attr + attr_len]
+        if attr_type == NDA_DST and len(payload) == 4:
+            ip = socket.inet_ntoa(payload)
+        elif attr_type == NDA_LLADDR and len(payload) == 6:
+            mac = _format_mac(payload)
+        attr += (attr_len + 3) & ~3
+
+    if not ip or not mac:
+        return None
+
+    if ifindex not in interface_names:
+        try:
+            interface_names[ifindex] = socket.if_indextoname(ifindex)
+        except OSError:
+            interface_names[ifindex] = "Не определен"
+    return ip, mac, bool(state & NUD_PERMANENT), interface_names[ifindex]
+
+
+def _call_iphlpapi_table(function):
+    """
+    Вызывает функцию iphlpapi вида Get*Table(buffer, &size, order) и возвращает буфер
+    """
+    import ctypes
+
+    size = ctypes.c_ulong(0)
+    function(None, ctypes.byref(size), False)
+    if not size.value:
+        return None
+    buffer = ctypes.create_string_buffer(size.value)
+    if function(buffer, ctypes.byref(size), False) != 0:
+        return None
+    return buffer
+
+
+def _windows_interface_addresses():
+    """
+    Возвращает {индекс интерфейса: IPv4-адрес} из GetIpAddrTable
+    """
+    import ctypes
+    from ctypes import wintypes
+
+    class MIB_IPADDRROW(ctypes.Structure):
+        _fields_ = [
+            ("dwAddr", wintypes.DWORD),
+            ("dwIndex", wintypes.DWORD),
+            ("dwMask", wintypes.DWORD),
+            ("dwBCastAddr", wintypes.DWORD),
+            ("dwReasmSize", wintypes.DWORD),
+            ("unused1", wintypes.USHORT),
+            ("wType", wintypes.USHORT),
+        ]
+
+    buffer = _call_iphlpapi_table(ctypes.windll.iphlpapi.GetIpAddrTable)
+    if buffer is None:
+        return {}
+
+    count = wintypes.DWORD.from_buffer(buffer).value
+    rows = (MIB_IPADDRROW * count).from_buffer(buffer, ctypes.sizeof(wintypes.DWORD))
+    # dwAddr хранится в сетевом порядке байт
+    return {row.dwIndex: socket.inet_ntoa(struct.pack('=I', row.dwAddr)) for row in rows}
+
+
+def _read_windows_ip_net_table():
+    """
+    Читает ARP-таблицу через GetIpNetTable. Интерфейс, как и в выводе arp -a,
+    обозначается его IPv4-адресом
+    """
+    try:
+        import ctypes
+        from ctypes import wintypes
+
+        class MIB_IPNETROW(ctypes.Structure):
+            _fields_ = [
+                ("dwIndex", wintypes.DWORD),
+                ("dwPhysAddrLen", wintypes.DWORD),
+                ("bPhysAddr", ctypes.c_ubyte * 8),
+                ("dwAddr", wintypes.DWORD),
+                ("dwType", wintypes.DWORD),
+            ]
+
+        buffer = _call_iphlpapi_table(ctypes.windll.iphlpapi.GetIpNetTable)
+        if buffer is None:
+            return None
+
+        count = wintypes.DWORD.from_buffer(buffer).value
+        rows = (MIB_IPNETROW * count).from_buffer(buffer, ctypes.sizeof(wintypes.DWORD))
+        interface_addresses = _windows_interface_addresses()
+
+        entries = []
+        for row in rows:
+            if row.dwType == MIB_IPNET_TYPE_INVALID or row.dwPhysAddrLen != 6:
+                continue
+            entries.append((
+                socket.inet_ntoa(struct.pack('=I', row.dwAddr)),
+                _format_mac(bytes(row.bPhysAddr[:6])),
+                row.dwType == MIB_IPNET_TYPE_STATIC,
+                interface_addresses.get(row.dwIndex, "Не определен")
+            ))
+        return entries
+    except Exception as e:
+        logging.error(f"Ошибка при чтении ARP-таблицы через iphlpapi: {e}")
+        return None
+
+
+def read_default_routes():
+    """
+    Читает маршруты по умолчанию (0.0.0.0/0) из таблицы маршрутизации ядра
+
+    Returns:
+        list: Кортежи (шлюз, интерфейс, метрика), отсортированные по метрике.
+              Интерфейс на Linux - имя, на Windows - IPv4-адрес адаптера.
+              None, если нативный источник недоступен
+    """
+    if sys.platform.startswith('linux'):
+        routes = _read_proc_route()
+    elif os.name == 'nt':
+        routes = _read_windows_forward_table()
+    else:
+        routes = None
+    if routes is not None:
+        routes.sort(key=lambda route: route[2])
+    return routes
+
+
+def _read_proc_route(path="/proc/net/route"):
+    """
+    Разбирает /proc/net/route, адреса в нем записаны в шестнадцатеричном виде
+    в порядке байт хоста:
+    Iface  Destination  Gateway  Flags  RefCnt  Use  Metric  Mask  MTU  Window  IRTT
+    """
+    try:
+        with open(path, 'r') as f:
+            lines = f.read().splitlines()
+    except OSError:
+        return None
+
+    routes = []
+    for line in lines[1:]:
+        parts = line.split()
+        if len(parts) < 8:
+            continue
+        try:
+            destination = int(parts[1], 16)
+            gateway = int(parts[2], 16)
+            flags = int(parts[3], 16)
+            metric = int(parts[6])
+            mask = int(parts[7], 16)
+        except ValueError:
+            continue
+        if destination or mask or (flags & (RTF_UP | RTF_GATEWAY)) != (RTF_UP | RTF_GATEWAY):
+            continue
+        routes.append((socket.inet_ntoa(struct.pack('=I', gateway)), parts[0], metric))
+    return routes
+
+
+def _read_windows_forward_table():
+    """
+    Читает таблицу маршрутизации через GetIpForwardTable
+    """
+    try:
+        import ctypes
+        from ctypes import wintypes
+
+        class MIB_IPFORWARDROW(ctypes.Structure):
+            _fields_ = [
+                ("dwForwardDest", wintypes.DWORD),
+                ("dwForwardMask", wintypes.DWORD),
+                ("dwForwardPolicy", wintypes.DWORD),
+                ("dwForwardNextHop", wintypes.DWORD),
+                ("dwForwardIfIndex", wintypes.DWORD),
+                ("dwForwardType", wintypes.DWORD),
+                ("dwForwardProto", wintypes.DWORD),
+                ("dwForwardAge", wintypes.DWORD),
+                ("dwForwardNextHopAS", wintypes.DWORD),
+                ("dwForwardMetric1", wintypes.DWORD),
+                ("dwForwardMetric2", wintypes.DWORD),
+                ("dwForwardMetric3", wintypes.DWORD),
+                ("dwForwardMetric4", wintypes.DWORD),
+                ("dwForwardMetric5", wintypes.DWORD),
+            ]
+
+        buffer = _call_iphlpapi_table(ctypes.windll.iphlpapi.GetIpForwardTable)
+        if buffer is None:
+            return None
+
+        count = wintypes.DWORD.from_buffer(buffer).value
+        rows = (MIB_IPFORWARDROW * count).from_buffer(buffer, ctypes.sizeof(wintypes.DWORD))
+        interface_addresses = None
+
+        routes = []
+        for row in rows:
+            if row.dwForwardDest or row.dwForwardMask or not row.dwForwardNextHop:
+                continue
+            if interface_addresses is None:
+                interface_addresses = _windows_interface_addresses()
+            routes.append((
+                socket.inet_ntoa(struct.pack('=I', row.dwForwardNextHop)),
+                interface_addresses.get(row.dwForwardIfIndex, ""),
+                row.dwForwardMetric1
+            ))
+        return routes
+    except Exception as e:
+        logging.error(f"Ошибка при чтении таблицы маршрутизации через iphlpapi: {e}")
+        return None
+
+
+class ArpSnapshot:
+    """
+    Снимок ARP-таблицы: записи в исходном порядке и индекс по IP.
+    Снимок общий для всех потребителей, изменять записи нельзя
+    """
+    __slots__ = ("entries", "by_ip", "timestamp")
+
+    def __init__(self, entries, timestamp):
+        self.entries = entries
+        self.by_ip = {entry["IP"]: entry for entry in entries}
+        # Момент начала чтения (time.monotonic)
+        self.timestamp = timestamp
+
+    @property
+    def age(self):
+        return time.monotonic() - self.timestamp
+
+
+class ArpSnapshotService:
+    """
+    Кэш снимков ARP-таблицы с TTL и единственным одновременным чтением (single-flight)
+    """
+    def __init__(self, ttl=1.0):
+        """
+        Args:
+            ttl (float): Сколько секунд снимок считается свежим
+        """
+        self.ttl = ttl
+        self._snapshot = None
+        self._loading = None
+        self._lock = threading.Lock()
+
+    def get(self, loader, max_age=None):
+        """
+        Возвращает снимок не старше max_age, при необходимости читая таблицу
+
+        Если чтение уже идет в другом потоке, вызов дожидается его результата.
+
+        Args:
+            loader (callable): Функция без аргументов, возвращающая список записей ARP
+            max_age (float): Допустимый возраст снимка; по умолчанию TTL сервиса,
+                             0 - требуется чтение, начатое не раньше этого вызова
+
+        Returns:
+            ArpSnapshot
+        """
+        if max_age is None:
+            max_age = self.ttl
+        requested_at = time.monotonic()
+
+        while True:
+            with self._lock:
+                snapshot = self._snapshot
+                if snapshot is not None and snapshot.timestamp >= requested_at - max_age:
+                    return snapshot
+                loading = self._loading
+                if loading is None:
+                    loading = self._loading = threading.Event()
+                    is_owner = True
+                else:
+                    is_owner = False
+
+            if not is_owner:
+                # Ждем чужое чтение и заново проверяем, подходит ли его результат
+                loading.wait()
+                continue
+
+            started = time.monotonic()
+            snapshot = None
+            try:
+                snapshot = ArpSnapshot(loader(), started)
+            except Exception as e:
+                logging.error(f"Ошибка при чтении ARP-таблицы: {e}")
+            finally:
+                with self._lock:
+                    if snapshot is not None:
+                        self._snapshot = snapshot
+                    self._loading = None
+                loading.set()
+            return snapshot if snapshot is not None else ArpSnapshot([], started)
+
+    def invalidate(self):
+        """Сбрасывает кэш, следующий запрос прочитает таблицу заново"""
+        with self._lock:
+            self._snapshot = None
@@ -0,0 +1,332 @@
+"""
+База производителей по префиксам MAC-адресов (реестр IEEE: MA-L, MA-M, MA-S).
+
+Префиксы хранятся в заранее собранном двоичном файле oui.bin, который
+отображается в память (mmap) при первом поиске, а не при запуске программы.
+Поиск - двоичный по отсортированным массивам ключей прямо в отображенном
+файле, начиная с самого длинного префикса (36 бит, затем 28 и 24 бита).
+
+Формат oui.bin (все числа little-endian):
+    заголовок  b"BOUI", версия (H), резерв (H), число записей в таблицах
+               MA-S, MA-M и MA-L (3 x I), выравнивание до 8 байт
+    таблицы    для каждой: ключи-префиксы (Q, по возрастанию), затем смещения
+               имен в пуле строк (I); каждая секция выровнена на 8 байт
+    пул строк  имена производителей в UTF-8, каждое завершается нулевым байтом
+
+Файл собирается из CSV-выгрузок реестра IEEE (oui.csv, mam.csv, oui36.csv):
+    python oui_database.py build oui.csv mam.csv oui36.csv -o oui.bin
+Без аргументов собирается из встроенного списка BUILTIN_VENDORS (только для
+проверки: в поставке oui.bin собран из полного реестра).
+"""
+
+import argparse
+import bisect
+import csv
+import logging
+import mmap
+import os
+import struct
+import sys
+import threading
+
+MAGIC = b"BOUI"
+VERSION = 1
+HEADER_FORMAT = "<4sHH3I"
+HEADER_SIZE = 24
+
+# Длина префикса в битах для каждого реестра, от самого длинного к короткому
+REGISTRY_BITS = (("MA-S", 36), ("MA-M", 28), ("MA-L", 24))
+# Старый реестр IAB использует те же 36-битные префиксы, что и MA-S
+REGISTRY_ALIASES = {"IAB": "MA-S"}
+
+DATABASE_FILENAME = "oui.bin"
+
+# Встроенный список производителей сетевого оборудования (MA-L): запасной
+# вариант на случай, когда файл базы отсутствует или поврежден. В oui.bin из
+# выгрузок IEEE он не попадает
+BUILTIN_VENDORS = {
+    # Cisco
+    "00000C": "Cisco", "000142": "Cisco", "000143": "Cisco", "000163": "Cisco",
+    "000164": "Cisco", "000196": "Cisco", "000197": "Cisco", "0001C7": "Cisco",
+    "0001C9": "Cisco", "000216": "Cisco", "000217": "Cisco", "00022D": "Cisco",
+    "000F8F": "Cisco", "001007": "Cisco", "001111": "Cisco", "0016C7": "Cisco",
+    "001A2F": "Cisco", "001C7E": "Cisco", "001DA1": "Cisco", "001EBD": "Cisco",
+    "001F6C": "Cisco", "00223A": "Cisco", "002413": "Cisco", "002584": "Cisco",
+    # TP-Link
+    "000AEB": "TP-Link", "001018": "TP-Link", "0019E0": "TP-Link", "001D0F": "TP-Link",
+    "002127": "TP-Link", "5C63BF": "TP-Link", "645601": "TP-Link", "78C3E9": "TP-Link",
+    "8CFABA": "TP-Link", "94D9B3": "TP-Link", "A0F3C1": "TP-Link", "C4E984": "TP-Link",
+    "D8150D": "TP-Link", "EC172F": "TP-Link", "EC888F": "TP-Link", "F4EC38": "TP-Link",
+    # D-Link
+    "00055D": "D-Link", "000D88": "D-Link", "000F3D": "D-Link", "001195": "D-Link",
+    "0015E9": "D-Link", "00179A": "D-Link", "0019D1": "D-Link", "001B11": "D-Link",
+    "001CF0": "D-Link", "001E58": "D-Link", "002191": "D-Link", "0022B0": "D-Link",
+    "14D64D": "D-Link", "1C7EE5": "D-Link", "28107B": "D-Link", "3CBDD8": "D-Link",
+    # Huawei
+    "00259E": "Huawei", "001882": "Huawei", "00464B": "Huawei", "0C2C54": "Huawei",
+    "105172": "Huawei", "283152": "Huawei", "2CAB00": "Huawei", "3CDFBD": "Huawei",
+    "48AD08": "Huawei", "4C5499": "Huawei", "4CB16C": "Huawei", "547595": "Huawei",
+    "585F5A": "Huawei", "5CB395": "Huawei", "70725C": "Huawei", "78D752": "Huawei",
+    # ASUS
+    "001BFC": "ASUS", "001E8C": "ASUS", "002354": "ASUS", "00248C": "ASUS",
+    "0026ED": "ASUS", "00E018": "ASUS", "08606E": "ASUS", "107B44": "ASUS",
+    "149EDC": "ASUS", "1C872C": "ASUS", "305A3A": "ASUS", "38D547": "ASUS",
+    "485B39": "ASUS", "50465D": "ASUS", "54A050": "ASUS", "60A44C": "ASUS",
+    # Netgear
+    "00095B": "Netgear", "000FB5": "Netgear", "00146C": "Netgear",
+    "001E2A": "Netgear", "00224E": "Netgear", "002611": "Netgear", "008EF2": "Netgear",
+    "04A151": "Netgear", "08028E": "Netgear", "0826B9": "Netgear", "0C5415": "Netgear",
+    "100C6B": "Netgear", "10DA43": "Netgear", "205D47": "Netgear", "28C68E": "Netgear",
+    # Mikrotik
+    "001107": "MikroTik", "001149": "MikroTik", "00126E": "MikroTik", "001313": "MikroTik",
+    "0014D1": "MikroTik", "0015D5": "MikroTik", "0016C9": "MikroTik", "0017D1": "MikroTik",
+    "0021A5": "MikroTik", "002326": "MikroTik", "002401": "MikroTik", "0025B3": "MikroTik",
+    "002700": "MikroTik", "002728": "MikroTik", "00273F": "MikroTik", "002755": "MikroTik",
+    # ZyXEL
+    "001349": "ZyXEL", "00617C": "ZyXEL", "009C02": "ZyXEL", "105F06": "ZyXEL",
+    "18E225": "ZyXEL", "2C6BF5": "ZyXEL", "40B620": "ZyXEL", "547975": "ZyXEL",
+    "58863B": "ZyXEL", "5CA39D": "ZyXEL", "94638C": "ZyXEL", "A0E4CB": "ZyXEL",
+    "B0B20F": "ZyXEL", "B4C6F8": "ZyXEL", "BCEC23": "ZyXEL", "CC5D4E": "ZyXEL"
+}
+
+
+def default_database_path():
+    """Путь к oui.bin рядом с модулем или внутри сборки PyInstaller"""
+    base = getattr(sys, "_MEIPASS", os.path.dirname(os.path.abspath(__file__)))
+    return os.path.join(base, DATABASE_FILENAME)
+
+
+def _align(size):
+    return (size + 7) & ~7
+
+
+def mac_to_int(mac):
+    """
+    Преобразует MAC-адрес в 48-битное число
+
+    Args:
+        mac (str): MAC-адрес с разделителями ':', '-', '.' или без них
+
+    Returns:
+        tuple: (число, количество значащих бит) или None для некорректного адреса.
+               Неполный адрес (от 6 шестнадцатеричных цифр) дополняется нулями
+    """
+    digits = mac.replace(':', '').replace('-', '').replace('.', '')
+    length = len(digits)
+    if length < 6:
+        return None
+    if length > 12:
+        digits = digits[:12]
+        length = 12
+    try:
+        value = int(digits, 16)
+    except ValueError:
+        return None
+    return value << (4 * (12 - length)), 4 * length
+
+
+def pack_database(registries):
+    """
+    Собирает содержимое oui.bin
+
+    Args:
+        registries (dict): {"MA-L"|"MA-M"|"MA-S": {префикс (int): имя производителя}}
+
+    Returns:
+        bytes: Двоичный образ базы
+    """
+    pool = bytearray()
+    offsets = {}
+    tables = []
+    for registry, _ in REGISTRY_BITS:
+        entries = registries.get(registry, {})
+        keys = sorted(entries)
+        values = []
+        for key in keys:
+            name = entries[key]
+            if name not in offsets:
+                offsets[name] = len(pool)
+                pool += name.encode("utf-8") + b"\0"
+            values.append(offsets[name])
+        tables.append((keys, values))
+
+    out = bytearray(struct.pack(HEADER_FORMAT, MAGIC, VERSION, 0, *(len(keys) for keys, _ in tables)))
+    out += b"\0" * (HEADER_SIZE - len(out))
+    for keys, values in tables:
+        out += struct.pack(f"<{len(keys)}Q", *keys)
+        out += struct.pack(f"<{len(values)}I", *values)
+        out += b"\0" * (_align(len(out)) - len(out))
+    out += pool
+    return bytes(out)
+
+
+def builtin_registries():
+    """Реестры из встроенного списка BUILTIN_VENDORS"""
+    return {"MA-L": {int(oui, 16): name for oui, name in BUILTIN_VENDORS.items()}}
+
+
+def read_ieee_csv(path, registries):
+    """
+    Добавляет записи из CSV-выгрузки реестра IEEE
+    (столбцы Registry, Assignment, Organization Name)
+    """
+    known = dict(REGISTRY_BITS)
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        for row in csv.DictReader(f):
+            registry = (row.get("Registry") or "").strip()
+            registry = REGISTRY_ALIASES.get(registry, registry)
+            if registry not in known:
+                continue
+            try:
+                key = int(row["Assignment"].strip(), 16)
+            except (KeyError, ValueError):
+                continue
+            name = " ".join((row.get("Organization Name") or "").split())
+            if name:
+                registries.setdefault(registry, {})[key] = name
+
+
+class OuiDatabase:
+    """
+    Поиск производителя по MAC-адресу в базе oui.bin
+
+    База загружается при первом вызове lookup(). Имена производителей
+    декодируются один раз и затем берутся из кэша по смещению в пуле строк.
+    """
+    def __init__(self, path=None):
+        self.path = path or default_database_path()
+        self._lock = threading.Lock()
+        self._loaded = False
+        self._buffer = None
+        self._tables = ()
+        self._pool_start = 0
+        self._names = {}
+
+    def __len__(self):
+        self._ensure_loaded()
+        return sum(len(keys) for _, keys, _ in self._tables)
+
+    def lookup(self, mac):
+        """
+        Возвращает производителя по MAC-адресу
+
+        Returns:
+            str: Имя производителя или None, если префикс не найден
+        """
+        if not mac:
+            return None
+        parsed = mac_to_int(mac)
+        if parsed is None:
+            return None
+        value, significant = parsed
+        if not self._loaded:
+            self._ensure_loaded()
+
+        for bits, keys, values in self._tables:
+            if bits > significant:
+                continue
+            key = value >> (48 - bits)
+            index = bisect.bisect_left(keys, key)
+            if index < len(keys) and keys[index] == key:
+                return self._name(values[index])
+        return None
+
+    def _name(self, offset):
+        name = self._names.get(offset)
+        if name is None:
+            start = self._pool_start + offset
+            end = self._buffer.find(b"\0", start)
+            name = self._buffer[start:end].decode("utf-8", errors="replace")
+            self._names[offset] = name
+        return name
+
+    def _ensure_loaded(self):
+        with self._lock:
+            if self._loaded:
+                return
+            mapped = None
+            try:
+                with open(self.path, "rb") as f:
+                    mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                self._attach(mapped)
+            except (OSError, ValueError, struct.error) as e:
+                logging.error(f"Ошибка при загрузке базы производителей {self.path}: {e}")
+                if mapped is not None:
+                    mapped.close()
+                self._attach(pack_database(builtin_registries()))
+            self._loaded = True
+
+    def _attach(self, buffer):
+        magic, version, _, *counts = struct.unpack_from(HEADER_FORMAT, buffer, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError("неизвестный формат файла")
+
+        position = HEADER_SIZE
+        layout = []
+        for (_, bits), count in zip(REGISTRY_BITS, counts):
+            values_start = position + 8 * count
+            layout.append((bits, position, values_start, count))
+            position = _align(values_start + 4 * count)
+        if position > len(buffer):
+            raise ValueError("файл обрезан")
+
+        # Массивы читаются в порядке байт машины: файл little-endian, как и x86/ARM
+        view = memoryview(buffer)
+        self._tables = tuple(
+            (bits,
+             view[keys_start:keys_start + 8 * count].cast("Q"),
+             view[values_start:values_start + 4 * count].cast("I"))
+            for bits, keys_start, values_start, count in layout
+        )
+        self._buffer = buffer
+        self._pool_start = position
+        self._names = {}
+
+
+_default_database = None
+_default_lock = threading.Lock()
+
+
+def lookup_vendor(mac):
+    """Ищет производителя в базе по умолчанию (oui.bin рядом с программой)"""
+    global _default_database
+    if _default_database is None:
+        with _default_lock:
+            if _default_database is None:
+                _default_database = OuiDatabase()
+    return _default_database.lookup(mac)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="База производителей по префиксам MAC-адресов")
+    commands = parser.add_subparsers(dest="command")
+
+    build = commands.add_parser("build", help="собрать oui.bin из CSV-выгрузок IEEE")
+    build.add_argument("csv", nargs="*", help="файлы oui.csv, mam.csv, oui36.csv")
+    build.add_argument("-o", "--output", default=DATABASE_FILENAME, help="путь к файлу базы")
+
+    lookup = commands.add_parser("lookup", help="найти производителя по MAC-адресу")
+    lookup.add_argument("mac", nargs="+")
+    lookup.add_argument("-d", "--database", default=None, help="путь к файлу базы")
+
+    args = parser.parse_args(argv)
+    if args.command == "build":
+        # Встроенный список нужен только без выгрузок: в реестре IEEE полные имена
+        registries = {} if args.csv else builtin_registries()
+        for path in args.csv:
+            read_ieee_csv(path, registries)
+        data = pack_database(registries)
+        with open(args.output, "wb") as f:
+            f.write(data)
+        counts = ", ".join(f"{name}: {len(registries.get(name, {}))}" for name, _ in REGISTRY_BITS)
+        print(f"Записан {args.output} ({len(data)} байт; {counts})")
+    elif args.command == "lookup":
+        database = OuiDatabase(args.database)
+        for mac in args.mac:
+            print(f"{mac}\t{database.lookup(mac) or 'Неизвестно'}")
+    else:
+        parser.print_help()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""
+Замер времени запуска Bulwark.
+
+Каждый запуск выполняется в отдельном процессе (холодный импорт модулей):
+замеряется время импорта ui, создания главного окна и первой отрисовки,
+а также какие тяжелые необязательные модули оказались загружены к этому моменту.
+
+    python startup_benchmark.py            # 5 запусков
+    python startup_benchmark.py -n 10 --offscreen
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+# Необязательные модули, которые не должны загружаться при запуске
+HEAVY_MODULES = ("scapy", "numpy", "GPUtil", "wmi")
+
+
+def measure_child():
+    """Один запуск: импорт, создание окна, первая отрисовка"""
+    started = time.perf_counter()
+
+    from PyQt5.QtCore import QEvent, QObject, QTimer
+    from PyQt5.QtWidgets import QApplication
+    import ui
+    imported = time.perf_counter()
+
+    app = QApplication(sys.argv)
+    window = ui.MainWindow()
+    created = time.perf_counter()
+
+    result = {}
+
+    class PaintWatcher(QObject):
+        def eventFilter(self, obj, event):
+            if event.type() == QEvent.Paint and "paint" not in result:
+                result["paint"] = time.perf_counter()
+                QTimer.singleShot(0, app.quit)
+            return False
+
+    watcher = PaintWatcher()
+    window.installEventFilter(watcher)
+    window.show()
+    # Если окно не получит событие отрисовки (например, без дисплея), не ждем вечно
+    QTimer.singleShot(10000, app.quit)
+    app.exec_()
+
+    painted = result.get("paint", time.perf_counter())
+    report = {
+        "import": imported - started,
+        "window": created - imported,
+        "first_paint": painted - started,
+        "heavy_modules": [name for name in HEAVY_MODULES if name in sys.modules]
+    }
+    sys.__stdout__.write(json.dumps(report) + "\n")
+    sys.__stdout__.flush()
+    # Фоновые потоки мониторинга не должны задерживать выход
+    os._exit(0)
+
+
+def run(runs, offscreen):
+    env = dict(os.environ)
+    if offscreen:
+        env["QT_QPA_PLATFORM"] = "offscreen"
+
+    samples = []
+    for index in range(runs):
+        started = time.perf_counter()
+        output = subprocess.run([sys.executable, os.path.abspath(__file__), "--child"],
+                                env=env, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+                                cwd=os.path.dirname(os.path.abspath(__file__)))
+        total = time.perf_counter() - started
+        lines = [line for line in output.stdout.decode(errors="ignore").splitlines() if line.startswith("{")]
+        if not lines:
+            print(f"Запуск {index + 1}: нет результата (код {output.returncode})")
+            continue
+        sample = json.loads(lines[-1])
+        sample["process"] = total
+        samples.append(sample)
+        print(f"Запуск {index + 1}: импорт {sample['import'] * 1000:.0f} мс, "
+              f"окно {sample['window'] * 1000:.0f} мс, "
+              f"первая отрисовка {sample['first_paint'] * 1000:.0f} мс, "
+              f"процесс {total * 1000:.0f} мс")
+
+    if not samples:
+        return 1
+
+    print("\nМедиана:")
+    for key, title in (("import", "Импорт ui"), ("window", "Создание окна"),
+                       ("first_paint", "Первая отрисовка"), ("process", "Процесс целиком")):
+        print(f"  {title:<18} {statistics.median(s[key] for s in samples) * 1000:8.1f} мс")
+    heavy = sorted({name for s in samples for name in s["heavy_modules"]})
+    print(f"  Загружены при запуске: {', '.join(heavy) if heavy else 'нет тяжелых необязательных модулей'}")
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Замер времени запуска Bulwark")
+    parser.add_argument("-n", "--runs", type=int, default=5, help="количество запусков")
+    parser.add_argument("--offscreen", action="store_true", help="запуск без дисплея (QT_QPA_PLATFORM=offscreen)")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        measure_child()
+    else:
+        sys.exit(run(args.runs, args.offscreen))
+
+
+if __name__ == "__main__":
+    main()
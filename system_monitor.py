@@ -12,24 +12,35 @@ logger = logging.getLogger()
 logger.addHandler(NullHandler())
 logger.setLevel(logging.CRITICAL)  # Самый высокий уровень логирования
 
-# Попытка импортировать GPUtil с обработкой ошибки
-try:
-    import GPUtil
-    HAS_GPUTIL = True
-except ImportError:
-    HAS_GPUTIL = False
+# GPUtil и wmi импортируются при первом обращении, а не при запуске программы
+from lazy_loader import is_available, lazy_import
+from lazy_widgets import LazyTabWidget, PollingThread
+from metrics_history import get_metrics_history
+from metrics_store import get_metrics_store
 
-# Проверка наличия модуля wmi
-try:
-    import wmi
-    HAS_WMI = True
-except ImportError:
-    HAS_WMI = False
-    # Удаляем print, чтобы не было вывода в терминал
+HAS_GPUTIL = is_available("GPUtil")
+GPUtil = lazy_import("GPUtil")
+
+HAS_WMI = is_available("wmi")
+wmi = lazy_import("wmi")
+
+
+def has_gputil():
+    """GPUtil установлен и импортируется (проверка импортом при первом вызове)"""
+    return HAS_GPUTIL and GPUtil.available()
+
+
+def has_wmi():
+    """
+    wmi установлен и импортируется: найденный модуль может не загрузиться,
+    если поврежден pywin32, поэтому одного HAS_WMI недостаточно
+    """
+    return HAS_WMI and wmi.available()
 
 import time
+from collections import deque
 from PyQt5.QtCore import QThread, pyqtSignal, QTimer
-from PyQt5.QtWidgets import (QWidget, QVBoxLayout, QTabWidget, QLabel, QProgressBar, 
+from PyQt5.QtWidgets import (QWidget, QVBoxLayout, QLabel, QProgressBar, 
                            QGridLayout, QGroupBox, QHBoxLayout, QSplitter, QPushButton, 
                            QTableWidget, QTableWidgetItem, QHeaderView, QTreeWidget, 
                            QTreeWidgetItem, QStyle, QFrame, QStyledItemDelegate, 
@@ -41,15 +52,94 @@ import datetime
 import traceback
 import math
 
+# Загрузка CPU усредняется за последние CPU_SMOOTHING_WINDOW секунд
+CPU_SMOOTHING_WINDOW = 3.0
+
+# GPU и диски опрашиваются реже остальных метрик: запрос к WMI/nvidia-smi
+# и обход разделов заметно дороже чтения счетчиков CPU и памяти
+SLOW_METRICS_INTERVAL = 5.0
+
+# Интервал записи истории метрик; запись не зависит от опроса вкладок
+HISTORY_INTERVAL = 1.0
+
+# Окно сводки по истории метрик в подсказках вкладки "Система", в секундах
+HISTORY_SUMMARY_SECONDS = 3600
+
+
+class CpuSampler:
+    """
+    Неблокирующий замер загрузки процессора
+
+    При каждом вызове sample() читаются накопленные времена CPU
+    (psutil.cpu_times), а загрузка вычисляется по их приращению относительно
+    снимка, сделанного не менее window секунд назад. В отличие от
+    psutil.cpu_percent(interval=1), вызов не ждет, а усреднение учитывает
+    реальное время между замерами, а не число замеров.
+    """
+    def __init__(self, window=CPU_SMOOTHING_WINDOW):
+        self.window = window
+        # Снимки (time.monotonic, [(занято, всего) для каждого ядра])
+        self._snapshots = deque()
+        self._snapshots.append((time.monotonic(), self._read()))
+    
+    @staticmethod
+    def _busy_total(times):
+        """
+        Время занятости и общее время ядра; формула совпадает с psutil.cpu_percent
+        """
+        total = sum(times)
+        if psutil.LINUX:
+            # guest и guest_nice уже учтены в user и nice
+            total -= getattr(times, 'guest', 0) + getattr(times, 'guest_nice', 0)
+        idle = times.idle + getattr(times, 'iowait', 0)
+        return total - idle, total
+    
+    def _read(self):
+        return [self._busy_total(times) for times in psutil.cpu_times(percpu=True)]
+    
+    def sample(self):
+        """
+        Returns:
+            dict: {'total': средняя загрузка, 'per_cpu': [загрузка каждого ядра]} в процентах
+        """
+        now = time.monotonic()
+        current = self._read()
+        
+        # Базой служит самый свежий снимок старше окна усреднения
+        snapshots = self._snapshots
+        while len(snapshots) > 1 and now - snapshots[1][0] >= self.window:
+            snapshots.popleft()
+        base = snapshots[0][1]
+        if len(base) != len(current):
+            # Изменилось число ядер - начинаем историю заново
+            base = current
+            snapshots.clear()
+        snapshots.append((now, current))
+        
+        per_cpu = []
+        for (busy_before, total_before), (busy, total) in zip(base, current):
+            total_delta = total - total_before
+            if total_delta <= 0:
+                per_cpu.append(0.0)
+                continue
+            percent = (busy - busy_before) / total_delta * 100
+            per_cpu.append(min(max(percent, 0.0), 100.0))
+        
+        total_avg = sum(per_cpu) / len(per_cpu) if per_cpu else 0.0
+        return {
+            'total': round(total_avg, 1),
+            'per_cpu': [round(x, 1) for x in per_cpu]
+        }
+
+
 class SystemMonitor:
     """
     Класс для мониторинга системных ресурсов компьютера
     """
     def __init__(self):
         self.system_info = self.get_system_info()
-        # История загрузки CPU для сглаживания
-        self.cpu_history = []
-        self.history_size = 3  # Размер истории для усреднения
+        # Загрузка CPU по приращениям времен CPU со сглаживанием по времени
+        self.cpu_sampler = CpuSampler()
     
     def get_system_info(self):
         """
@@ -127,33 +217,9 @@ class SystemMonitor:
     
     def get_cpu_usage(self):
         """
-        Получение текущей загрузки процессора с усреднением
+        Получение текущей загрузки процессора с усреднением (без ожидания)
         """
-        # Получаем текущую загрузку всех ядер
-        current_usage = psutil.cpu_percent(interval=1, percpu=True)
-        
-        # Добавляем в историю
-        self.cpu_history.append(current_usage)
-        
-        # Ограничиваем размер истории
-        if len(self.cpu_history) > self.history_size:
-            self.cpu_history.pop(0)
-        
-        # Вычисляем среднее значение для каждого ядра
-        avg_per_core = []
-        cores_count = len(current_usage)
-        
-        for core in range(cores_count):
-            core_history = [history[core] for history in self.cpu_history]
-            avg_per_core.append(sum(core_history) / len(core_history))
-        
-        # Вычисляем общую среднюю загрузку
-        total_avg = sum(avg_per_core) / len(avg_per_core)
-        
-        return {
-            'total': round(total_avg, 1),
-            'per_cpu': [round(x, 1) for x in avg_per_core]
-        }
+        return self.cpu_sampler.sample()
     
     def get_ram_usage(self):
         """
@@ -167,7 +233,8 @@ class SystemMonitor:
             "Процент использования": memory.percent
         }
     
-    def get_disk_usage(self):
+    @staticmethod
+    def get_disk_usage():
         """
         Получение информации об использовании дисков
         """
@@ -195,7 +262,7 @@ class SystemMonitor:
         gpu_count = 0
         
         # Получаем информацию через WMI
-        if HAS_WMI:
+        if has_wmi():
             try:
                 wmi_obj = wmi.WMI()
                 for i, gpu in enumerate(wmi_obj.Win32_VideoController()):
@@ -240,7 +307,7 @@ class SystemMonitor:
                 logging.error(f"Ошибка при получении информации о GPU через WMI: {e}")
                 
         # Дополняем информацией из GPUtil если доступно
-        if HAS_GPUTIL:
+        if has_gputil():
             try:
                 for i, gpu in enumerate(GPUtil.getGPUs()):
                     gpu_count += 1
@@ -305,31 +372,103 @@ class SystemMonitor:
             "Dropped исходящие": net_io.dropout
         }
 
-class SystemMonitorThread(QThread):
+class SystemMonitorThread(PollingThread):
     """
     Поток для обновления информации о системных ресурсах
+    
+    CPU, память и сеть опрашиваются каждые interval секунд, диски и GPU -
+    раз в SLOW_METRICS_INTERVAL; ключи "disk" и "gpu" присутствуют только
+    в тех замерах, где эти данные обновлены. Поток только обновляет вкладку
+    и приостанавливается вместе с ней; историю метрик пишет MetricsRecorderThread.
     """
-    update_signal = pyqtSignal(dict)
+    interval = 0.5
     
     def __init__(self):
         super().__init__()
         self.monitor = SystemMonitor()
-        self._running = True
+        self._slow_metrics_time = None
     
-    def run(self):
-        while self._running:
-            data = {
-                "cpu": self.monitor.get_cpu_usage(),
-                "ram": self.monitor.get_ram_usage(),
-                "disk": self.monitor.get_disk_usage(),
-                "gpu": self.monitor.get_gpu_info(),
-                "network": self.monitor.get_network_io()
-            }
-            self.update_signal.emit(data)
-            time.sleep(1)
+    def poll(self):
+        data = {
+            "cpu": self.monitor.get_cpu_usage(),
+            "ram": self.monitor.get_ram_usage(),
+            "network": self.monitor.get_network_io()
+        }
+        now = time.monotonic()
+        if self._slow_metrics_time is None or now - self._slow_metrics_time >= SLOW_METRICS_INTERVAL:
+            self._slow_metrics_time = now
+            data["disk"] = self.monitor.get_disk_usage()
+            data["gpu"] = self.monitor.get_gpu_info()
+        return data
+
+class MetricsRecorderThread(PollingThread):
+    """
+    Фоновая запись истории метрик
     
-    def stop(self):
-        self._running = False
+    Единственный источник замеров для хранилища и истории метрик. Потоки
+    вкладок приостанавливаются, когда окно свернуто или вкладка скрыта, а этот
+    поток работает все время жизни главного окна, поэтому в истории нет
+    пропусков, пока приложение в фоне. Семейства истории: "system" (CPU,
+    память, суммарный трафик), "cpu" (ядра), "disk" (раз в
+    SLOW_METRICS_INTERVAL) и "interfaces" (трафик интерфейсов с IPv4-адресом).
+    
+    Поток создается вместе с главным окном, поэтому обходится без
+    SystemMonitor: сведения о системе (запрос к WMI) ему не нужны.
+    """
+    interval = HISTORY_INTERVAL
+    
+    def __init__(self):
+        super().__init__()
+        self.cpu_sampler = CpuSampler()
+        self.metrics = get_metrics_store()
+        self.history = get_metrics_history()
+        self._slow_metrics_time = None
+        self._interfaces = set()
+    
+    def poll(self):
+        try:
+            self.record_metrics()
+        except Exception as e:
+            logging.error(f"Ошибка при сохранении истории метрик: {e}")
+        return {}
+    
+    def record_metrics(self):
+        """Сохраняет замер в историю метрик в памяти и на диске"""
+        timestamp = time.time()
+        cpu = self.cpu_sampler.sample()
+        system = {"cpu.total": cpu["total"], "ram.percent": psutil.virtual_memory().percent}
+        cores = {f"cpu.core{core}": usage for core, usage in enumerate(cpu["per_cpu"])}
+        disks = {}
+        now = time.monotonic()
+        if self._slow_metrics_time is None or now - self._slow_metrics_time >= SLOW_METRICS_INTERVAL:
+            self._slow_metrics_time = now
+            disks = {f"disk.{disk['Точка монтирования']}.percent": disk["Процент использования"]
+                     for disk in SystemMonitor.get_disk_usage().values()}
+            # Список интерфейсов меняется редко (подключение VPN, Wi-Fi),
+            # поэтому обновляется вместе с дисками
+            self._interfaces = {name for name, addrs in psutil.net_if_addrs().items()
+                                if any(addr.family == socket.AF_INET for addr in addrs)}
+        self.metrics.record(system, timestamp)
+        self.metrics.record(cores, timestamp)
+        self.metrics.record(disks, timestamp)
+        
+        # В первом замере скорости сети еще нет; NaN сохраняет набор полей
+        # сегмента истории неизменным
+        system["net.sent"] = system["net.recv"] = float("nan")
+        net_io = psutil.net_io_counters()
+        system.update(self.metrics.record_counters({"net.sent": net_io.bytes_sent,
+                                                    "net.recv": net_io.bytes_recv}, timestamp))
+        counters = {}
+        for interface, io_counter in psutil.net_io_counters(pernic=True).items():
+            if interface in self._interfaces:
+                counters[f"net.{interface}.sent"] = io_counter.bytes_sent
+                counters[f"net.{interface}.recv"] = io_counter.bytes_recv
+        interfaces = self.metrics.record_counters(counters, timestamp)
+        
+        self.history.record("system", system, timestamp)
+        self.history.record("cpu", cores, timestamp)
+        self.history.record("disk", disks, timestamp)
+        self.history.record("interfaces", interfaces, timestamp)
 
 class SystemInfoTab(QWidget):
     """
@@ -591,14 +730,30 @@ class SystemInfoTab(QWidget):
             self.ram_total.setText(f"{ram_data['Всего (ГБ)']} ГБ")
             self.ram_used.setText(f"{ram_data['Использовано (ГБ)']} ГБ")
             self.ram_avail.setText(f"{ram_data['Доступно (ГБ)']} ГБ")
+        
+        # Сводка по истории меняется медленно, поэтому обновляется вместе с дисками
+        if "disk" in data:
+            self.update_history_tooltips()
+    
+    def update_history_tooltips(self):
+        """
+        Подсказки CPU и RAM со сводкой за последний час из хранилища метрик
+        """
+        metrics = get_metrics_store()
+        for bar, name in ((self.cpu_bar, "cpu.total"), (self.ram_bar, "ram.percent")):
+            stats = metrics.stats(name, HISTORY_SUMMARY_SECONDS)
+            if stats:
+                bar.setToolTip(f"За последний час: среднее {stats['mean']:.1f}%, "
+                               f"максимум {stats['max']:.1f}%, 95-й перцентиль {stats['p95']:.1f}%")
 
-class SystemMonitorWidget(QTabWidget):
+class SystemMonitorWidget(LazyTabWidget):
     """
     Виджет, содержащий вкладки для мониторинга системы
     """
     def __init__(self):
         super().__init__()
         self.monitor_thread = SystemMonitorThread()
+        self.device_manager_tab = None
         
         # Устанавливаем стиль для вкладок
         self.setStyleSheet("""
@@ -635,21 +790,42 @@ class SystemMonitorWidget(QTabWidget):
         
         self.init_ui()
         
-        # Запускаем поток мониторинга
-        self.monitor_thread.start()
+        # Поток мониторинга запускается при первом показе виджета (см. showEvent)
     
     def init_ui(self):
-        # Вкладка с общей информацией о системе (теперь включает информацию о процессоре и памяти)
+        # Вкладка с общей информацией о системе (теперь включает информацию о процессоре и памяти).
+        # Создается сразу: ее данные нужны строке состояния и отчетам главного окна
         self.system_tab = SystemInfoTab()
         self.addTab(self.system_tab, "Система")
         
-        # Вкладка с диспетчером устройств
-        self.device_manager_tab = DeviceManagerTab()
-        self.addTab(self.device_manager_tab, "Диспетчер устройств")
+        # Диспетчер устройств опрашивает WMI, поэтому создается при первом открытии вкладки
+        self.add_lazy_tab(self._create_device_manager_tab, "Диспетчер устройств")
         
         # Подключаем обновление данных для системной вкладки
         self.monitor_thread.update_signal.connect(self.system_tab.update_data)
     
+    def _create_device_manager_tab(self):
+        self.device_manager_tab = DeviceManagerTab()
+        return self.device_manager_tab
+    
+    def set_polling(self, active):
+        """
+        Включает или приостанавливает опрос системных ресурсов.
+        Опрос включается, только если виджет виден и окно не свернуто
+        """
+        if active and self.isVisible() and not self.window().isMinimized():
+            self.monitor_thread.resume()
+        else:
+            self.monitor_thread.pause()
+    
+    def showEvent(self, event):
+        super().showEvent(event)
+        self.set_polling(True)
+    
+    def hideEvent(self, event):
+        super().hideEvent(event)
+        self.set_polling(False)
+    
     def closeEvent(self, event):
         # Останавливаем поток при закрытии
         self.monitor_thread.stop()
@@ -884,7 +1060,7 @@ class DeviceManagerTab(QWidget):
         
         # WMI объект для отслеживания изменений устройств
         self.wmi_obj = None
-        if HAS_WMI:
+        if has_wmi():
             try:
                 self.wmi_obj = wmi.WMI()
                 
@@ -1650,7 +1826,7 @@ def get_audio_info_for_device_manager():
     """Получает расширенную информацию о звуковых устройствах."""
     audio_devices = {}
     
-    if not HAS_WMI:
+    if not has_wmi():
         return audio_devices
         
     try:
@@ -1715,7 +1891,7 @@ def get_monitors_info_for_device_manager():
     """Получает расширенную информацию о мониторах."""
     monitors = {}
     
-    if not HAS_WMI:
+    if not has_wmi():
         return monitors
         
     try:
@@ -1854,7 +2030,7 @@ def get_gpu_info_for_device_manager():
     
     try:
         # Проверяем наличие GPUtil
-        if HAS_GPUTIL:
+        if has_gputil():
             try:
                 # Получаем данные через GPUtil
                 for i, gpu in enumerate(GPUtil.getGPUs()):
@@ -1876,7 +2052,7 @@ def get_gpu_info_for_device_manager():
                 logging.error(f"Ошибка при получении информации о GPU через GPUtil: {e}")
         
         # Получаем информацию через WMI (только если не получили через GPUtil)
-        if not gpus and HAS_WMI:
+        if not gpus and has_wmi():
             try:
                 import pythoncom
                 
@@ -1965,7 +2141,7 @@ def get_network_info_for_device_manager():
     """Получает расширенную информацию о сетевых адаптерах."""
     network_adapters = {}
     
-    if not HAS_WMI:
+    if not has_wmi():
         return network_adapters
         
     try:
@@ -2037,7 +2213,7 @@ def get_motherboard_info_for_device_manager():
     """Получает расширенную информацию о материнской плате."""
     motherboards = {}
     
-    if not HAS_WMI:
+    if not has_wmi():
         return motherboards
         
     try:
@@ -2176,7 +2352,7 @@ def get_cpu_info_for_device_manager():
     
     try:
         # Используем WMI для получения информации о процессорах
-        if HAS_WMI:
+        if has_wmi():
             import pythoncom
             pythoncom.CoInitialize()
             
@@ -2219,7 +2395,7 @@ def get_disk_info_for_device_manager():
     
     try:
         # Используем WMI для получения информации о физических дисках
-        if HAS_WMI:
+        if has_wmi():
             import pythoncom
             pythoncom.CoInitialize()
             
@@ -2305,7 +2481,7 @@ def get_usb_info_for_device_manager():
     
     try:
         # Используем WMI для получения информации о USB устройствах
-        if HAS_WMI:
+        if has_wmi():
             import pythoncom
             pythoncom.CoInitialize()
             
@@ -0,0 +1,132 @@
+"""
+Модели таблиц, которые обновляются по разнице между снимками данных.
+
+SnapshotTableModel получает каждый новый снимок целиком (список строк), но
+сообщает представлению только о реальных изменениях: удаленные и добавленные
+строки - через beginRemoveRows/beginInsertRows, измененные ячейки - сигналом
+dataChanged по диапазону столбцов строки. Если ничего не изменилось, модель
+не выдает ни одного сигнала, и таблица не перерисовывается.
+"""
+
+from PyQt5.QtCore import QAbstractTableModel, QModelIndex, Qt
+
+
+def _unique_keys(keys):
+    """Делает ключи уникальными, добавляя номер повтора к повторяющимся"""
+    seen = {}
+    result = []
+    for key in keys:
+        count = seen.get(key, 0)
+        seen[key] = count + 1
+        result.append(key if count == 0 else (key, count))
+    return result
+
+
+class SnapshotTableModel(QAbstractTableModel):
+    """
+    Таблица только для чтения, строки которой сопоставляются между снимками по ключу
+
+    Args:
+        headers (list): Заголовки столбцов
+        key_columns (tuple): Столбцы, значения которых образуют ключ строки
+    """
+    def __init__(self, headers, key_columns=(0,), parent=None):
+        super().__init__(parent)
+        self._headers = list(headers)
+        self._key_columns = tuple(key_columns)
+        self._rows = []
+        self._keys = []
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._rows)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._headers)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole and index.isValid():
+            return self._rows[index.row()][index.column()]
+        return None
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole and orientation == Qt.Horizontal and section < len(self._headers):
+            return self._headers[section]
+        return super().headerData(section, orientation, role)
+
+    def row(self, index):
+        """Строка по номеру (кортеж строковых значений)"""
+        return self._rows[index]
+
+    def set_rows(self, rows):
+        """
+        Применяет новый снимок
+
+        Args:
+            rows (list): Строки таблицы - последовательности значений по столбцам
+        """
+        width = len(self._headers)
+        rows = [tuple("" if value is None else str(value) for value in row[:width]) for row in rows]
+        keys = _unique_keys(tuple(row[column] for column in self._key_columns) for row in rows)
+
+        if keys != self._keys:
+            if not self._apply_structure(rows, keys):
+                self.beginResetModel()
+                self._rows, self._keys = rows, keys
+                self.endResetModel()
+                return
+
+        self._apply_cells(rows)
+
+    def _apply_structure(self, rows, keys):
+        """
+        Удаляет исчезнувшие и вставляет новые строки.
+
+        Returns:
+            bool: False, если общие строки поменяли порядок (нужен полный сброс модели)
+        """
+        new_keys = set(keys)
+        old_keys = set(self._keys)
+        common_new_order = [key for key in keys if key in old_keys]
+        common_old_order = [key for key in self._keys if key in new_keys]
+        if common_new_order != common_old_order:
+            return False
+
+        # Удаление: с конца, непрерывными диапазонами
+        position = len(self._keys) - 1
+        while position >= 0:
+            if self._keys[position] in new_keys:
+                position -= 1
+                continue
+            last = position
+            while position >= 0 and self._keys[position] not in new_keys:
+                position -= 1
+            self.beginRemoveRows(QModelIndex(), position + 1, last)
+            del self._rows[position + 1:last + 1]
+            del self._keys[position + 1:last + 1]
+            self.endRemoveRows()
+
+        # Вставка: по возрастанию позиций, непрерывными диапазонами
+        position = 0
+        while position < len(keys):
+            if keys[position] in old_keys:
+                position += 1
+                continue
+            first = position
+            while position < len(keys) and keys[position] not in old_keys:
+                position += 1
+            self.beginInsertRows(QModelIndex(), first, position - 1)
+            self._rows[first:first] = rows[first:position]
+            self._keys[first:first] = keys[first:position]
+            self.endInsertRows()
+        return True
+
+    def _apply_cells(self, rows):
+        """Заменяет значения и выдает dataChanged только для измененных ячеек"""
+        for row_index, (old, new) in enumerate(zip(self._rows, rows)):
+            if old == new:
+                continue
+            changed = [column for column, (a, b) in enumerate(zip(old, new)) if a != b]
+            self._rows[row_index] = new
+            if changed:
+                self.dataChanged.emit(self.index(row_index, changed[0]),
+                                      self.index(row_index, changed[-1]), [Qt.DisplayRole])
@@ -0,0 +1,594 @@
+"""
+Раскладка схемы топологии сети и пространственный индекс для поиска устройств.
+
+Позиции устройств вычисляются один раз и используются до изменения данных
+или размеров холста. SpatialGrid делит плоскость на квадратные ячейки и
+хранит в каждой устройства, центры которых в нее попадают: поиск устройства
+под курсором проверяет только соседние ячейки, а отсечение невидимых
+устройств при отрисовке - только ячейки, попавшие в область просмотра.
+
+Соединения выводятся из подсетей, шлюза и трассировки (infer_links): каждое
+устройство соединяется с концентратором своей подсети, концентраторы - со
+шлюзом, узлы трассировки - по цепочке. Число соединений растет линейно с
+числом устройств, а не квадратично, как при соединении всех со всеми.
+
+Кроме раскладки по кругу есть иерархическая (шлюз -> подсети -> устройства)
+и силовая с приближением Барнса - Хата; обе считаются в естественных
+координатах (шаг DEVICE_SPACING) и вписываются в холст функцией fit_to_view.
+Силовая раскладка считается в отдельном потоке (ForceLayoutThread).
+"""
+
+import logging
+import math
+import time
+
+from PyQt5.QtCore import QThread, pyqtSignal
+
+import ipv4
+
+# Режимы раскладки схемы
+LAYOUT_HIERARCHICAL = "hierarchical"
+LAYOUT_FORCE = "force"
+LAYOUT_CIRCULAR = "circular"
+
+# Расстояние между соседними устройствами в естественных координатах раскладки
+DEVICE_SPACING = 60.0
+# Поля холста при вписывании раскладки
+FIT_MARGIN = 50
+
+# Барнс - Хат: группа считается одной точкой, если размер ее ячейки меньше theta * расстояние
+BARNES_HUT_THETA = 0.7
+# Начальный предельный сдвиг за итерацию (в долях DEVICE_SPACING) и его уменьшение
+FORCE_START_TEMPERATURE = 2.0
+FORCE_COOLING = 0.95
+# Доля новых устройств, ниже которой начальный сдвиг не уменьшается
+FORCE_MIN_SHARE = 0.02
+FORCE_STOP_TEMPERATURE = 0.5
+FORCE_MAX_ITERATIONS = 300
+FORCE_GRAVITY = 0.2
+# Как часто поток раскладки передает промежуточные позиции на холст, секунды
+FORCE_EMIT_INTERVAL = 0.1
+# Ячейки меньше этого размера не делятся (почти совпадающие точки)
+_MIN_QUAD_HALF = 1e-3
+
+# Приоритет выбора концентратора подсети: чем меньше, тем предпочтительнее
+_HUB_ROUTER_PRIMARY, _HUB_ROUTER, _HUB_SWITCH, _HUB_LOCAL, _HUB_OTHER = range(5)
+
+
+def circular_layout(keys, center_key, width, height):
+    """
+    Центральное устройство (маршрутизатор) в центре, остальные равномерно
+    по окружности, начиная с верхней точки
+
+    Args:
+        keys (list): Ключи устройств (IP) в порядке отображения
+        center_key: Ключ устройства в центре или None
+        width, height (float): Размеры области в логических координатах
+
+    Returns:
+        dict: {ключ: (x, y)}
+    """
+    positions = {}
+    center_x = width / 2
+    center_y = height / 2
+
+    if center_key is not None:
+        positions[center_key] = (center_x, center_y)
+
+    others = [key for key in keys if key != center_key]
+    if others:
+        radius = min(width, height) * 0.4
+        angle_step = 2 * math.pi / len(others)
+        start_angle = -math.pi / 2
+        for index, key in enumerate(others):
+            angle = start_angle + index * angle_step
+            positions[key] = (center_x + radius * math.cos(angle),
+                              center_y + radius * math.sin(angle))
+    return positions
+
+
+class SpatialGrid:
+    """
+    Равномерная сетка для поиска точек по координатам
+
+    Каждый элемент хранится с порядковым номером добавления, и результаты
+    запросов возвращаются в этом порядке: так поиск под курсором находит то же
+    устройство, что и полный перебор, а отрисовка сохраняет порядок наложения.
+
+    Args:
+        cell_size (float): Размер ячейки; для поиска под курсором разумно брать
+                           размер иконки, тогда достаточно проверить 3x3 ячейки
+    """
+    def __init__(self, cell_size):
+        self.cell_size = float(cell_size)
+        self._cells = {}
+        self._items = []
+
+    def __len__(self):
+        return len(self._items)
+
+    def _cell(self, x, y):
+        return int(math.floor(x / self.cell_size)), int(math.floor(y / self.cell_size))
+
+    def insert(self, item, x, y):
+        entry = (len(self._items), item, x, y)
+        self._items.append(entry)
+        self._cells.setdefault(self._cell(x, y), []).append(entry)
+
+    def query_point(self, x, y, half_size):
+        """
+        Элементы, квадрат которых со стороной 2 * half_size вокруг центра содержит точку
+
+        Returns:
+            list: Элементы в порядке добавления
+        """
+        reach = int(math.ceil(half_size / self.cell_size))
+        cell_x, cell_y = self._cell(x, y)
+        found = []
+        for dx in range(-reach, reach + 1):
+            for dy in range(-reach, reach + 1):
+                for entry in self._cells.get((cell_x + dx, cell_y + dy), ()):
+                    if abs(entry[2] - x) <= half_size and abs(entry[3] - y) <= half_size:
+                        found.append(entry)
+        found.sort(key=lambda entry: entry[0])
+        return [entry[1] for entry in found]
+
+    def query_rect(self, left, top, right, bottom):
+        """
+        Элементы, центры которых лежат в прямоугольнике
+
+        Returns:
+            list: Элементы в порядке добавления
+        """
+        first_x, first_y = self._cell(left, top)
+        last_x, last_y = self._cell(right, bottom)
+        cell_count = (last_x - first_x + 1) * (last_y - first_y + 1)
+
+        if cell_count >= len(self._items):
+            # Прямоугольник охватывает больше ячеек, чем элементов: быстрее полный перебор
+            candidates = self._items
+        else:
+            candidates = []
+            for cell_x in range(first_x, last_x + 1):
+                for cell_y in range(first_y, last_y + 1):
+                    candidates.extend(self._cells.get((cell_x, cell_y), ()))
+            candidates.sort(key=lambda entry: entry[0])
+
+        return [entry[1] for entry in candidates
+                if left <= entry[2] <= right and top <= entry[3] <= bottom]
+
+
+def _subnet_of(device, key):
+    """Подсеть устройства; если она не указана - сеть /24 его адреса"""
+    subnet = device.get("Подсеть")
+    if subnet:
+        return subnet
+    value = ipv4.ip_to_int(key)
+    return ipv4.network_of(value, 24) if value is not None else key
+
+
+def _hub_rank(device):
+    device_type = device.get("Тип", "")
+    if "Маршрутизатор" in device_type:
+        return _HUB_ROUTER_PRIMARY if device.get("Основной", False) else _HUB_ROUTER
+    if "Коммутатор" in device_type:
+        return _HUB_SWITCH
+    if device.get("Локальный", False):
+        return _HUB_LOCAL
+    return _HUB_OTHER
+
+
+def _source_key(devices, keys):
+    """Ключ локального компьютера, с которого выполнялась трассировка"""
+    local = [key for device, key in zip(devices, keys) if device.get("Локальный", False)]
+    preferred = [key for device, key in zip(devices, keys) if device.get("Предпочтительный", False)]
+    if preferred:
+        return preferred[0]
+    return local[0] if local else None
+
+
+def infer_links(devices, device_key, gateway_key=None, trace_hops=()):
+    """
+    Соединения между устройствами схемы
+
+    В каждой подсети устройства соединяются с концентратором: шлюзом, другим
+    маршрутизатором, коммутатором или локальным компьютером (в этом порядке
+    предпочтения). Концентраторы подсетей соединяются со шлюзом, а если его
+    нет - с концентратором первой подсети. Адреса трассировки, которые есть на
+    схеме, соединяются по порядку, начиная с локального компьютера.
+
+    Args:
+        devices (list): Устройства схемы
+        device_key: Функция, возвращающая ключ (IP) устройства
+        gateway_key: Ключ основного шлюза или None
+        trace_hops (list): IP-адреса узлов последней трассировки по порядку
+
+    Returns:
+        list: Пары ключей (откуда, куда) без повторов; не больше
+              len(devices) + len(trace_hops) соединений
+    """
+    keys = [device_key(device) for device in devices]
+    known = set(keys)
+    links = []
+    seen = set()
+
+    def link(first, second):
+        pair = (first, second) if first <= second else (second, first)
+        if first != second and pair not in seen:
+            seen.add(pair)
+            links.append((first, second))
+
+    subnets = {}
+    for device, key in zip(devices, keys):
+        subnets.setdefault(_subnet_of(device, key), []).append((device, key))
+
+    hubs = []
+    for members in subnets.values():
+        # Шлюз - всегда концентратор своей подсети; иначе лучший по приоритету, при равенстве - первый
+        hub = min(members, key=lambda member: -1 if member[1] == gateway_key else _hub_rank(member[0]))[1]
+        for _, key in members:
+            link(hub, key)
+        hubs.append(hub)
+
+    core = gateway_key if gateway_key in known else (hubs[0] if hubs else None)
+    for hub in hubs:
+        link(core, hub)
+
+    previous = _source_key(devices, keys)
+    for hop in trace_hops:
+        if hop in known:
+            if previous is not None:
+                link(previous, hop)
+            previous = hop
+
+    return links
+
+
+def _link_tree(keys, links, root):
+    """
+    Дерево обхода в ширину по соединениям от корня
+
+    Returns:
+        dict: {ключ: [дочерние ключи]}; устройства без пути до корня
+              становятся дочерними узлами корня
+    """
+    neighbours = {key: [] for key in keys}
+    for first, second in links:
+        if first in neighbours and second in neighbours:
+            neighbours[first].append(second)
+            neighbours[second].append(first)
+
+    tree = {key: [] for key in keys}
+    visited = {root}
+    queue = [root]
+    for node in queue:
+        for neighbour in neighbours[node]:
+            if neighbour not in visited:
+                visited.add(neighbour)
+                tree[node].append(neighbour)
+                queue.append(neighbour)
+    tree[root].extend(key for key in keys if key not in visited)
+    return tree
+
+
+def _subtree_sizes(tree, root):
+    """Число узлов в каждом поддереве (без рекурсии: цепочки трассировки бывают длинными)"""
+    order = [root]
+    for node in order:
+        order.extend(tree[node])
+    sizes = {}
+    for node in reversed(order):
+        sizes[node] = 1 + sum(sizes[child] for child in tree[node])
+    return sizes
+
+
+def _place_rings(items, start, end, radius, spacing, positions):
+    """
+    Размещает устройства в секторе [start, end) по дугам, начиная с radius;
+    на каждой дуге столько устройств, сколько помещается с шагом spacing
+    """
+    index = 0
+    while index < len(items):
+        capacity = max(1, int((end - start) * radius / spacing))
+        row = items[index:index + capacity]
+        step = (end - start) / len(row)
+        for position, key in enumerate(row):
+            angle = start + step * (position + 0.5)
+            positions[key] = (radius * math.cos(angle), radius * math.sin(angle))
+        index += len(row)
+        radius += spacing
+
+
+def hierarchical_layout(keys, links, root, spacing=DEVICE_SPACING):
+    """
+    Радиальная иерархическая раскладка: шлюз -> подсети -> устройства
+
+    Корень (шлюз) в начале координат, каждое поддерево получает сектор,
+    пропорциональный числу его узлов. Концентраторы подсетей стоят на
+    следующем кольце в середине своего сектора, а конечные устройства
+    заполняют дуги сектора с шагом spacing и при нехватке места переходят
+    на следующие дуги, а не накладываются друг на друга.
+
+    Args:
+        keys (list): Ключи устройств
+        links (list): Соединения (пары ключей), например из infer_links
+        root: Ключ корня или None (тогда корень - первое устройство)
+        spacing (float): Минимальное расстояние между соседними устройствами
+
+    Returns:
+        dict: {ключ: (x, y)} в естественных координатах (см. fit_to_view)
+    """
+    if not keys:
+        return {}
+    if root not in keys:
+        root = keys[0]
+
+    tree = _link_tree(keys, links, root)
+    sizes = _subtree_sizes(tree, root)
+    positions = {root: (0.0, 0.0)}
+
+    # Обход секторов без рекурсии: (узел, начало сектора, конец сектора, радиус узла)
+    pending = [(root, -math.pi / 2, 3 * math.pi / 2, 0.0)]
+    while pending:
+        node, start, end, radius = pending.pop()
+        children = tree[node]
+        if not children:
+            continue
+        leaves = [child for child in children if not tree[child]]
+        branches = [child for child in children if tree[child]]
+        total = len(leaves) + sum(sizes[branch] for branch in branches)
+        angle = start
+        if leaves:
+            span = (end - start) * len(leaves) / total
+            _place_rings(leaves, angle, angle + span, radius + spacing, spacing, positions)
+            angle += span
+        for branch in branches:
+            span = (end - start) * sizes[branch] / total
+            middle = angle + span / 2
+            # Поддерево отодвигается на два шага, чтобы его линии не сливались с соседними
+            branch_radius = radius + 2 * spacing
+            positions[branch] = (branch_radius * math.cos(middle), branch_radius * math.sin(middle))
+            pending.append((branch, angle, angle + span, branch_radius))
+            angle += span
+    return positions
+
+
+def fit_to_view(positions, width, height, margin=FIT_MARGIN):
+    """
+    Переводит естественные координаты в координаты холста: раскладка
+    центрируется и при необходимости уменьшается, чтобы поместиться целиком
+
+    Returns:
+        dict: {ключ: (x, y)}
+    """
+    if not positions:
+        return {}
+    xs = [point[0] for point in positions.values()]
+    ys = [point[1] for point in positions.values()]
+    extent_x = max(xs) - min(xs)
+    extent_y = max(ys) - min(ys)
+    factor = 1.0
+    if extent_x > 0:
+        factor = min(factor, max(width - 2 * margin, 1) / extent_x)
+    if extent_y > 0:
+        factor = min(factor, max(height - 2 * margin, 1) / extent_y)
+    middle_x = (max(xs) + min(xs)) / 2
+    middle_y = (max(ys) + min(ys)) / 2
+    return {key: (width / 2 + (x - middle_x) * factor, height / 2 + (y - middle_y) * factor)
+            for key, (x, y) in positions.items()}
+
+
+class _QuadNode:
+    """Узел дерева квадрантов: центр и полуразмер квадрата, масса и центр масс"""
+    __slots__ = ("x", "y", "half", "mass", "cx", "cy", "body", "children")
+
+    def __init__(self, x, y, half):
+        self.x = x
+        self.y = y
+        self.half = half
+        self.mass = 0
+        self.cx = 0.0
+        self.cy = 0.0
+        self.body = None
+        self.children = None
+
+    def child_for(self, x, y):
+        quadrant = (x >= self.x) + 2 * (y >= self.y)
+        child = self.children[quadrant]
+        if child is None:
+            quarter = self.half / 2
+            child = _QuadNode(self.x + (quarter if x >= self.x else -quarter),
+                              self.y + (quarter if y >= self.y else -quarter), quarter)
+            self.children[quadrant] = child
+        return child
+
+
+def _build_quadtree(xs, ys):
+    half = max(max(xs) - min(xs), max(ys) - min(ys)) / 2 + 1.0
+    root = _QuadNode((max(xs) + min(xs)) / 2, (max(ys) + min(ys)) / 2, half)
+    for index, (x, y) in enumerate(zip(xs, ys)):
+        node = root
+        while True:
+            total = node.mass + 1
+            node.cx += (x - node.cx) / total
+            node.cy += (y - node.cy) / total
+            node.mass = total
+            if node.children is None:
+                if total == 1:
+                    node.body = index
+                    break
+                if node.half < _MIN_QUAD_HALF:
+                    # Почти совпадающие точки: масса копится в одном листе
+                    break
+                other = node.body
+                node.body = None
+                node.children = [None, None, None, None]
+                child = node.child_for(xs[other], ys[other])
+                child.mass = 1
+                child.cx = xs[other]
+                child.cy = ys[other]
+                child.body = other
+            node = node.child_for(x, y)
+    return root
+
+
+class ForceLayout:
+    """
+    Силовая раскладка с приближением Барнса - Хата
+
+    Соединенные устройства притягиваются, все устройства отталкиваются друг
+    от друга. Отталкивание далеких групп считается по их центру масс из дерева
+    квадрантов, поэтому шаг стоит O(n log n), а не O(n^2). Раскладка
+    инкрементальная: устройства, для которых переданы начальные позиции,
+    начинают с них, и при малой доле новых устройств шаг с самого начала
+    небольшой, так что схема не перестраивается заново.
+
+    Args:
+        keys (list): Ключи устройств
+        links (list): Соединения (пары ключей)
+        initial (dict): Начальные позиции {ключ: (x, y)} в естественных координатах
+        seed (dict): Позиции для устройств, которых нет в initial
+        spacing (float): Желаемая длина соединения
+    """
+    def __init__(self, keys, links, initial, seed, spacing=DEVICE_SPACING, theta=BARNES_HUT_THETA):
+        self.keys = list(keys)
+        self.spacing = float(spacing)
+        self.theta = theta
+        self.xs = []
+        self.ys = []
+        occupied = set()
+        known = 0
+        for index, key in enumerate(self.keys):
+            point = initial.get(key)
+            if point is not None:
+                known += 1
+            else:
+                point = seed.get(key, (0.0, 0.0))
+            x, y = point
+            # Совпадающие точки раздвигаем: в одной точке сила отталкивания не определена
+            while (round(x, 3), round(y, 3)) in occupied:
+                x += math.cos(index) * 0.1 * spacing
+                y += math.sin(index) * 0.1 * spacing
+            occupied.add((round(x, 3), round(y, 3)))
+            self.xs.append(float(x))
+            self.ys.append(float(y))
+
+        index_of = {key: index for index, key in enumerate(self.keys)}
+        self.edges = [(index_of[first], index_of[second]) for first, second in links
+                      if first in index_of and second in index_of]
+
+        new_share = 1.0 - known / len(self.keys) if self.keys else 0.0
+        self.temperature = self.spacing * FORCE_START_TEMPERATURE * max(new_share, FORCE_MIN_SHARE)
+        self.iterations = 0
+
+    @property
+    def converged(self):
+        return (self.temperature < FORCE_STOP_TEMPERATURE or self.iterations >= FORCE_MAX_ITERATIONS
+                or len(self.keys) < 2)
+
+    def positions(self):
+        return dict(zip(self.keys, zip(self.xs, self.ys)))
+
+    def step(self):
+        """Одна итерация: силы, сдвиг не больше текущей температуры, охлаждение"""
+        xs, ys = self.xs, self.ys
+        count = len(xs)
+        k2 = self.spacing * self.spacing
+        theta2 = self.theta * self.theta
+        root = _build_quadtree(xs, ys)
+
+        dxs = [0.0] * count
+        dys = [0.0] * count
+        for index in range(count):
+            x, y = xs[index], ys[index]
+            fx = fy = 0.0
+            stack = [root]
+            while stack:
+                node = stack.pop()
+                dx = x - node.cx
+                dy = y - node.cy
+                distance2 = dx * dx + dy * dy
+                mass = node.mass
+                if node.children is None:
+                    if node.body == index:
+                        mass -= 1
+                elif 4 * node.half * node.half >= theta2 * distance2:
+                    # Узел слишком близко для приближения: спускаемся к дочерним
+                    stack.extend(child for child in node.children if child is not None)
+                    continue
+                if mass <= 0:
+                    continue
+                if distance2 < 1e-9:
+                    # Совпавшие точки расталкиваем в направлении, зависящем от номера
+                    fx += math.cos(index) * self.spacing * mass
+                    fy += math.sin(index) * self.spacing * mass
+                    continue
+                force = k2 * mass / distance2
+                fx += dx * force
+                fy += dy * force
+            # Слабое притяжение к центру не дает несвязным частям разлетаться
+            dxs[index] = fx - x * FORCE_GRAVITY
+            dys[index] = fy - y * FORCE_GRAVITY
+
+        for first, second in self.edges:
+            dx = xs[first] - xs[second]
+            dy = ys[first] - ys[second]
+            distance = math.sqrt(dx * dx + dy * dy)
+            if distance < 1e-9:
+                continue
+            # Логарифмическая пружина (Идс): длинные соединения тянут слабее,
+            # чем квадратичное притяжение, и подсети со множеством устройств не сжимаются в комок
+            force = self.spacing * math.log(distance / self.spacing) / distance
+            dxs[first] -= dx * force
+            dys[first] -= dy * force
+            dxs[second] += dx * force
+            dys[second] += dy * force
+
+        temperature = self.temperature
+        for index in range(count):
+            length = math.sqrt(dxs[index] * dxs[index] + dys[index] * dys[index])
+            if length > 0:
+                shift = min(length, temperature) / length
+                xs[index] += dxs[index] * shift
+                ys[index] += dys[index] * shift
+
+        self.temperature *= FORCE_COOLING
+        self.iterations += 1
+
+
+class ForceLayoutThread(QThread):
+    """
+    Поток, в котором считается силовая раскладка
+
+    Промежуточные позиции передаются сигналом positions_ready не чаще раза в
+    FORCE_EMIT_INTERVAL, так что схема постепенно приходит в равновесие, а
+    интерфейс не ждет окончания расчета.
+
+    Args:
+        generation (int): Номер запуска; холст принимает позиции только последнего
+        layout (ForceLayout): Раскладка, которую нужно довести до равновесия
+    """
+    positions_ready = pyqtSignal(int, dict)
+
+    def __init__(self, generation, layout, parent=None):
+        super().__init__(parent)
+        self.generation = generation
+        self.layout = layout
+        self._stopped = False
+
+    def stop(self):
+        """Просит поток завершиться после текущей итерации"""
+        self._stopped = True
+
+    def run(self):
+        try:
+            next_emit = time.monotonic() + FORCE_EMIT_INTERVAL
+            while not self._stopped and not self.layout.converged:
+                self.layout.step()
+                if time.monotonic() >= next_emit:
+                    self.positions_ready.emit(self.generation, self.layout.positions())
+                    next_emit = time.monotonic() + FORCE_EMIT_INTERVAL
+            if not self._stopped:
+                self.positions_ready.emit(self.generation, self.layout.positions())
+        except Exception as e:
+            logging.error(f"Ошибка при расчете раскладки топологии: {e}")
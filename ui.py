@@ -10,7 +10,7 @@ import sys
 import os
 import datetime
 
-from system_monitor import SystemMonitorWidget
+from system_monitor import SystemMonitorWidget, MetricsRecorderThread
 from network_monitor import NetworkMonitorWidget
 
 class NoSelectTabBar(QTabBar):
@@ -215,6 +215,11 @@ class MainWindow(QMainWindow):
         self.system_monitor = SystemMonitorWidget()
         self.network_monitor = NetworkMonitorWidget()
         
+        # История метрик пишется все время работы окна, в том числе свернутого:
+        # опрос вкладок при этом приостанавливается (см. changeEvent)
+        self.metrics_recorder = MetricsRecorderThread()
+        self.metrics_recorder.start()
+        
         # Добавляем вкладки в центральный виджет
         self.central_widget.addTab(self.system_monitor, "Системный мониторинг")
         self.central_widget.addTab(self.network_monitor, "Сетевой мониторинг")
@@ -472,8 +477,20 @@ class MainWindow(QMainWindow):
         Обработка события закрытия окна
         """
         # Закрываем все дочерние окна и потоки
+        self.metrics_recorder.stop()
+        self.metrics_recorder.wait()
         event.accept()
     
+    def changeEvent(self, event):
+        """
+        Приостанавливает фоновый опрос, пока окно свернуто
+        """
+        if event.type() == QEvent.WindowStateChange:
+            active = not self.isMinimized()
+            self.system_monitor.set_polling(active)
+            self.network_monitor.set_polling(active)
+        super().changeEvent(event)
+    
     def focusInEvent(self, event):
         """
         Предотвращаем стандартное поведение при получении фокуса
@@ -590,8 +607,11 @@ class MainWindow(QMainWindow):
             try:
                 # Обновляем статус сети
                 network_tab = current_tab.network_topology_tab
-                network_info = network_tab.network_info.text()
-                self.statusBar.showMessage(network_info)
+                if network_tab is None:
+                    # Вкладка топологии еще не открывалась
+                    self.statusBar.showMessage("Мониторинг сети")
+                else:
+                    self.statusBar.showMessage(network_tab.network_info.text())
                 self.status_label.setText("")  # Очищаем HTML лейбл
             except:
                 self.statusBar.showMessage("Мониторинг сети")